@@ -0,0 +1,95 @@
+"""
+startup.py
+
+Startup-time benchmark: wall time and peak RSS of fresh processes for
+`manage.py check`, ASGI application creation and the first translation.
+Also fails if importing chat.translator pulls in torch or transformers.
+
+Usage (from backend/):
+    python benchmarks/startup.py [--repeat 3] [--json out.json] [--compare previous.json --tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SETUP = (
+    "import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings'); django.setup(); "
+)
+
+SCENARIOS = {
+    "import_translator": [
+        sys.executable, "-c",
+        "import sys, chat.translator; "
+        "heavy = [m for m in ('torch', 'transformers') if m in sys.modules]; "
+        "sys.exit(f'chat.translator imported {heavy} eagerly' if heavy else 0)",
+    ],
+    "manage_check": [sys.executable, "manage.py", "check"],
+    "asgi_app": [sys.executable, "-c", SETUP + "import config.asgi"],
+    "first_translate": [
+        sys.executable, "-c",
+        SETUP + "from chat.translator import FALLBACK_MESSAGE, translate; "
+        "import sys; sys.exit(translate('Hello, how are you?', 'en', 'es') == FALLBACK_MESSAGE)",
+    ],
+}
+
+
+def run_once(command):
+    """Run a command in a fresh process; returns (seconds, peak RSS in MB, exit status)."""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    stderr = process.stderr.read().decode(errors="replace")
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        print(stderr.strip().splitlines()[-1] if stderr.strip() else "(no output)", file=sys.stderr)
+    return elapsed, usage.ru_maxrss / 1024, process.returncode  # ru_maxrss is in KB on Linux
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scenarios", nargs="*", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Previous --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenarios:
+        runs = [run_once(SCENARIOS[name]) for _ in range(max(1, args.repeat))]
+        results[name] = {
+            "seconds": round(statistics.median(r[0] for r in runs), 3),
+            "rss_mb": round(statistics.median(r[1] for r in runs), 1),
+            "ok": all(r[2] == 0 for r in runs),
+        }
+        r = results[name]
+        print(f"{name:<18} {r['seconds']:>7.3f}s {r['rss_mb']:>8.1f}MB {'ok' if r['ok'] else 'FAILED'}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+    failed = [name for name, r in results.items() if not r["ok"]]
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text())
+        for name, r in results.items():
+            before = previous.get(name)
+            if not before:
+                continue
+            for metric in ("seconds", "rss_mb"):
+                if before[metric] and r[metric] > before[metric] * (1 + args.tolerance):
+                    print(f"REGRESSION {name}.{metric}: {before[metric]} -> {r[metric]}", file=sys.stderr)
+                    failed.append(name)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+ws_load.py
+
+Load test for the translate path: N concurrent clients drive ChatTranslateConsumer over an
+in-memory channel layer (or POST /api/chat/translate/), in one process with no network.
+By default inference is replaced by a stub whose cost grows with batch length, so results
+measure the chat pipeline (admission, batching, persistence, fan-out) and are comparable
+across machines and commits. With --model-path a local MarianMT checkpoint is used instead.
+A throwaway SQLite database is created for each run.
+
+Reports throughput, p50/p95/p99 latency, errors, shed messages and peak RSS.
+
+Usage (from backend/):
+    python benchmarks/ws_load.py [--clients 50] [--messages 20] [--target ws|http]
+                                 [--json out.json] [--compare previous.json --tolerance 0.25]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def configure(args, db_path):
+    """Environment for an isolated, offline run; must happen before Django is set up."""
+    os.environ["DJANGO_SETTINGS_MODULE"] = "config.settings"
+    os.environ["DB_ENGINE"] = "django.db.backends.sqlite3"
+    os.environ["DB_NAME"] = db_path
+    os.environ["PRESENCE_REDIS_URL"] = ""
+    os.environ["CACHE_BACKEND"] = "django.core.cache.backends.locmem.LocMemCache"
+    os.environ["CHAT_WRITE_SPOOL_PATH"] = db_path + ".spool.jsonl"
+    os.environ["TRANSLATOR_PRELOAD_PAIRS"] = ""
+    os.environ["TRANSLATOR_PREFETCH"] = "0"
+    os.environ["TRANSLATOR_RESULT_CACHE"] = "1" if args.result_cache else "0"
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    if not args.admission:
+        # Measure capacity, not the production rate limits
+        for name in ("CHAT_CONNECTION_RATE", "CHAT_CONNECTION_BURST", "CHAT_USER_RATE", "CHAT_USER_BURST"):
+            os.environ[name] = "1000000"
+        os.environ["CHAT_MAX_IN_FLIGHT"] = "1000000"
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def install_model(args):
+    """Route inference to the stub, or register the local checkpoint for the pair."""
+    from chat import translator
+    from chat.batching import BatchScheduler
+
+    src_lang, tgt_lang = args.pair.split("-", 1)
+    if args.model_path:
+        translator.register_language_pair(src_lang, tgt_lang, args.model_path)
+        return
+    translator.SUPPORTED_LANGUAGE_PAIRS.setdefault((src_lang, tgt_lang), "stub")
+
+    def stub_run_batch(texts, src_lang, tgt_lang, profile="balanced"):
+        # Padded batches cost roughly batch size x longest input
+        time.sleep((args.stub_base_ms + args.stub_ms_per_char * len(texts) * max(map(len, texts))) / 1000)
+        return [f"[{tgt_lang}] {text}" for text in texts]
+
+    translator.run_batch = stub_run_batch
+    translator._scheduler = BatchScheduler(runner=stub_run_batch)
+
+
+def message_plan(args):
+    """Per-client message texts with a chat-like length distribution (mostly short, long tail)."""
+    from chat.sample_corpus import SAMPLE_SENTENCES
+
+    rng = random.Random(args.seed)
+    corpus = " ".join(SAMPLE_SENTENCES[args.pair.split("-", 1)[0]])
+    plan = []
+    for _ in range(args.clients):
+        texts = []
+        for _ in range(args.messages):
+            length = min(args.max_chars, max(2, int(rng.lognormvariate(math.log(args.median_chars), 0.9))))
+            start = rng.randrange(len(corpus))
+            text = (corpus[start:] + " " + corpus)[:length]
+            texts.append(text.rsplit(" ", 1)[0] if " " in text[1:] else text)
+        plan.append(texts)
+    return plan
+
+
+def create_users(count):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+    from chat.models import Friendship, UserProfile
+
+    call_command("migrate", verbosity=0)
+    User = get_user_model()
+    users = User.objects.bulk_create([User(username=f"bench{i}", phone_number="0") for i in range(count)])
+    users = list(User.objects.filter(username__startswith="bench").order_by("id"))
+    UserProfile.objects.bulk_create([UserProfile(user=user, preferred_language="es") for user in users])
+    # Each client messages the next one, so the ring must be friends
+    Friendship.objects.bulk_create([
+        Friendship(sender=user, receiver=users[(i + 1) % len(users)], status="accepted") for i, user in enumerate(users)
+    ])
+    return [(user.id, str(AccessToken.for_user(user))) for user in users]
+
+
+async def ws_client(application, index, users, texts, args, samples, outcomes):
+    from channels.testing import WebsocketCommunicator
+
+    user_id, token = users[index]
+    receiver_id = users[(index + 1) % len(users)][0]
+    src_lang, tgt_lang = args.pair.split("-", 1)
+    rng = random.Random(args.seed + index)
+    communicator = WebsocketCommunicator(application, f"/ws/chat/?token={token}")
+    connected, _ = await communicator.connect(timeout=30)
+    if not connected:
+        outcomes["errors"] += len(texts)
+        return
+    for text in texts:
+        started = time.perf_counter()
+        await communicator.send_to(text_data=json.dumps({
+            "message": text, "source_lang": src_lang, "target_lang": tgt_lang, "receiver_id": receiver_id,
+        }))
+        while True:
+            frame = json.loads(await communicator.receive_from(timeout=args.timeout))
+            if frame.get("type") not in ("message", "presence", "partial"):
+                break  # The reply to this client's own message
+        elapsed = time.perf_counter() - started
+        if frame.get("error") == "overloaded":
+            outcomes["shed"] += 1
+            await asyncio.sleep(frame.get("retry_after", 0))
+        elif frame.get("error"):
+            outcomes["errors"] += 1
+        else:
+            samples.append(elapsed)
+        if args.think_ms:
+            await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+    await communicator.disconnect()
+
+
+async def http_client(index, users, texts, args, samples, outcomes):
+    from django.test import AsyncClient
+
+    _, token = users[index]
+    src_lang, tgt_lang = args.pair.split("-", 1)
+    rng = random.Random(args.seed + index)
+    client = AsyncClient()
+    for text in texts:
+        started = time.perf_counter()
+        response = await client.post(
+            "/api/chat/translate/", {"message": text, "source_lang": src_lang, "target_lang": tgt_lang},
+            content_type="application/json", headers={"Authorization": f"Bearer {token}"},
+        )
+        elapsed = time.perf_counter() - started
+        if response.status_code == 200:
+            samples.append(elapsed)
+        elif response.status_code == 429:
+            outcomes["shed"] += 1
+            await asyncio.sleep(response.json().get("retry_after", 0))
+        else:
+            outcomes["errors"] += 1
+        if args.think_ms:
+            await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+
+
+async def run(args, users, plan):
+    from channels.routing import URLRouter
+    from chat.routing import websocket_urlpatterns
+
+    application = URLRouter(websocket_urlpatterns)
+    samples, outcomes = [], {"errors": 0, "shed": 0}
+    started = time.perf_counter()
+    if args.target == "ws":
+        clients = [ws_client(application, i, users, plan[i], args, samples, outcomes) for i in range(args.clients)]
+    else:
+        clients = [http_client(i, users, plan[i], args, samples, outcomes) for i in range(args.clients)]
+    await asyncio.gather(*clients)
+    return samples, outcomes, time.perf_counter() - started
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(args, samples, outcomes, seconds):
+    cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else [samples[0] if samples else 0.0] * 99
+    return {
+        "revision": git_revision(),
+        "target": args.target,
+        "model": args.model_path or "stub",
+        "clients": args.clients,
+        "messages": args.clients * args.messages,
+        "completed": len(samples),
+        "errors": outcomes["errors"],
+        "shed": outcomes["shed"],
+        "seconds": round(seconds, 3),
+        "throughput_per_s": round(len(samples) / seconds, 1) if seconds else 0.0,
+        "p50_ms": round(1000 * cuts[49], 2),
+        "p95_ms": round(1000 * cuts[94], 2),
+        "p99_ms": round(1000 * cuts[98], 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # KB on Linux
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["ws", "http"], default="ws")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=20, help="Messages per client")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a client's messages (0 = closed loop)")
+    parser.add_argument("--pair", default="en-es")
+    parser.add_argument("--median-chars", type=int, default=40)
+    parser.add_argument("--max-chars", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--model-path", help="Local MarianMT checkpoint directory instead of the stub")
+    parser.add_argument("--stub-base-ms", type=float, default=20, help="Stub cost per generate() call")
+    parser.add_argument("--stub-ms-per-char", type=float, default=0.05, help="Stub cost per padded character")
+    parser.add_argument("--result-cache", action="store_true", help="Keep the translation result cache on")
+    parser.add_argument("--admission", action="store_true", help="Keep the configured rate limits and shedding")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for one reply")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Previous --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="ws-load-") as tmp:
+        configure(args, os.path.join(tmp, "bench.sqlite3"))
+        import django
+        django.setup()
+        from django.conf import settings
+        from chat.persistence import get_message_writer
+        from chat.presence import get_presence
+
+        settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]  # Host of the in-process HTTP client
+        install_model(args)
+        users = create_users(max(2, args.clients))
+        plan = message_plan(args)
+        samples, outcomes, seconds = asyncio.run(run(args, users, plan))
+        # Flush background writers while the temporary database still exists
+        get_presence().stop()
+        if settings.CHAT_WRITE_BEHIND:
+            get_message_writer().drain()
+
+    result = summarize(args, samples, outcomes, seconds)
+    for key, value in result.items():
+        print(f"{key:<18} {value}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+
+    failed = result["errors"] > 0 or not samples
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text())
+        checks = [("throughput_per_s", -1), ("p50_ms", 1), ("p95_ms", 1), ("p99_ms", 1), ("peak_rss_mb", 1)]
+        for metric, direction in checks:
+            before, after = previous.get(metric), result[metric]
+            if not before:
+                continue
+            if (direction > 0 and after > before * (1 + args.tolerance)) or \
+                    (direction < 0 and after < before * (1 - args.tolerance)):
+                print(f"REGRESSION {metric}: {before} -> {after}", file=sys.stderr)
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,29 @@
 from django.contrib import admin
-from .models import Message, UserProfile, Friendship
+from .models import Message, MessageTranslation, UserProfile, Friendship
+from .search import text_filter
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('sender', 'receiver', 'content', 'is_translated', 'created_at')
     list_filter = ('is_translated', 'created_at', 'source_language', 'target_language')
-    search_fields = ('content', 'translated_content', 'sender__username', 'receiver__username')
+    search_fields = ('sender__username', 'receiver__username')
     readonly_fields = ('created_at', 'updated_at')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Message text goes through the full-text index instead of icontains scans
+        matches, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        condition = text_filter(search_term)
+        if condition is not None:
+            matches |= queryset.filter(condition)  # queryset already carries the list filters
+        return matches, may_have_duplicates
+
+@admin.register(MessageTranslation)
+class MessageTranslationAdmin(admin.ModelAdmin):
+    list_display = ('message', 'language', 'model_version', 'created_at')
+    list_filter = ('language', 'model_version')
+    raw_id_fields = ('message',)
+    readonly_fields = ('created_at',)
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'preferred_language', 'is_online', 'last_seen')
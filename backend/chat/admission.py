@@ -0,0 +1,149 @@
+"""
+admission.py
+
+Admission control and load shedding for translation requests, over WebSocket and REST.
+Every message must take a token from its connection's bucket (WebSocket only) and from its
+user's bucket (shared by the user's connections and HTTP requests in this process), and a
+slot in the bounded set of in-flight translations. Long messages, and REST batches, may only
+use part of that capacity, which keeps headroom for short ones. Rejected messages get an
+"overloaded" frame (HTTP 429) with a retry_after hint instead of queueing, so latency stays
+bounded under overload.
+"""
+
+import time
+from threading import Lock
+from typing import Dict, Optional
+
+from django.conf import settings
+
+MAX_TRACKED_USERS = 10000
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `burst`.
+    """
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0 on success, else seconds until they are available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return 0.0
+            return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def refund(self, cost: float = 1.0):
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + cost)
+
+
+class AdmissionController:
+    """
+    Decides whether a translation request may start, and tracks in-flight work.
+    """
+    def __init__(self, max_in_flight: int = None, long_share: float = None, short_chars: int = None,
+                 user_rate: float = None, user_burst: float = None):
+        self.max_in_flight = max(1, max_in_flight or settings.CHAT_MAX_IN_FLIGHT)
+        self.long_share = settings.CHAT_LONG_MESSAGE_SHARE if long_share is None else long_share
+        self.short_chars = short_chars or settings.CHAT_SHORT_MESSAGE_CHARS
+        self.user_rate = settings.CHAT_USER_RATE if user_rate is None else user_rate
+        self.user_burst = settings.CHAT_USER_BURST if user_burst is None else user_burst
+        self.user_buckets: Dict[int, TokenBucket] = {}
+        self.in_flight = 0
+        self.latency_ewma = 0.5  # Seconds per admitted request, seeds the retry_after estimate
+        self.lock = Lock()
+        self.stats = {"admitted": 0, "rate_limited": 0, "shed": 0}
+
+    def connection_bucket(self) -> TokenBucket:
+        """A fresh bucket for one WebSocket connection."""
+        return TokenBucket(settings.CHAT_CONNECTION_RATE, settings.CHAT_CONNECTION_BURST)
+
+    def _user_bucket(self, user_id) -> TokenBucket:
+        with self.lock:
+            bucket = self.user_buckets.get(user_id)
+            if bucket is None:
+                if len(self.user_buckets) >= MAX_TRACKED_USERS:
+                    # Idle buckets are full again, so dropping them changes nothing
+                    idle = time.monotonic() - self.user_burst / max(self.user_rate, 1e-9)
+                    self.user_buckets = {uid: b for uid, b in self.user_buckets.items() if b.updated > idle}
+                bucket = self.user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            return bucket
+
+    def _capacity_for(self, text: str) -> int:
+        if len(text) <= self.short_chars:
+            return self.max_in_flight
+        return max(1, int(self.max_in_flight * self.long_share))
+
+    def admit(self, text: str, connection: Optional[TokenBucket] = None, user_id=None) -> Optional[dict]:
+        """
+        Try to admit a request. Returns None when admitted (call `release` when done),
+        otherwise the rejection: {"error": "overloaded", "reason": ..., "retry_after": seconds}.
+        HTTP requests have no connection bucket and are limited by their user's bucket.
+        """
+        if connection is not None:
+            wait = connection.take()
+            if wait:
+                return self._reject("rate_limited", "connection_rate", wait)
+        if user_id is not None:
+            wait = self._user_bucket(user_id).take()
+            if wait:
+                if connection is not None:
+                    connection.refund()
+                return self._reject("rate_limited", "user_rate", wait)
+        with self.lock:
+            if self.in_flight < self._capacity_for(text):
+                self.in_flight += 1
+                self.stats["admitted"] += 1
+                return None
+            # Roughly the time for the current backlog to drain below capacity
+            retry_after = self.latency_ewma * (self.in_flight - self._capacity_for(text) + 1) / self.max_in_flight
+        if connection is not None:
+            connection.refund()
+        if user_id is not None:
+            self._user_bucket(user_id).refund()
+        return self._reject("shed", "queue_full", retry_after)
+
+    def _reject(self, counter: str, reason: str, retry_after: float) -> dict:
+        with self.lock:
+            self.stats[counter] += 1
+        return {"error": "overloaded", "reason": reason, "retry_after": round(max(0.1, retry_after), 2)}
+
+    def release(self, seconds: float):
+        """Mark an admitted request finished after `seconds` of work."""
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.latency_ewma = 0.9 * self.latency_ewma + 0.1 * seconds
+
+    def snapshot(self) -> dict:
+        from .translator import BATCHING_ENABLED, get_scheduler
+
+        with self.lock:
+            snapshot = {
+                **self.stats,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "latency_ewma_ms": round(1000 * self.latency_ewma, 1),
+            }
+        snapshot["queue_depth"] = get_scheduler().queue_depth() if BATCHING_ENABLED else 0
+        return snapshot
+
+
+_admission: Optional[AdmissionController] = None
+_admission_lock = Lock()
+
+
+def get_admission() -> AdmissionController:
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = AdmissionController()
+        return _admission
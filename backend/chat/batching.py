@@ -0,0 +1,176 @@
+"""
+batching.py
+
+Dynamic micro-batching for MarianMT inference.
+Concurrent translation requests are grouped by language pair and run as one padded
+`generate` call, bounded by a maximum batch size and a maximum queue wait time.
+Short texts wait in a priority lane that is drained first, so chat-sized messages are
+not stuck behind a backlog of long ones.
+"""
+
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Lock, Thread
+from typing import Callable, Deque, Dict, List, Tuple
+
+from .metrics import BATCH_SIZE, QUEUE_WAIT_SECONDS
+
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get("TRANSLATOR_MAX_BATCH_SIZE", 16))
+DEFAULT_MAX_WAIT_MS = float(os.environ.get("TRANSLATOR_MAX_BATCH_WAIT_MS", 5))
+PRIORITY_MAX_CHARS = int(os.environ.get("TRANSLATOR_PRIORITY_MAX_CHARS", 80))  # Texts up to this length skip ahead
+
+BatchRunner = Callable[..., List[str]]
+
+
+class BatchStats:
+    """
+    Thread-safe counters for batch sizes and queue wait times, also exported to /metrics
+    as the translator_batch_size and translator_queue_wait_seconds histograms.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_size = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, batch_size: int, waits: List[float], src_lang: str, tgt_lang: str):
+        BATCH_SIZE.observe(batch_size, src=src_lang, tgt=tgt_lang)
+        for wait in waits:
+            QUEUE_WAIT_SECONDS.observe(wait, src=src_lang, tgt=tgt_lang)
+        with self.lock:
+            self.batches += 1
+            self.items += batch_size
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+            self.wait_seconds_total += sum(waits)
+            self.wait_seconds_max = max([self.wait_seconds_max, *waits])
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "avg_wait_ms": 1000 * self.wait_seconds_total / self.items if self.items else 0.0,
+                "max_wait_ms": 1000 * self.wait_seconds_max,
+            }
+
+
+class _Request:
+    __slots__ = ("text", "future", "enqueued_at")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class _PairQueue:
+    """
+    Pending requests for one language pair (and options), drained by a dedicated daemon thread.
+    """
+    def __init__(self, scheduler: "BatchScheduler", key: Tuple[str, ...]):
+        self.scheduler = scheduler
+        self.key = key
+        self.pending: Deque[_Request] = deque()
+        self.priority: Deque[_Request] = deque()
+        self.cond = Condition()
+        self.thread = Thread(target=self._run, name=f"translate-batch-{'-'.join(map(str, key))}", daemon=True)
+        self.thread.start()
+
+    def put(self, request: _Request, priority: bool = False):
+        with self.cond:
+            (self.priority if priority else self.pending).append(request)
+            self.cond.notify()
+
+    def __len__(self) -> int:
+        return len(self.priority) + len(self.pending)
+
+    def _next_batch(self) -> List[_Request]:
+        max_size = self.scheduler.max_batch_size
+        max_wait = self.scheduler.max_wait_ms / 1000
+        with self.cond:
+            while not len(self):
+                self.cond.wait()
+            # The oldest request bounds how long the whole batch may wait
+            deadline = min(q[0].enqueued_at for q in (self.priority, self.pending) if q) + max_wait
+            while len(self) < max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            # Keep one slot for the oldest long text so a stream of short ones cannot starve it
+            reserved = 1 if self.pending and max_size > 1 else 0
+            batch = [self.priority.popleft() for _ in range(min(max_size - reserved, len(self.priority)))]
+            batch += [self.pending.popleft() for _ in range(min(max_size - len(batch), len(self.pending)))]
+            return batch
+
+    def _run(self):
+        # The thread must outlive any single batch: if it died, this pair's queue would never drain again
+        while True:
+            try:
+                self._run_once()
+            except Exception as e:
+                logging.error(f"Batch scheduler error ({self.key[0]}->{self.key[1]}): {e}")
+
+    def _run_once(self):
+        # Requests whose caller gave up (cancelled asyncio waiter, disconnect) are dropped before inference
+        batch = [r for r in self._next_batch() if r.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.monotonic()
+        self.scheduler.stats.record(len(batch), [started - r.enqueued_at for r in batch], *self.key[:2])
+        try:
+            results = self.scheduler.runner([r.text for r in batch], *self.key)
+            if len(results) != len(batch):
+                raise RuntimeError(f"runner returned {len(results)} results for {len(batch)} texts")
+        except Exception as e:
+            logging.error(f"Batch translation error ({self.key[0]}->{self.key[1]}): {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+
+class BatchScheduler:
+    """
+    Groups translation requests by language pair into bounded micro-batches.
+    `runner(texts, src_lang, tgt_lang, *options)` must return one result per input text, in order.
+    """
+    def __init__(self, runner: BatchRunner, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.runner = runner
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.stats = BatchStats()
+        self.queues: Dict[Tuple[str, ...], _PairQueue] = {}
+        self.lock = Lock()
+
+    def _queue_for(self, key: Tuple[str, ...]) -> _PairQueue:
+        with self.lock:
+            queue = self.queues.get(key)
+            if queue is None:
+                queue = self.queues[key] = _PairQueue(self, key)
+            return queue
+
+    def submit(self, text: str, src_lang: str, tgt_lang: str, *options) -> Future:
+        """
+        Queue a single text for translation and return a Future for its result.
+        Extra options (e.g. the decoding profile) are passed to the runner, and only
+        requests with equal options share a batch.
+        Texts of at most TRANSLATOR_PRIORITY_MAX_CHARS characters go to the priority lane.
+        """
+        request = _Request(text)
+        self._queue_for((src_lang, tgt_lang, *options)).put(request, priority=len(text) <= PRIORITY_MAX_CHARS)
+        return request.future
+
+    def queue_depth(self) -> int:
+        with self.lock:
+            queues = list(self.queues.values())
+        return sum(len(q) for q in queues)
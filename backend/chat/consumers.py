@@ -1,8 +1,21 @@
+import asyncio
 import json
+import logging
+import time
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from .translator import translate
+from .translator import FALLBACK_MESSAGE, stream_tokens_async, translate_async
+from .segmentation import split_padding, split_sentences
+from .persistence import get_message_writer
+from .presence import get_presence
+from .admission import get_admission
+from .decoding import DECODING_PROFILES, get_decoding_controller
+from .metrics import CONNECTIONS, FAILURES, MESSAGES, STAGE_SECONDS
+from .friends import friend_ids
+from .warmup import friend_language_pairs, get_warmup
+from django.conf import settings
 from .models import Message, UserProfile
 from django.utils import timezone
 
@@ -13,22 +26,64 @@ class ChatTranslateConsumer(AsyncWebsocketConsumer):
     WebSocket consumer for real-time chat translation.
     Receives JSON with 'message', 'source_lang', and 'target_lang',
     translates the message, saves to database, and sends the result back.
+    With "stream": "sentences" (or "tokens") partial translations are sent as
+    numbered "partial" frames followed by a final "complete" frame.
+    Only authenticated connections may send, and only to accepted friends.
+    They join a per-user group; each message is translated once per distinct
+    preferred language among its recipients and fanned out to their groups
+    through the channel layer.
+    Messages over the connection's or user's rate, or arriving while the translation
+    queue is full, are rejected with an "overloaded" frame carrying retry_after.
     Optimized for low latency and memory usage.
     """
 
+    @staticmethod
+    def user_group(user_id):
+        return f"user_{user_id}"
+
     async def connect(self):
+        # Authenticate with ?token=<JWT access token>, falling back to the session user
+        self.user = None
+        token = parse_qs(self.scope.get("query_string", b"").decode()).get("token", [None])[0]
+        if token:
+            self.user = await self.get_user_from_token(token)
+        elif getattr(self.scope.get("user"), "is_authenticated", False):
+            self.user = self.scope["user"]
+        self.rate_bucket = get_admission().connection_bucket()
         # Accept the WebSocket connection
         await self.accept()
-        # Optionally, add to a group for broadcasting
-        # await self.channel_layer.group_add("chat_group", self.channel_name)
+        CONNECTIONS.inc()
+        self.counted = True
+        if self.user:
+            await self.channel_layer.group_add(self.user_group(self.user.id), self.channel_name)
+            if await get_presence().connect(self.user.id, self.channel_name):
+                await self.broadcast_presence(True)
+            # Load models this user is likely to need before their first message
+            get_warmup().prefetch(await database_sync_to_async(friend_language_pairs)(self.user.id))
 
     async def disconnect(self, close_code):
+        if getattr(self, "counted", False):
+            CONNECTIONS.dec()
+            self.counted = False
         # Update user online status
         if hasattr(self, 'user') and self.user:
-            await self.update_user_status(self.user, False)
-        # Optionally, remove from group
-        # await self.channel_layer.group_discard("chat_group", self.channel_name)
-        pass
+            await self.channel_layer.group_discard(self.user_group(self.user.id), self.channel_name)
+            if await get_presence().disconnect(self.user.id, self.channel_name):
+                await self.broadcast_presence(False)
+
+    async def broadcast_presence(self, is_online):
+        """Push an online/offline transition to every friend's connections."""
+        event = {
+            "type": "presence.update",
+            "content": {
+                "type": "presence",
+                "user_id": self.user.id,
+                "is_online": is_online,
+                "timestamp": timezone.now().isoformat(),
+            },
+        }
+        for friend_id in await database_sync_to_async(friend_ids)(self.user.id):
+            await self.channel_layer.group_send(self.user_group(friend_id), event)
 
     @database_sync_to_async
     def get_user_from_token(self, token):
@@ -45,56 +100,143 @@ class ChatTranslateConsumer(AsyncWebsocketConsumer):
             return None
 
     @database_sync_to_async
-    def update_user_status(self, user, is_online):
-        """Update user online status."""
-        profile, created = UserProfile.objects.get_or_create(user=user)
-        profile.is_online = is_online
-        profile.last_seen = timezone.now()
-        profile.save()
+    def get_preferred_languages(self, user_ids):
+        """Map each user id to its profile's preferred language (users without a profile are omitted)."""
+        return dict(
+            UserProfile.objects.filter(user_id__in=user_ids).values_list("user_id", "preferred_language")
+        )
+
+    async def save_messages(self, sender_id, content, source_lang, rows):
+        """
+        Persist one message per (receiver_id, translated_content, target_lang) row and return
+        each receiver's client-visible UUID. With CHAT_WRITE_BEHIND the rows are queued for a
+        batched bulk_create instead of being written on the hot path.
+        """
+        if settings.CHAT_WRITE_BEHIND:
+            writer = get_message_writer()
+            return {
+                rid: writer.enqueue(sender_id, rid, content, text, source_lang, lang) for rid, text, lang in rows
+            }
+        return await self.create_messages(sender_id, content, source_lang, rows)
 
     @database_sync_to_async
-    def save_message(self, sender_id, receiver_id, content, translated_content, source_lang, target_lang):
-        """Save message to database."""
+    def create_messages(self, sender_id, content, source_lang, rows):
+        """Save every recipient's row in one bulk insert."""
         try:
-            sender = User.objects.get(id=sender_id)
-            receiver = User.objects.get(id=receiver_id)
-            
-            message = Message.objects.create(
-                sender=sender,
-                receiver=receiver,
-                content=content,
-                translated_content=translated_content,
-                source_language=source_lang,
-                target_language=target_lang,
-                is_translated=bool(translated_content)
-            )
-            return message
+            messages = Message.objects.bulk_create([
+                Message(
+                    sender_id=sender_id,
+                    receiver_id=rid,
+                    content=content,
+                    translated_content=text,
+                    source_language=source_lang,
+                    target_language=lang,
+                    is_translated=bool(text)
+                )
+                for rid, text, lang in rows
+            ])
+            return {message.receiver_id: message.client_id for message in messages}
         except Exception as e:
-            print(f"Error saving message: {e}")
-            return None
+            logging.error(f"Error saving message: {e}")
+            return {}
 
     async def receive(self, text_data=None, bytes_data=None):
+        received = time.perf_counter()
         try:
             data = json.loads(text_data)
+            if data.get("type") == "heartbeat":
+                if self.user:
+                    await get_presence().heartbeat(self.user.id, self.channel_name)
+                return
+            if not self.user:
+                await self.send_json({"error": "Authentication required."})
+                return
             message = data.get("message")
             source_lang = data.get("source_lang")
             target_lang = data.get("target_lang")
-            sender_id = data.get("sender_id")
+            sender_id = self.user.id
             receiver_id = data.get("receiver_id")
+            # Group conversations list every recipient; the first one is the primary receiver
+            receiver_ids = list(dict.fromkeys(data.get("receiver_ids") or [receiver_id]))
+            receiver_id = receiver_id or receiver_ids[0]
+            stream = data.get("stream")
+            profile = data.get("profile")
             
-            if not all([message, source_lang, target_lang, sender_id, receiver_id]):
+            if not all([message, source_lang, target_lang, receiver_id]):
                 await self.send_json({
-                    "error": "Missing required fields: 'message', 'source_lang', 'target_lang', 'sender_id', 'receiver_id'."
+                    "error": "Missing required fields: 'message', 'source_lang', 'target_lang', 'receiver_id'."
                 })
                 return
-        except (json.JSONDecodeError, TypeError):
+            if profile is not None and profile not in DECODING_PROFILES:
+                await self.send_json({"error": f"Unknown profile '{profile}'; use one of: {', '.join(DECODING_PROFILES)}"})
+                return
+            receiver_id, receiver_ids = int(receiver_id), [int(rid) for rid in receiver_ids]
+        except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
             await self.send_json({"error": "Invalid JSON format."})
             return
+        if receiver_id not in receiver_ids:
+            # Otherwise the primary receiver would get the sender's echo without being checked or delivered to
+            await self.send_json({"error": "'receiver_id' must be one of 'receiver_ids'."})
+            return
+        STAGE_SECONDS.observe(time.perf_counter() - received, source="ws", stage="json_parse")
 
-        # Run translation in a thread pool to avoid blocking event loop
-        translated = await database_sync_to_async(translate)(message, source_lang, target_lang)
+        # Shed load before any database or model work
+        admission = get_admission()
+        rejection = admission.admit(message, self.rate_bucket, self.user.id)
+        if rejection:
+            await self.send_json({
+                **rejection,
+                "queue_depth": admission.snapshot()["queue_depth"],
+                "original": message,
+                "sender_id": sender_id,
+                "receiver_id": receiver_id,
+                "timestamp": timezone.now().isoformat()
+            })
+            return
+        started = time.monotonic()
+        try:
+            # Messages can only go to accepted friends
+            friends = set(await database_sync_to_async(friend_ids)(sender_id))
+            strangers = [rid for rid in receiver_ids if rid not in friends]
+            if strangers:
+                await self.send_json({
+                    "error": "Recipients must be accepted friends.",
+                    "receiver_ids": strangers,
+                    "original": message,
+                    "timestamp": timezone.now().isoformat()
+                })
+                return
+            await self.handle_message(message, source_lang, target_lang, sender_id, receiver_id, receiver_ids, stream, profile)
+        finally:
+            admission.release(time.monotonic() - started)
+            STAGE_SECONDS.observe(time.perf_counter() - received, source="ws", stage="total")
+
+    async def handle_message(self, message, source_lang, target_lang, sender_id, receiver_id, receiver_ids, stream, profile=None):
+        """Translate an admitted message, persist it and deliver it to the sender and recipients."""
+        # The requested decoding profile, downgraded by the controller while over the latency SLO
+        profile = get_decoding_controller().choose(profile)
+        MESSAGES.inc(source="ws", src=source_lang, tgt=target_lang)
+        # Start translating for every other recipient language while the sender's own reply is produced
+        languages = await self.get_preferred_languages(receiver_ids)
+        recipient_langs = {rid: languages.get(rid, target_lang) for rid in receiver_ids}
+        fanout = {
+            lang: asyncio.ensure_future(translate_async(message, source_lang, lang, profile))
+            for lang in set(recipient_langs.values()) - {target_lang}
+        }
+
+        with STAGE_SECONDS.time(source="ws", stage="translate"):
+            if stream:
+                translated = await self.translate_streaming(
+                    message, source_lang, target_lang, sender_id, receiver_id, tokens=stream == "tokens", profile=profile
+                )
+            else:
+                # Queue translation on the micro-batching scheduler without blocking the event loop
+                translated = await translate_async(message, source_lang, target_lang, profile)
         
         if translated.startswith("[") and "unavailable" in translated:
+            FAILURES.inc(source="ws", src=source_lang, tgt=target_lang)
+            for task in fanout.values():
+                task.cancel()
             await self.send_json({
                 "error": "Translation failed or unsupported language pair.",
                 "original": message,
@@ -104,27 +246,138 @@ class ChatTranslateConsumer(AsyncWebsocketConsumer):
             })
             return
 
-        # Save message to database
-        saved_message = await self.save_message(
-            sender_id, receiver_id, message, translated, source_lang, target_lang
-        )
+        # One inference per distinct language, however many recipients share it
+        translations = {target_lang: translated}
+        for lang, task in fanout.items():
+            translations[lang] = await task
+            if translations[lang] == FALLBACK_MESSAGE:
+                FAILURES.inc(source="ws", src=source_lang, tgt=lang)
+
+        # Save one row per recipient (write-behind unless disabled). Failed translations keep the
+        # recipient's language with no text, so backfill_translations picks them up later.
+        with STAGE_SECONDS.time(source="ws", stage="db_save"):
+            client_ids = await self.save_messages(sender_id, message, source_lang, [
+                (rid, translations[lang] if translations[lang] != FALLBACK_MESSAGE else None, lang)
+                for rid, lang in recipient_langs.items()
+            ])
+        client_id = client_ids.get(receiver_id)
+        timestamp = timezone.now().isoformat()
+        sending = time.perf_counter()
 
         # Send translated message back to client
         await self.send_json({
-            "id": saved_message.id if saved_message else None,
+            **({"type": "complete", "seq": self.stream_seq + 1} if stream else {}),
+            "id": str(client_id) if client_id else None,
             "translated": translated,
             "original": message,
             "source_lang": source_lang,
             "target_lang": target_lang,
+            "profile": profile,
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "timestamp": timestamp
+        })
+
+        # Deliver to every recipient's connections in their own language
+        for rid, lang in recipient_langs.items():
+            text = translations[lang]
+            await self.channel_layer.group_send(self.user_group(rid), {
+                "type": "chat.message",
+                "content": {
+                    "type": "message",
+                    "id": str(client_ids[rid]) if client_ids.get(rid) else None,
+                    "translated": text if text != FALLBACK_MESSAGE else None,
+                    "original": message,
+                    "source_lang": source_lang,
+                    "target_lang": lang,
+                    "profile": profile,
+                    "sender_id": sender_id,
+                    "receiver_id": rid,
+                    "receiver_ids": receiver_ids,
+                    "timestamp": timestamp,
+                },
+            })
+        STAGE_SECONDS.observe(time.perf_counter() - sending, source="ws", stage="send")
+
+    async def translate_streaming(self, message, source_lang, target_lang, sender_id, receiver_id, tokens=False, profile=None):
+        """
+        Translate sentence by sentence, sending each finished sentence as a "partial"
+        frame in order. All sentences are queued at once so they share batches; with
+        tokens=True the first sentence is streamed token by token using greedy decoding.
+        Returns the full translation, or the fallback message if any sentence failed.
+        """
+        self.stream_seq = 0
+        self.stream_profile = profile
+        segments = [split_padding(segment) for segment in split_sentences(message)]
+        first = next((i for i, (_, core, _) in enumerate(segments) if core), None)
+        pending = [
+            asyncio.ensure_future(translate_async(core, source_lang, target_lang, profile))
+            if core and not (tokens and i == first) else None
+            for i, (_, core, _) in enumerate(segments)
+        ]
+        parts = []
+        try:
+            for i, (head, core, tail) in enumerate(segments):
+                if not core:
+                    parts.append(head)
+                    continue
+                if pending[i] is None:
+                    translated = await self.stream_sentence(i, head, core, tail, source_lang, target_lang, sender_id, receiver_id)
+                else:
+                    translated = await pending[i]
+                    if translated != FALLBACK_MESSAGE:
+                        await self.send_partial(i, head + translated + tail, sender_id, receiver_id)
+                if translated == FALLBACK_MESSAGE:
+                    return FALLBACK_MESSAGE
+                parts.append(head + translated + tail)
+        finally:
+            for task in pending:
+                if task is not None:
+                    task.cancel()
+        return "".join(parts)
+
+    async def stream_sentence(self, index, head, core, tail, source_lang, target_lang, sender_id, receiver_id):
+        """Send greedy token-level deltas for one sentence; falls back to a normal translation."""
+        streamed = ""
+        try:
+            async for chunk in stream_tokens_async(core, source_lang, target_lang):
+                await self.send_partial(index, (head if not streamed else "") + chunk, sender_id, receiver_id)
+                streamed += chunk
+        except Exception:
+            # Generation stalled; the client already holds a partial sentence, so fail the message
+            return FALLBACK_MESSAGE if streamed else await self.translate_sentence(index, head, core, tail, source_lang, target_lang, sender_id, receiver_id)
+        if not streamed:
+            return await self.translate_sentence(index, head, core, tail, source_lang, target_lang, sender_id, receiver_id)
+        if tail:
+            await self.send_partial(index, tail, sender_id, receiver_id)
+        return streamed
+
+    async def translate_sentence(self, index, head, core, tail, source_lang, target_lang, sender_id, receiver_id):
+        translated = await translate_async(core, source_lang, target_lang, self.stream_profile)
+        if translated != FALLBACK_MESSAGE:
+            await self.send_partial(index, head + translated + tail, sender_id, receiver_id)
+        return translated
+
+    async def send_partial(self, segment, text, sender_id, receiver_id):
+        """Send a chunk of translated text; clients append chunks in "seq" order."""
+        self.stream_seq += 1
+        await self.send_json({
+            "type": "partial",
+            "seq": self.stream_seq,
+            "segment": segment,
+            "translated": text,
             "sender_id": sender_id,
             "receiver_id": receiver_id,
-            "timestamp": timezone.now().isoformat()
         })
 
     async def send_json(self, content):
         """Helper to send JSON content over WebSocket."""
         await self.send(text_data=json.dumps(content))
 
-    # Example for broadcasting to a group (uncomment if needed):
-    # async def broadcast_message(self, event):
-    #     await self.send_json(event["content"])
+    async def chat_message(self, event):
+        """Channel layer handler for messages fanned out to this user's group."""
+        await self.send_json(event["content"])
+
+    async def presence_update(self, event):
+        """Channel layer handler for friends' online/offline transitions."""
+        await self.send_json(event["content"])
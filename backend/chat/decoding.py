@@ -0,0 +1,137 @@
+"""
+decoding.py
+
+Decoding profiles for MarianMT `generate` and a load-aware profile controller.
+A profile fixes the beam search settings; max_length is derived from the input length
+instead of the model's 512-token limit. With TRANSLATOR_LATENCY_SLO_MS set, the controller
+steps down to cheaper profiles while observed latency or queue depth is over the SLO and
+steps back up once load has dropped well below it.
+"""
+
+import os
+import time
+from collections import Counter, deque
+from threading import Lock
+from typing import Deque, Optional
+
+# Ordered from most expensive to cheapest; part of the result cache key
+DECODING_PROFILES = {
+    "quality": {"num_beams": 4, "early_stopping": True},
+    "balanced": {"num_beams": 3, "early_stopping": True},
+    "fast": {"num_beams": 1},  # Greedy
+}
+PROFILE_ORDER = list(DECODING_PROFILES)
+DEFAULT_PROFILE = os.environ.get("TRANSLATOR_DECODING_PROFILE", "balanced")
+if DEFAULT_PROFILE not in DECODING_PROFILES:
+    DEFAULT_PROFILE = "balanced"
+
+MODEL_MAX_LENGTH = 512
+LENGTH_RATIO = float(os.environ.get("TRANSLATOR_LENGTH_RATIO", 1.5))  # Output tokens allowed per input token
+LENGTH_SLACK = int(os.environ.get("TRANSLATOR_LENGTH_SLACK", 10))
+
+LATENCY_SLO_MS = float(os.environ.get("TRANSLATOR_LATENCY_SLO_MS", 0))  # 0 = no adaptive controller
+QUEUE_SLO = int(os.environ.get("TRANSLATOR_QUEUE_SLO", 64))  # Queued texts treated as overload
+SLO_WINDOW = int(os.environ.get("TRANSLATOR_SLO_WINDOW", 200))  # Latency samples in the p95 window
+SLO_COOLDOWN = float(os.environ.get("TRANSLATOR_SLO_COOLDOWN", 5))  # Seconds between profile switches
+SLO_MIN_SAMPLES = 20
+
+
+def max_length_for(input_tokens: int) -> int:
+    """Generation limit for the longest input of a batch."""
+    return min(MODEL_MAX_LENGTH, int(input_tokens * LENGTH_RATIO) + LENGTH_SLACK)
+
+
+def decoding_kwargs(profile: str, input_tokens: int) -> dict:
+    """`generate` keyword arguments for a profile and the longest input of a batch (in tokens)."""
+    return {**DECODING_PROFILES[profile], "max_length": max_length_for(input_tokens)}
+
+
+def profile_key(profile: str) -> str:
+    """Stable description of a profile's output-affecting settings, for result cache keys."""
+    settings = ",".join(f"{k}={v}" for k, v in sorted(DECODING_PROFILES[profile].items()))
+    return f"{profile}:{settings},length={LENGTH_RATIO}x+{LENGTH_SLACK}"
+
+
+class DecodingController:
+    """
+    Picks the decoding profile for each request. Without an SLO every request gets the
+    requested (or default) profile. With one, the controller keeps a current ceiling:
+    requests never decode more expensively than it, and it moves one step per cooldown.
+    """
+    def __init__(self, default: str = DEFAULT_PROFILE, slo_ms: float = LATENCY_SLO_MS,
+                 queue_slo: int = QUEUE_SLO, window: int = SLO_WINDOW, cooldown: float = SLO_COOLDOWN):
+        self.default = default
+        self.slo_ms = slo_ms
+        self.queue_slo = queue_slo
+        self.cooldown = cooldown
+        self.current = default
+        self.samples: Deque[float] = deque(maxlen=max(1, window))
+        self.queue_depth = 0
+        self.last_switch = 0.0
+        self.served = Counter()
+        self.switches = 0
+        self.lock = Lock()
+
+    def choose(self, requested: Optional[str] = None) -> str:
+        """Effective profile for a request: the cheaper of the requested one and the current ceiling."""
+        profile = requested if requested in DECODING_PROFILES else self.default
+        with self.lock:
+            if self.slo_ms and PROFILE_ORDER.index(self.current) > PROFILE_ORDER.index(profile):
+                profile = self.current
+            self.served[profile] += 1
+        return profile
+
+    def _p95_ms(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return 1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def observe(self, seconds: float, queue_depth: int = 0):
+        """Record one translation's latency and the queue depth, and adjust the ceiling."""
+        if not self.slo_ms:
+            return
+        now = time.monotonic()
+        with self.lock:
+            self.samples.append(seconds)
+            self.queue_depth = queue_depth
+            if now - self.last_switch < self.cooldown:
+                return
+            if len(self.samples) < min(SLO_MIN_SAMPLES, self.samples.maxlen) and queue_depth <= self.queue_slo:
+                return  # Too few samples since the last switch to judge latency
+            p95 = self._p95_ms()
+            index = PROFILE_ORDER.index(self.current)
+            if (p95 > self.slo_ms or queue_depth > self.queue_slo) and index < len(PROFILE_ORDER) - 1:
+                self.current = PROFILE_ORDER[index + 1]
+            elif p95 < 0.5 * self.slo_ms and queue_depth < 0.5 * self.queue_slo \
+                    and index > PROFILE_ORDER.index(self.default):
+                self.current = PROFILE_ORDER[index - 1]
+            else:
+                return
+            self.last_switch = now
+            self.switches += 1
+            self.samples.clear()  # Judge the new profile on its own latency
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "profile": self.current,
+                "default": self.default,
+                "slo_ms": self.slo_ms,
+                "p95_ms": round(self._p95_ms(), 1),
+                "queue_depth": self.queue_depth,
+                "switches": self.switches,
+                "served": dict(self.served),
+            }
+
+
+_controller: Optional[DecodingController] = None
+_controller_lock = Lock()
+
+
+def get_decoding_controller() -> DecodingController:
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = DecodingController()
+        return _controller
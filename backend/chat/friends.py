@@ -0,0 +1,107 @@
+"""
+friends.py
+
+Per-user friends/presence snapshot.
+The list is built from a single query over Friendship joined to both users and their
+profiles, cached per user, and invalidated by signals when friendships or profiles change.
+Signals only reach the cache of the process that saved the change, so with several workers
+the default cache must be shared (e.g. RedisCache). With a process-local cache (LocMemCache,
+the default) snapshots are kept for LOCAL_SNAPSHOT_TTL seconds only, which bounds how stale
+another worker's copy can be.
+"""
+
+import hashlib
+import json
+from typing import List, Tuple
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Q
+from django.utils.http import parse_etags
+
+from .models import Friendship
+
+SNAPSHOT_TTL = 300  # Seconds; signals invalidate earlier on any change
+LOCAL_SNAPSHOT_TTL = 5  # Seconds, when the cache is per process and misses other workers' invalidations
+
+_SIDE_FIELDS = ('id', 'username', 'email', 'profile__is_online', 'profile__last_seen', 'profile__preferred_language')
+
+
+def _cache_key(user_id) -> str:
+    return f"chat:friends:{user_id}"
+
+
+def build_friends(user_id) -> List[dict]:
+    """Friends of a user with presence and language, in one query and without writes."""
+    rows = Friendship.objects.filter(
+        Q(sender_id=user_id) | Q(receiver_id=user_id), status='accepted'
+    ).values(*[f"{side}__{field}" for side in ('sender', 'receiver') for field in _SIDE_FIELDS])
+
+    friends = []
+    for row in rows:
+        side = 'receiver' if row['sender__id'] == user_id else 'sender'
+        last_seen = row[f'{side}__profile__last_seen']
+        friends.append({
+            'id': row[f'{side}__id'],
+            'name': row[f'{side}__username'],
+            'email': row[f'{side}__email'],
+            'is_online': bool(row[f'{side}__profile__is_online']),
+            'last_seen': last_seen.isoformat() if last_seen else None,
+            'preferred_language': row[f'{side}__profile__preferred_language'] or 'en',
+        })
+    return friends
+
+
+def friends_snapshot(user_id) -> Tuple[List[dict], str]:
+    """
+    Return (friends, etag), served from the cache when the snapshot is still valid.
+    """
+    snapshot = cache.get(_cache_key(user_id))
+    if snapshot is None:
+        friends = build_friends(user_id)
+        etag = '"%s"' % hashlib.sha1(json.dumps(friends, sort_keys=True).encode()).hexdigest()
+        snapshot = (friends, etag)
+        cache.set(_cache_key(user_id), snapshot, snapshot_ttl())
+    return snapshot
+
+
+def snapshot_ttl() -> int:
+    return LOCAL_SNAPSHOT_TTL if isinstance(caches['default'], LocMemCache) else SNAPSHOT_TTL
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`: a list of entity tags, or "*", compared
+    weakly (W/"x" matches "x") as RFC 9110 requires for If-None-Match.
+    """
+    etags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match or '')}
+    return '*' in etags or etag.removeprefix('W/') in etags
+
+
+def with_live_presence(friends: List[dict], etag: str) -> Tuple[List[dict], str]:
+    """
+    Overlay is_online from the presence service, which is fresher than the
+    periodically flushed profile rows. The ETag covers the overlay.
+    """
+    from .presence import get_presence
+    try:
+        online = get_presence().online_users(friend['id'] for friend in friends)
+    except Exception:
+        return friends, etag
+    friends = [{**friend, 'is_online': friend['id'] in online} for friend in friends]
+    bitmap = "".join("1" if friend['is_online'] else "0" for friend in friends)
+    return friends, '"%s"' % hashlib.sha1(f"{etag}{bitmap}".encode()).hexdigest()
+
+
+def invalidate_friends(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def friend_ids(user_id) -> List[int]:
+    """Ids of everyone with an accepted friendship with the user."""
+    return [
+        receiver_id if sender_id == user_id else sender_id
+        for sender_id, receiver_id in Friendship.objects.filter(
+            Q(sender_id=user_id) | Q(receiver_id=user_id), status='accepted'
+        ).values_list('sender_id', 'receiver_id')
+    ]
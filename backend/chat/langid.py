@@ -0,0 +1,174 @@
+"""
+langid.py
+
+On-box language identification for the languages the translator serves.
+A multinomial naive Bayes model over character 1-3-grams, trained at import time from short
+built-in chat-style texts and the sample corpus; scoring a message is a few hundred dict
+lookups, so it runs before every model call. Only texts with enough letters are classified,
+and callers act on a result only when the best language beats the runner-up by at least
+TRANSLATOR_LANGID_MIN_MARGIN (mean log-likelihood per n-gram).
+Italian and Portuguese share most of their n-grams with Spanish and would otherwise be
+confidently labelled Spanish, so they are trained as reject classes: a text that scores
+best as one of them is never reported. Other unserved languages have no such profile and
+can still be labelled with a close served language (Dutch as German, for instance).
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from .sample_corpus import SAMPLE_SENTENCES
+
+LANGID_ENABLED = os.environ.get("TRANSLATOR_LANGID", "1") == "1"
+MIN_LETTERS = int(os.environ.get("TRANSLATOR_LANGID_MIN_LETTERS", 12))  # Shorter texts are not classified
+MIN_MARGIN = float(os.environ.get("TRANSLATOR_LANGID_MIN_MARGIN", 0.2))
+MAX_SCAN_CHARS = 400  # The opening of a long message is enough to tell its language
+NGRAM_ORDERS = (1, 2, 3)
+SMOOTHING = 0.5
+
+# Everyday chat vocabulary, heavy on function words, which carry most of the signal in short texts
+TRAINING_TEXT = {
+    "en": (
+        "hey what are you doing tonight? i think we should meet at the station after work. "
+        "thanks, that sounds good to me. sorry i was late, the bus did not come. did you see the "
+        "message from your brother? we have to finish this before the weekend. where is the "
+        "meeting and what time does it start? i don't know yet, i will let you know later. could "
+        "you send me the file again please? this is the best day of the week. let me check with "
+        "them and get back to you. it was really nice to see you again, we should do this more "
+        "often. have you already eaten? i would like to go with you if that is okay. they said "
+        "that the price would be lower next month. please call me when you get home. what do you "
+        "think about the new plan? good night and see you tomorrow. how much does it cost? my "
+        "phone was off all morning so i could not answer. which one do you want, this or that?"
+    ),
+    "es": (
+        "oye, ¿qué haces esta noche? creo que deberíamos vernos en la estación después del trabajo. "
+        "gracias, me parece bien. perdón por llegar tarde, el autobús no vino. ¿viste el mensaje de "
+        "tu hermano? tenemos que terminar esto antes del fin de semana. ¿dónde es la reunión y a qué "
+        "hora empieza? todavía no lo sé, te aviso más tarde. ¿me puedes enviar el archivo otra vez, "
+        "por favor? este es el mejor día de la semana. déjame hablar con ellos y te digo algo. fue "
+        "muy bonito verte de nuevo, tenemos que hacerlo más a menudo. ¿ya has comido? me gustaría ir "
+        "contigo si no te importa. dijeron que el precio sería más bajo el mes que viene. llámame "
+        "cuando llegues a casa. ¿qué piensas del nuevo plan? buenas noches y hasta mañana. ¿cuánto "
+        "cuesta? tenía el teléfono apagado toda la mañana y no pude contestar. ¿cuál quieres, este o ese?"
+    ),
+    "fr": (
+        "salut, tu fais quoi ce soir ? je pense qu'on devrait se retrouver à la gare après le travail. "
+        "merci, ça me va très bien. désolé pour le retard, le bus n'est pas venu. tu as vu le message "
+        "de ton frère ? nous devons finir ça avant le week-end. où est la réunion et à quelle heure "
+        "est-ce qu'elle commence ? je ne sais pas encore, je te dirai plus tard. tu peux me renvoyer "
+        "le fichier, s'il te plaît ? c'est le meilleur jour de la semaine. laisse-moi voir avec eux et "
+        "je te redis. c'était vraiment sympa de te revoir, il faut qu'on le fasse plus souvent. tu as "
+        "déjà mangé ? j'aimerais venir avec toi si ça ne te dérange pas. ils ont dit que le prix serait "
+        "plus bas le mois prochain. appelle-moi quand tu rentres chez toi. qu'est-ce que tu penses du "
+        "nouveau projet ? bonne nuit et à demain. combien ça coûte ? mon téléphone était éteint toute "
+        "la matinée donc je n'ai pas pu répondre. lequel tu veux, celui-ci ou celui-là ?"
+    ),
+    "de": (
+        "hey, was machst du heute abend? ich denke, wir sollten uns nach der arbeit am bahnhof treffen. "
+        "danke, das klingt gut für mich. sorry, dass ich zu spät bin, der bus ist nicht gekommen. hast "
+        "du die nachricht von deinem bruder gesehen? wir müssen das vor dem wochenende fertig machen. "
+        "wo ist das treffen und wann fängt es an? ich weiß es noch nicht, ich sage dir später bescheid. "
+        "kannst du mir die datei bitte noch einmal schicken? das ist der beste tag der woche. lass mich "
+        "mit ihnen sprechen, dann melde ich mich. es war wirklich schön, dich wiederzusehen, das sollten "
+        "wir öfter machen. hast du schon gegessen? ich würde gern mit dir kommen, wenn das in ordnung "
+        "ist. sie haben gesagt, dass der preis nächsten monat niedriger wird. ruf mich an, wenn du zu "
+        "hause bist. was hältst du von dem neuen plan? gute nacht und bis morgen. wie viel kostet das? "
+        "mein handy war den ganzen morgen aus, deshalb konnte ich nicht antworten. welches willst du?"
+    ),
+    # Reject classes: close to Spanish and French, so they get profiles of their own rather than
+    # scoring as one of the served languages. They are never reported as a confident result.
+    "it": (
+        "ehi, cosa fai stasera? penso che dovremmo vederci alla stazione dopo il lavoro. grazie, per me "
+        "va benissimo. scusa il ritardo, l'autobus non è arrivato. hai visto il messaggio di tuo fratello? "
+        "dobbiamo finire questo prima del fine settimana. dov'è la riunione e a che ora comincia? non lo so "
+        "ancora, ti faccio sapere più tardi. mi puoi mandare di nuovo il file, per favore? questo è il giorno "
+        "più bello della settimana. fammi sentire con loro e ti richiamo. è stato davvero bello rivederti, "
+        "dovremmo farlo più spesso. hai già mangiato? mi piacerebbe venire con te se non ti dispiace. hanno "
+        "detto che il prezzo sarà più basso il mese prossimo. chiamami quando arrivi a casa. cosa ne pensi "
+        "del nuovo piano? buonanotte e a domani. quanto costa? avevo il telefono spento tutta la mattina e "
+        "non ho potuto rispondere. quale vuoi, questo o quello?"
+    ),
+    "pt": (
+        "oi, o que você vai fazer hoje à noite? acho que a gente devia se encontrar na estação depois do "
+        "trabalho. obrigado, para mim está ótimo. desculpa o atraso, o ônibus não veio. você viu a mensagem "
+        "do seu irmão? temos que terminar isso antes do fim de semana. onde é a reunião e a que horas começa? "
+        "ainda não sei, eu te aviso mais tarde. você pode me mandar o arquivo de novo, por favor? este é o "
+        "melhor dia da semana. deixa eu falar com eles e depois te digo. foi muito bom te ver de novo, "
+        "precisamos fazer isso mais vezes. você já comeu? eu gostaria de ir com você se não se importar. "
+        "eles disseram que o preço vai ser mais baixo no mês que vem. me liga quando chegar em casa. o que "
+        "você acha do novo plano? boa noite e até amanhã. quanto custa? meu celular ficou desligado a manhã "
+        "toda e não consegui responder. qual você quer, este ou esse?"
+    ),
+}
+REJECT_LANGUAGES = ("it", "pt")
+
+_NON_LETTER_RE = re.compile(r"[^\w']+|[\d_]+")
+
+
+def _normalize(text: str) -> str:
+    return " " + _NON_LETTER_RE.sub(" ", text.lower()).strip() + " "
+
+
+def _ngrams(text: str) -> Counter:
+    normalized = _normalize(text)
+    grams = Counter()
+    for n in NGRAM_ORDERS:
+        grams.update(normalized[i:i + n] for i in range(len(normalized) - n + 1))
+    del grams[" "]
+    return grams
+
+
+class LanguageIdentifier:
+    """
+    Naive Bayes language classifier over character n-grams.
+    """
+    def __init__(self, texts: Dict[str, str]):
+        counts = {language: _ngrams(text) for language, text in texts.items()}
+        vocabulary = len(set().union(*counts.values()))
+        self.languages = tuple(counts)
+        self.log_probs: Dict[str, Dict[str, float]] = {}
+        self.unseen: Dict[str, float] = {}
+        for language, grams in counts.items():
+            total = sum(grams.values()) + SMOOTHING * vocabulary
+            self.log_probs[language] = {g: math.log((c + SMOOTHING) / total) for g, c in grams.items()}
+            self.unseen[language] = math.log(SMOOTHING / total)
+
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Return (language, margin over the runner-up in mean log-likelihood per n-gram), or
+        (None, 0.0) for texts with fewer than MIN_LETTERS letters.
+        """
+        text = text[:MAX_SCAN_CHARS]
+        if sum(ch.isalpha() for ch in text) < MIN_LETTERS:
+            return None, 0.0
+        grams = _ngrams(text)
+        # Per n-gram rather than total, so the margin does not grow with text length alone
+        size = sum(grams.values())
+        scores = sorted((
+            (sum(count * self.log_probs[language].get(g, self.unseen[language]) for g, count in grams.items()) / size,
+             language)
+            for language in self.languages
+        ), reverse=True)
+        return scores[0][1], scores[0][0] - scores[1][0]
+
+
+_identifier = LanguageIdentifier({
+    language: TRAINING_TEXT[language] + " " + " ".join(SAMPLE_SENTENCES.get(language, []))
+    for language in TRAINING_TEXT
+})
+
+
+def identify(text: str) -> Tuple[Optional[str], float]:
+    """Most likely language of `text` and its margin; (None, 0.0) when too short to tell."""
+    return _identifier.classify(text)
+
+
+def confident_language(text: str) -> Optional[str]:
+    """
+    The language of `text` if identified with at least MIN_MARGIN, else None; also None
+    for the reject classes, which are languages the translator does not serve.
+    """
+    language, margin = identify(text)
+    return language if margin >= MIN_MARGIN and language not in REJECT_LANGUAGES else None
@@ -0,0 +1,211 @@
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _init_worker(torch_threads, niceness):
+    # Inference runs right here: no nested worker pool, scheduler threads or shared result cache
+    os.nice(niceness)  # Live daphne/translation workers win any contention for the cores
+    os.environ["TRANSLATOR_WORKERS"] = "0"
+    os.environ["TRANSLATOR_BATCHING"] = "0"
+    os.environ["TRANSLATOR_RESULT_CACHE"] = "0"
+    import torch
+    torch.set_num_threads(torch_threads)
+
+
+def _translate_chunk(texts, src_lang, tgt_lang, profile):
+    """Translate one length-sorted chunk; long texts are segmented like in serving."""
+    from chat.segmentation import should_segment
+    from chat.translator import translate, translate_batch
+
+    short = [i for i, text in enumerate(texts) if not should_segment(text)]
+    results = [None] * len(texts)
+    for i, text in zip(short, translate_batch([texts[i] for i in short], src_lang, tgt_lang, profile) if short else []):
+        results[i] = text
+    for i, text in enumerate(texts):
+        if results[i] is None:
+            results[i] = translate(text, src_lang, tgt_lang, profile)
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Translate or re-translate stored messages offline: Message.translated_content (missing, or all "
+        "with --retranslate), or MessageTranslation rows produced by an older model (--stale-translations). "
+        "Rows are streamed in id order, grouped by language pair, translated in length-sorted batches on "
+        "dedicated worker processes and written back with bulk_update. Progress is checkpointed to a file "
+        "so an interrupted run continues with --resume (with the same --pairs, --retranslate and "
+        "--stale-translations)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pairs", nargs="*", help="Language pairs as src-tgt (default: all supported)")
+        parser.add_argument("--retranslate", action="store_true", help="Also redo messages that already have a translation")
+        parser.add_argument("--stale-translations", action="store_true",
+                            help="Redo MessageTranslation rows whose model@revision is not the current one")
+        parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+        parser.add_argument("--torch-threads", type=int, default=None, help="Per worker (default: cores / workers)")
+        parser.add_argument("--nice", type=int, default=10, help="Scheduling niceness added to worker processes")
+        parser.add_argument("--batch-size", type=int, default=16, help="Texts per generate() call")
+        parser.add_argument("--buffer-rows", type=int, default=512, help="Rows buffered per pair before sorting by length")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per database round trip")
+        parser.add_argument("--profile", choices=["quality", "balanced", "fast"], default="quality")
+        parser.add_argument("--checkpoint", default=str(Path(settings.BASE_DIR) / "backfill_translations.checkpoint.json"))
+        parser.add_argument("--resume", action="store_true", help="Continue after the id stored in --checkpoint")
+        parser.add_argument("--limit", type=int, help="Stop after this many rows")
+        parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines")
+
+    def handle(self, *args, **options):
+        from chat.models import Message, MessageTranslation
+        from chat.translator import SUPPORTED_LANGUAGE_PAIRS, model_version
+
+        pairs = [tuple(p.split("-", 1)) for p in options["pairs"]] if options["pairs"] else list(SUPPORTED_LANGUAGE_PAIRS)
+        unsupported = [pair for pair in pairs if pair not in SUPPORTED_LANGUAGE_PAIRS]
+        if unsupported:
+            raise CommandError(f"Unsupported language pair: {'-'.join(unsupported[0])}")
+        self.stale = options["stale_translations"]
+        self.versions = {pair: model_version(*pair) for pair in pairs}
+        # Everything that decides which rows a run visits; resuming with other values would skip rows
+        self.selection = {
+            "pairs": sorted("-".join(pair) for pair in pairs),
+            "retranslate": options["retranslate"],
+            "stale_translations": self.stale,
+        }
+
+        start_after = done_before = 0
+        checkpoint = Path(options["checkpoint"])
+        if options["resume"] and checkpoint.exists():
+            state = json.loads(checkpoint.read_text())
+            mismatched = [key for key, value in self.selection.items() if state.get(key) != value]
+            if mismatched:
+                raise CommandError(
+                    f"{checkpoint} belongs to a run with different "
+                    f"{', '.join('--' + key.replace('_', '-') for key in mismatched)}; run without --resume to start over"
+                )
+            start_after, done_before = state["last_id"], state["done"]
+            self.stdout.write(f"Resuming after id {start_after} ({state['done']} rows done before)")
+
+        if self.stale:
+            self.model = MessageTranslation
+            queryset = MessageTranslation.objects.filter(language__in={tgt for _, tgt in pairs}).values_list(
+                "id", "message__content", "message__source_language", "language", "model_version",
+            )
+            self.fields = ["content", "model_version"]
+        else:
+            self.model = Message
+            queryset = Message.objects.filter(
+                source_language__in={src for src, _ in pairs}, target_language__in={tgt for _, tgt in pairs},
+            )
+            if not options["retranslate"]:
+                queryset = queryset.filter(translated_content__isnull=True)
+            queryset = queryset.values_list("id", "content", "source_language", "target_language")
+            self.fields = ["translated_content", "is_translated"]
+        queryset = queryset.filter(id__gt=start_after).order_by("id")
+        if options["limit"]:
+            queryset = queryset[:options["limit"]]
+
+        workers = max(1, options["workers"])
+        torch_threads = options["torch_threads"] or max(1, (os.cpu_count() or 1) // workers)
+        self.options = options
+        self.checkpoint = checkpoint
+        self.buffers = {pair: [] for pair in pairs}  # pair -> [(id, text)]
+        self.in_flight = deque()  # (future, pair, ids) in submission order
+        self.done_before = self.done = done_before
+        self.translated = self.failed = self.skipped = 0
+        self.last_streamed = start_after
+        self.started = self.last_report = time.monotonic()
+        total = queryset.count()
+        self.stdout.write(f"{total} rows to process with {workers} workers x {torch_threads} torch threads")
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(torch_threads, options["nice"]),
+        ) as self.executor:
+            for row in queryset.iterator(chunk_size=options["chunk_size"]):
+                self.last_streamed = row[0]
+                pair = (row[2], row[3])
+                if pair not in self.buffers or (self.stale and row[4] == self.versions[pair]):
+                    self.skipped += 1
+                    continue
+                self.buffers[pair].append((row[0], row[1]))
+                if len(self.buffers[pair]) >= options["buffer_rows"]:
+                    self._dispatch(pair)
+                while len(self.in_flight) > 2 * workers:  # Bound memory: wait for the oldest chunk
+                    self._collect()
+                self._report(total)
+            for pair in self.buffers:
+                self._dispatch(pair)
+            while self.in_flight:
+                self._collect()
+        self._save_checkpoint(finished=True)
+        self._report(total, force=True)
+
+    def _dispatch(self, pair):
+        rows = sorted(self.buffers[pair], key=lambda row: len(row[1]))  # Similar lengths pad less
+        self.buffers[pair] = []
+        size = self.options["batch_size"]
+        for start in range(0, len(rows), size):
+            chunk = rows[start:start + size]
+            future = self.executor.submit(
+                _translate_chunk, [text for _, text in chunk], *pair, self.options["profile"],
+            )
+            self.in_flight.append((future, pair, [row_id for row_id, _ in chunk]))
+
+    def _collect(self):
+        from chat.translator import FALLBACK_MESSAGE
+
+        future, pair, ids = self.in_flight.popleft()
+        try:
+            results = future.result()
+        except Exception as e:
+            # Rows stay untranslated; a later run without --resume picks them up again
+            logging.error(f"Backfill chunk of {len(ids)} {'-'.join(pair)} rows failed: {e}")
+            results = [FALLBACK_MESSAGE] * len(ids)
+        objects = []
+        for row_id, text in zip(ids, results):
+            if text == FALLBACK_MESSAGE:
+                self.failed += 1
+                continue
+            if self.stale:
+                objects.append(self.model(id=row_id, content=text, model_version=self.versions[pair]))
+            else:
+                objects.append(self.model(id=row_id, translated_content=text, is_translated=True))
+        self.model.objects.bulk_update(objects, self.fields, batch_size=500)
+        self.translated += len(objects)
+        self.done += len(ids)
+        self._save_checkpoint()
+
+    def _save_checkpoint(self, finished=False):
+        # Everything up to the smallest id not yet written is safe to skip on resume
+        pending = [row_id for rows in self.buffers.values() for row_id, _ in rows]
+        pending += [min(ids) for _, _, ids in self.in_flight]  # Chunks are sorted by length, not id
+        last_id = self.last_streamed if finished or not pending else min(pending) - 1
+        state = {"last_id": last_id, "done": self.done, **self.selection}
+        tmp = self.checkpoint.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.checkpoint)
+
+    def _report(self, total, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.options["report_every"]:
+            return
+        self.last_report = now
+        elapsed = max(now - self.started, 1e-9)
+        done = self.done - self.done_before
+        rate = done / elapsed
+        remaining = max(0, total - done - self.skipped)
+        eta = f", eta {remaining / rate:.0f}s" if rate and not force else ""
+        self.stdout.write(
+            f"{self.done} done ({self.translated} written, {self.failed} failed, {self.skipped} skipped) "
+            f"in {elapsed:.0f}s, {rate:.1f} rows/s{eta}"
+        )
@@ -0,0 +1,94 @@
+import copy
+import difflib
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.sample_corpus import SAMPLE_SENTENCES
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare latency, memory and output divergence of a reduced-precision inference "
+        "mode against fp32 on the built-in sample corpus."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pairs", nargs="*", help="Language pairs as src-tgt (default: all supported)")
+        parser.add_argument("--precision", choices=["int8", "bf16"], default="int8")
+        parser.add_argument("--profile", choices=["quality", "balanced", "fast"], help="Decoding profile (default: TRANSLATOR_DECODING_PROFILE)")
+        parser.add_argument("--runs", type=int, default=3, help="Timed repetitions per sentence")
+        parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+
+    def handle(self, *args, **options):
+        import torch
+        from transformers import MarianMTModel, MarianTokenizer
+        from chat.decoding import DEFAULT_PROFILE, decoding_kwargs
+        from chat.translator import (
+            SUPPORTED_LANGUAGE_PAIRS, apply_precision, bf16_supported, model_size_bytes,
+        )
+
+        options["profile"] = options["profile"] or DEFAULT_PROFILE
+        if options["precision"] == "bf16" and not bf16_supported():
+            self.stderr.write("This CPU has no native bf16 support; bf16 results will equal fp32.")
+
+        pairs = [tuple(p.split("-", 1)) for p in options["pairs"]] if options["pairs"] else list(SUPPORTED_LANGUAGE_PAIRS)
+        results = []
+        for pair in pairs:
+            if pair not in SUPPORTED_LANGUAGE_PAIRS:
+                raise CommandError(f"Unsupported language pair: {'-'.join(pair)}")
+            if pair[0] not in SAMPLE_SENTENCES:
+                self.stderr.write(f"No sample corpus for '{pair[0]}', skipping {'-'.join(pair)}")
+                continue
+            model_name = SUPPORTED_LANGUAGE_PAIRS[pair]
+            tokenizer = MarianTokenizer.from_pretrained(model_name)
+            baseline = MarianMTModel.from_pretrained(model_name).eval()
+            variant = apply_precision(copy.deepcopy(baseline), options["precision"])
+            corpus = SAMPLE_SENTENCES[pair[0]]
+
+            def run(model):
+                outputs, latencies = [], []
+                with torch.no_grad():
+                    for text in corpus:
+                        samples = []
+                        for _ in range(max(1, options["runs"])):
+                            started = time.perf_counter()
+                            inputs = tokenizer([text], return_tensors="pt", truncation=True, max_length=512)
+                            generated = model.generate(**inputs, **decoding_kwargs(options["profile"], inputs["input_ids"].shape[1]))
+                            samples.append(time.perf_counter() - started)
+                        outputs.append(tokenizer.batch_decode(generated, skip_special_tokens=True)[0])
+                        latencies.append(statistics.median(samples))
+                return outputs, latencies
+
+            base_out, base_lat = run(baseline)
+            var_out, var_lat = run(variant)
+            similarity = [difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(base_out, var_out)]
+            results.append({
+                "pair": "-".join(pair),
+                "model": model_name,
+                "precision": options["precision"],
+                "profile": options["profile"],
+                "fp32_latency_ms": round(1000 * statistics.mean(base_lat), 2),
+                "variant_latency_ms": round(1000 * statistics.mean(var_lat), 2),
+                "speedup": round(sum(base_lat) / sum(var_lat), 2) if sum(var_lat) else None,
+                "fp32_bytes": model_size_bytes(baseline),
+                "variant_bytes": model_size_bytes(variant),
+                "exact_match": round(sum(a == b for a, b in zip(base_out, var_out)) / len(corpus), 3),
+                "mean_similarity": round(statistics.mean(similarity), 3),
+                "worst": min(zip(similarity, corpus, base_out, var_out))[1:],
+            })
+            del baseline, variant
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
+            return
+        for r in results:
+            self.stdout.write(
+                f"{r['pair']} [{r['precision']}] latency {r['fp32_latency_ms']}ms -> {r['variant_latency_ms']}ms "
+                f"(x{r['speedup']}), memory {r['fp32_bytes'] / 2**20:.1f}MB -> {r['variant_bytes'] / 2**20:.1f}MB, "
+                f"exact match {r['exact_match']:.0%}, similarity {r['mean_similarity']:.3f}"
+            )
+            source, fp32_text, variant_text = r["worst"]
+            self.stdout.write(f"  most divergent: {source!r}\n    fp32:    {fp32_text!r}\n    variant: {variant_text!r}")
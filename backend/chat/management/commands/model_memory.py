@@ -0,0 +1,86 @@
+import json
+import multiprocessing
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _load_and_measure(model_names, root, barrier, results):
+    from chat.model_store import load_shared, mapping_stats
+
+    models = [load_shared(name, root) for name in model_names]  # Keep the mappings alive
+    for model, _ in models:
+        for param in model.parameters():
+            param.data.sum()  # Touch every weight page
+    barrier.wait()  # All processes hold their mappings before anyone measures
+    results.put({name: mapping_stats(name, root) for name in model_names})
+    barrier.wait()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load models from the shared model store in several processes at once and report "
+        "resident memory per pair without sharing (rss) and with sharing (pss)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pairs", nargs="*", help="Language pairs as src-tgt (default: all supported)")
+        parser.add_argument("--processes", type=int, default=2, help="Worker processes mapping the models")
+        parser.add_argument("--store", help="Model store directory (default: TRANSLATOR_MODEL_STORE_DIR)")
+        parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+
+    def handle(self, *args, **options):
+        from chat.model_store import MODEL_STORE_DIR, ensure_converted
+        from chat.translator import SUPPORTED_LANGUAGE_PAIRS
+
+        root = options["store"] or MODEL_STORE_DIR
+        if not root:
+            raise CommandError("Set TRANSLATOR_MODEL_STORE_DIR or pass --store")
+        pairs = [tuple(p.split("-", 1)) for p in options["pairs"]] if options["pairs"] else list(SUPPORTED_LANGUAGE_PAIRS)
+        unsupported = [pair for pair in pairs if pair not in SUPPORTED_LANGUAGE_PAIRS]
+        if unsupported:
+            raise CommandError(f"Unsupported language pair: {'-'.join(unsupported[0])}")
+        model_names = sorted({SUPPORTED_LANGUAGE_PAIRS[pair] for pair in pairs})
+        for name in model_names:
+            ensure_converted(name, root)  # Convert once up front instead of racing in the children
+
+        processes = max(1, options["processes"])
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(processes)
+        queue = context.Queue()
+        children = [
+            context.Process(target=_load_and_measure, args=(model_names, root, barrier, queue))
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+        measurements = [queue.get() for _ in children]
+        for child in children:
+            child.join()
+
+        results = []
+        for pair in pairs:
+            name = SUPPORTED_LANGUAGE_PAIRS[pair]
+            stats = [m[name] for m in measurements if m.get(name)]
+            rss = sum(s["rss_bytes"] for s in stats) // max(1, len(stats))
+            pss = sum(s["pss_bytes"] for s in stats) // max(1, len(stats))
+            results.append({
+                "pair": "-".join(pair),
+                "model": name,
+                "file_bytes": stats[0]["file_bytes"] if stats else 0,
+                "processes": processes,
+                "rss_bytes_per_process": rss,
+                "pss_bytes_per_process": pss,
+                "host_bytes_without_sharing": rss * processes,
+                "host_bytes_with_sharing": pss * processes,
+            })
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for r in results:
+            self.stdout.write(
+                f"{r['pair']}: {r['processes']} processes, "
+                f"{r['host_bytes_without_sharing'] / 2**20:.1f}MB without sharing, "
+                f"{r['host_bytes_with_sharing'] / 2**20:.1f}MB with sharing "
+                f"(rss {r['rss_bytes_per_process'] / 2**20:.1f}MB, pss {r['pss_bytes_per_process'] / 2**20:.1f}MB per process)"
+            )
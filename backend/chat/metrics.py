@@ -0,0 +1,284 @@
+"""
+metrics.py
+
+In-process metrics in the Prometheus text exposition format, served at /metrics.
+Counters, gauges and histograms are plain dicts of floats behind one lock each, so an
+observation costs a bisect and an addition; there is no dependency on prometheus_client.
+Values are per process: with several daphne workers, scrape each one (or aggregate by
+instance label). With TRANSLATOR_WORKERS > 0 the tokenize/generate/decode stages run in
+the inference processes, which return their timings to be recorded here (model cache
+series still describe this process only).
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans sub-millisecond parsing up to slow cold-model generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = Lock()
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _Sampled(_Metric):
+    """Base for counters and gauges; with `function` the values are read at scrape time instead."""
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+        self.function = function
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        if self.function is not None:
+            try:
+                values = list(self.function().items())
+            except Exception:
+                values = []  # A failing source must not break the whole scrape
+        else:
+            with self.lock:
+                values = list(self.values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values
+        ]
+
+
+class Counter(_Sampled):
+    """A monotonic counter; a `function` must return running totals (e.g. a snapshot's counters)."""
+    kind = "counter"
+
+
+class Gauge(_Sampled):
+    """A settable gauge."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[LabelValues, List[float]] = {}  # Per-bucket counts, then +Inf count, then sum
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self.lock:
+            values = [(key, list(series)) for key, series in self.values.items()]
+        lines = self.header()
+        for key, series in values:
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, float("inf")), series):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+        self.lock = Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics)
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = (), function=None) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames, function))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (), function=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, function))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Chat pipeline (source is "ws" for ChatTranslateConsumer, "http" for the REST views)
+STAGE_SECONDS = histogram(
+    "chat_stage_seconds", "Latency of chat pipeline stages (json_parse, translate, db_save, send, total).",
+    ("source", "stage"),
+)
+MESSAGES = counter("chat_messages_total", "Translation requests handled, by language pair.", ("source", "src", "tgt"))
+FAILURES = counter(
+    "chat_translation_failures_total", "Translations that returned the fallback message.", ("source", "src", "tgt"),
+)
+CONNECTIONS = gauge("chat_websocket_connections", "Open WebSocket connections in this process.")
+
+# Inference
+INFERENCE_SECONDS = histogram(
+    "translator_stage_seconds", "Latency of inference stages per batch (tokenize, generate, decode).", ("stage",),
+)
+BATCH_TEXTS = counter("translator_batch_texts_total", "Texts run through generate(), by language pair.", ("src", "tgt"))
+BATCH_SIZE = histogram(
+    "translator_batch_size", "Texts per micro-batch formed by the batching scheduler, by language pair.",
+    ("src", "tgt"), buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+QUEUE_WAIT_SECONDS = histogram(
+    "translator_queue_wait_seconds", "Time a text waited in the batching queue before its batch started.",
+    ("src", "tgt"), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LANGID_OUTCOMES = counter(
+    "translator_langid_total",
+    "Language identification before translation: untranslatable and already_target are returned without "
+    "a model call, source_corrected is translated from the detected language (also confirmed, undetermined).",
+    ("outcome",),
+)
+MODEL_LOAD_SECONDS = histogram(
+    "translator_model_load_seconds", "Time to load a model into the model cache.",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+
+
+def _model_cache_counters():
+    from .translator import _model_cache
+    snapshot = _model_cache.snapshot()
+    return {(event,): snapshot[event] for event in ("hits", "misses", "loads", "load_waits", "evictions")}
+
+
+def _model_cache_bytes():
+    from .translator import _model_cache
+    return {(): _model_cache.snapshot()["resident_bytes"]}
+
+
+def _result_cache_counters():
+    from .result_cache import get_result_cache
+    cache = get_result_cache()
+    if cache is None:
+        return {}
+    with cache.lock:
+        return {(event,): count for event, count in cache.stats.items()}
+
+
+def _result_cache_size():
+    from .result_cache import get_result_cache
+    cache = get_result_cache()
+    if cache is None:
+        return {}
+    snapshot = cache.snapshot()
+    return {(key,): snapshot[key] for key in ("entries", "bytes")}
+
+
+def _translation_memory_counters():
+    from .translation_memory import get_translation_memory
+    memory = get_translation_memory()
+    if memory is None:
+        return {}
+    snapshot = memory.snapshot()
+    return {(key,): snapshot[key] for key in ("segments", "exact_hits", "fuzzy_hits", "misses", "stored", "errors")}
+
+
+def _load():
+    from .admission import get_admission
+    snapshot = get_admission().snapshot()
+    return {(key,): snapshot[key] for key in ("in_flight", "queue_depth")}
+
+
+def _admission_outcomes():
+    from .admission import get_admission
+    snapshot = get_admission().snapshot()
+    return {(key,): snapshot[key] for key in ("admitted", "rate_limited", "shed")}
+
+
+def _decoding_served():
+    from .decoding import get_decoding_controller
+    return {(profile,): count for profile, count in get_decoding_controller().snapshot()["served"].items()}
+
+
+# Read from the existing snapshots at scrape time, so the hot paths pay nothing extra
+counter("translator_model_cache_events_total", "ModelCache events since start (hits, misses, loads, load_waits, "
+        "evictions).", ("event",), _model_cache_counters)
+gauge("translator_model_cache_resident_bytes", "Bytes of model weights held by the model cache.",
+      function=_model_cache_bytes)
+counter("translator_result_cache_events_total", "Result cache events since start (hits, shared_hits, misses, "
+        "evictions, expirations, invalidations, shared_errors).", ("event",), _result_cache_counters)
+gauge("translator_result_cache_size", "Local result cache size (entries, bytes).", ("key",), _result_cache_size)
+counter("translator_memory_segments_total", "Translation memory events since start (segments looked up, exact_hits, "
+        "fuzzy_hits, misses, stored, errors).", ("event",), _translation_memory_counters)
+gauge("chat_admission", "Admission control state (in_flight, queue_depth).", ("key",), _load)
+counter("chat_admission_total", "Admission decisions since start (admitted, rate_limited, shed).", ("outcome",),
+        _admission_outcomes)
+counter("translator_decoding_profile_requests_total", "Requests served per decoding profile since start.",
+        ("profile",), _decoding_served)
+
+
+def render() -> str:
+    return REGISTRY.render()
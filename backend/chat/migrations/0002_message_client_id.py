@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 21:40
+
+import uuid
+
+from django.db import migrations, models
+
+
+def gen_client_ids(apps, schema_editor):
+    Message = apps.get_model('chat', 'Message')
+    for message in Message.objects.filter(client_id__isnull=True).only('id').iterator(chunk_size=2000):
+        message.client_id = uuid.uuid4()
+        message.save(update_fields=['client_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='client_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(gen_client_ids, reverse_code=migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='message',
+            name='client_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 21:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_conversation_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageTranslation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=10)),
+                ('content', models.TextField()),
+                ('model_version', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='translations', to='chat.message')),
+            ],
+            options={
+                'unique_together': {('message', 'language')},
+            },
+        ),
+    ]
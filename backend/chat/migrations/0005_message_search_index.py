@@ -0,0 +1,117 @@
+import logging
+
+from django.db import migrations
+
+# SQLite drops a table's triggers when Django rebuilds it (e.g. AlterField on Message or
+# MessageTranslation); a migration doing that must run SQLITE_FORWARD's triggers again.
+
+# Keep the conversation token in step with search.conversation_token()
+CONVERSATION = "'c' || min({m}.sender_id, {m}.receiver_id) || 'x' || max({m}.sender_id, {m}.receiver_id)"
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE chat_message_fts USING fts5("
+    "conversation, content, translated_content, prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE chat_messagetranslation_fts USING fts5("
+    "conversation, content, prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+
+    f"""CREATE TRIGGER chat_message_fts_insert AFTER INSERT ON chat_message BEGIN
+        INSERT INTO chat_message_fts (rowid, conversation, content, translated_content)
+        VALUES (new.id, {CONVERSATION.format(m='new')}, new.content, coalesce(new.translated_content, ''));
+    END""",
+    f"""CREATE TRIGGER chat_message_fts_update
+        AFTER UPDATE OF content, translated_content, sender_id, receiver_id ON chat_message BEGIN
+        DELETE FROM chat_message_fts WHERE rowid = old.id;
+        INSERT INTO chat_message_fts (rowid, conversation, content, translated_content)
+        VALUES (new.id, {CONVERSATION.format(m='new')}, new.content, coalesce(new.translated_content, ''));
+    END""",
+    """CREATE TRIGGER chat_message_fts_delete AFTER DELETE ON chat_message BEGIN
+        DELETE FROM chat_message_fts WHERE rowid = old.id;
+    END""",
+
+    f"""CREATE TRIGGER chat_messagetranslation_fts_insert AFTER INSERT ON chat_messagetranslation BEGIN
+        INSERT INTO chat_messagetranslation_fts (rowid, conversation, content)
+        SELECT new.id, {CONVERSATION.format(m='m')}, new.content FROM chat_message m WHERE m.id = new.message_id;
+    END""",
+    f"""CREATE TRIGGER chat_messagetranslation_fts_update
+        AFTER UPDATE OF content, message_id ON chat_messagetranslation BEGIN
+        DELETE FROM chat_messagetranslation_fts WHERE rowid = old.id;
+        INSERT INTO chat_messagetranslation_fts (rowid, conversation, content)
+        SELECT new.id, {CONVERSATION.format(m='m')}, new.content FROM chat_message m WHERE m.id = new.message_id;
+    END""",
+    """CREATE TRIGGER chat_messagetranslation_fts_delete AFTER DELETE ON chat_messagetranslation BEGIN
+        DELETE FROM chat_messagetranslation_fts WHERE rowid = old.id;
+    END""",
+
+    # Index existing history
+    f"""INSERT INTO chat_message_fts (rowid, conversation, content, translated_content)
+        SELECT m.id, {CONVERSATION.format(m='m')}, m.content, coalesce(m.translated_content, '') FROM chat_message m""",
+    f"""INSERT INTO chat_messagetranslation_fts (rowid, conversation, content)
+        SELECT t.id, {CONVERSATION.format(m='m')}, t.content
+        FROM chat_messagetranslation t JOIN chat_message m ON m.id = t.message_id""",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS chat_message_fts_insert",
+    "DROP TRIGGER IF EXISTS chat_message_fts_update",
+    "DROP TRIGGER IF EXISTS chat_message_fts_delete",
+    "DROP TRIGGER IF EXISTS chat_messagetranslation_fts_insert",
+    "DROP TRIGGER IF EXISTS chat_messagetranslation_fts_update",
+    "DROP TRIGGER IF EXISTS chat_messagetranslation_fts_delete",
+    "DROP TABLE IF EXISTS chat_message_fts",
+    "DROP TABLE IF EXISTS chat_messagetranslation_fts",
+]
+
+# Generated columns are maintained by PostgreSQL itself on every insert and update (12+)
+POSTGRES_FORWARD = [
+    "ALTER TABLE chat_message ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "to_tsvector('simple', content || ' ' || coalesce(translated_content, ''))) STORED",
+    "CREATE INDEX chat_message_search_idx ON chat_message USING GIN (search_vector)",
+    "ALTER TABLE chat_messagetranslation ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "to_tsvector('simple', content)) STORED",
+    "CREATE INDEX chat_messagetranslation_search_idx ON chat_messagetranslation USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS chat_message_search_idx",
+    "ALTER TABLE chat_message DROP COLUMN IF EXISTS search_vector",
+    "DROP INDEX IF EXISTS chat_messagetranslation_search_idx",
+    "ALTER TABLE chat_messagetranslation DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def forwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            has_fts5 = cursor.fetchone()[0]
+        if has_fts5:
+            _run(schema_editor, SQLITE_FORWARD)
+        else:
+            logging.error("SQLite was built without FTS5; message search falls back to table scans")
+
+
+def backwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_messagetranslation'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
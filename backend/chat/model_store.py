@@ -0,0 +1,121 @@
+"""
+model_store.py
+
+Local, memory-mappable store of MarianMT checkpoints shared by every worker on a host.
+Each Helsinki-NLP checkpoint is converted once into TRANSLATOR_MODEL_STORE_DIR as safetensors.
+Workers map the weight file read-only (copy-on-write), so clean weight pages live once in
+the page cache no matter how many daphne processes use the model, and reloading a model
+after eviction only re-maps pages that are usually still cached.
+"""
+
+import json
+import logging
+import os
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+MODEL_STORE_DIR = os.environ.get("TRANSLATOR_MODEL_STORE_DIR", "")  # Empty = load directly with from_pretrained
+WEIGHTS_FILE = "model.safetensors"
+
+_SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+
+def store_path(model_name: str, root: str = None) -> Path:
+    return Path(root or MODEL_STORE_DIR) / model_name.replace("/", "--")
+
+
+def ensure_converted(model_name: str, root: str = None) -> Path:
+    """
+    Convert a checkpoint into the store if it is not there yet and return its directory.
+    Conversion happens in a temporary directory that is renamed into place, so concurrent
+    workers never see a partial store entry.
+    """
+    target = store_path(model_name, root)
+    if (target / WEIGHTS_FILE).exists():
+        return target
+    from transformers import MarianMTModel, MarianTokenizer
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=".convert-", dir=target.parent))
+    try:
+        MarianTokenizer.from_pretrained(model_name).save_pretrained(staging)
+        MarianMTModel.from_pretrained(model_name).save_pretrained(staging, safe_serialization=True)
+        try:
+            os.rename(staging, target)
+            logging.info(f"Converted {model_name} into model store at {target}")
+        except OSError:
+            pass  # Another worker finished first
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def load_mapped_state_dict(path: Path) -> Dict[str, "torch.Tensor"]:
+    """
+    Map a safetensors file and return tensors that are views into the mapping (no copy).
+    """
+    import torch
+
+    with open(path, "rb") as f:
+        header_len = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_len))
+    header.pop("__metadata__", None)
+    data_start = 8 + header_len
+    storage = torch.UntypedStorage.from_file(str(path), shared=False, nbytes=path.stat().st_size)
+    state = {}
+    for name, info in header.items():
+        dtype = getattr(torch, _SAFETENSORS_DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        element_size = torch.empty((), dtype=dtype).element_size()
+        if (data_start + begin) % element_size:
+            raise ValueError(f"{path}: tensor {name} is not aligned for zero-copy mapping")
+        shape = info["shape"]
+        tensor = torch.empty(0, dtype=dtype)
+        tensor.set_(storage, (data_start + begin) // element_size, shape)
+        state[name] = tensor
+    return state
+
+
+def load_shared(model_name: str, root: str = None) -> Tuple["MarianMTModel", "MarianTokenizer"]:
+    """
+    Load a model whose weights are backed by the store's memory-mapped file.
+    """
+    from transformers import MarianMTModel, MarianTokenizer
+
+    directory = ensure_converted(model_name, root)
+    tokenizer = MarianTokenizer.from_pretrained(directory, local_files_only=True)
+    model = MarianMTModel.from_pretrained(directory, local_files_only=True, low_cpu_mem_usage=True)
+    # Swap every stored tensor for its mapped view; the private copies are freed
+    model.load_state_dict(load_mapped_state_dict(directory / WEIGHTS_FILE), strict=False, assign=True)
+    model.tie_weights()
+    model.eval()
+    return model, tokenizer
+
+
+def mapping_stats(model_name: str, root: str = None) -> Optional[Dict[str, int]]:
+    """
+    Resident memory of a model's mapped weight file in this process, from /proc/self/smaps.
+    `rss_bytes` counts every resident page (the cost without sharing); `pss_bytes` divides
+    shared pages among the processes mapping them (this process's share with sharing).
+    """
+    path = str(store_path(model_name, root) / WEIGHTS_FILE)
+    try:
+        with open("/proc/self/smaps") as smaps:
+            lines = smaps.readlines()
+    except OSError:
+        return None
+    stats = {"file_bytes": os.path.getsize(path) if os.path.exists(path) else 0, "rss_bytes": 0, "pss_bytes": 0}
+    in_mapping = False
+    for line in lines:
+        fields = line.split()
+        if "-" in fields[0] and len(fields) >= 5:  # Mapping header: address perms offset dev inode [path]
+            in_mapping = len(fields) >= 6 and fields[5] == path
+        elif in_mapping and fields[0] in ("Rss:", "Pss:"):
+            stats["rss_bytes" if fields[0] == "Rss:" else "pss_bytes"] += int(fields[1]) * 1024
+    return stats
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -6,6 +7,7 @@ User = get_user_model()
 
 class Message(models.Model):
     """Model for storing chat messages with translation support."""
+    client_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)  # Assigned before the row is written
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
     content = models.TextField()
@@ -19,13 +21,28 @@ class Message(models.Model):
     class Meta:
         ordering = ['created_at']
         indexes = [
-            models.Index(fields=['sender', 'receiver']),
+            # Serves each direction of a conversation in keyset order (see views.get_messages)
+            models.Index(fields=['sender', 'receiver', 'created_at', 'id'], name='chat_msg_conversation_idx'),
             models.Index(fields=['created_at']),
         ]
 
     def __str__(self):
         return f"{self.sender.username} -> {self.receiver.username}: {self.content[:50]}"
 
+class MessageTranslation(models.Model):
+    """A message translated into one language; each (message, language) is translated once."""
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='translations')
+    language = models.CharField(max_length=10)
+    content = models.TextField()
+    model_version = models.CharField(max_length=200, blank=True)  # model@revision that produced it
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['message', 'language']
+
+    def __str__(self):
+        return f"{self.message_id} [{self.language}]: {self.content[:50]}"
+
 class UserProfile(models.Model):
     """Extended user profile with language preferences."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
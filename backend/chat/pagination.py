@@ -0,0 +1,76 @@
+"""
+pagination.py
+
+Keyset (cursor) pagination over a two-person conversation.
+Each direction of the conversation is read separately through the
+(sender, receiver, created_at, id) index and the two pages are merged, so the cost of
+a page does not depend on how much history the conversation has.
+"""
+
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db.models import Q
+
+from .models import Message
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+MESSAGE_FIELDS = (
+    'id', 'client_id', 'content', 'translated_content', 'sender_id', 'receiver_id',
+    'source_language', 'target_language', 'is_translated', 'created_at',
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row: dict) -> str:
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+
+def conversation_page(user_id: int, friend_id: int, before: Optional[str] = None,
+                      after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Tuple[List[dict], bool]:
+    """
+    Return up to `limit` messages between two users as value dicts in chronological
+    order, plus whether more messages exist beyond the page in the paging direction.
+    Without a cursor the newest page is returned.
+    """
+    forward = after is not None
+    if forward:
+        created_at, message_id = decode_cursor(after)
+        keyset = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+        ordering = ('created_at', 'id')
+    else:
+        keyset = Q()
+        if before is not None:
+            created_at, message_id = decode_cursor(before)
+            keyset = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+        ordering = ('-created_at', '-id')
+
+    rows = []
+    for sender_id, receiver_id in ((user_id, friend_id), (friend_id, user_id)):
+        rows.extend(
+            Message.objects.filter(keyset, sender_id=sender_id, receiver_id=receiver_id)
+            .order_by(*ordering)
+            .values(*MESSAGE_FIELDS)[:limit + 1]
+        )
+    rows.sort(key=lambda row: (row['created_at'], row['id']), reverse=not forward)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not forward:
+        rows.reverse()
+    return rows, has_more
@@ -0,0 +1,201 @@
+"""
+persistence.py
+
+Write-behind persistence of chat messages.
+Messages get a client-visible UUID immediately and are written with bulk_create when the
+buffer reaches CHAT_WRITE_BATCH_SIZE rows or CHAT_WRITE_FLUSH_INTERVAL_MS elapses, using
+foreign-key ids directly. Batches that cannot be written are spooled to a JSON-lines file
+and replayed after the next successful write; unreadable spool lines are moved aside to
+<spool>.corrupt. The buffer is drained on shutdown.
+"""
+
+import atexit
+import json
+import logging
+import os
+import time
+import uuid
+from threading import Condition, Lock, Thread
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Message
+
+
+class MessageWriter:
+    """
+    Buffers Message rows in memory and writes them from a background thread.
+    """
+    def __init__(self, batch_size: int = None, flush_interval_ms: int = None, spool_path: str = None):
+        self.batch_size = batch_size or settings.CHAT_WRITE_BATCH_SIZE
+        self.flush_interval = (flush_interval_ms or settings.CHAT_WRITE_FLUSH_INTERVAL_MS) / 1000
+        self.spool_path = spool_path or settings.CHAT_WRITE_SPOOL_PATH
+        self.buffer: List[dict] = []
+        self.cond = Condition()
+        self.flush_lock = Lock()  # One writer at a time: the background thread or drain()
+        self.stopped = False
+        self.stats = {"enqueued": 0, "written": 0, "flushes": 0, "spooled": 0, "dropped": 0, "corrupt": 0}
+        self.thread = Thread(target=self._run, name="message-writer", daemon=True)
+        self.thread.start()
+
+    def enqueue(self, sender_id, receiver_id, content, translated_content, source_lang, target_lang) -> uuid.UUID:
+        """
+        Queue a message for persistence and return its client-visible UUID.
+        """
+        client_id = uuid.uuid4()
+        row = {
+            "client_id": client_id,
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "content": content,
+            "translated_content": translated_content,
+            "source_language": source_lang,
+            "target_language": target_lang,
+            "is_translated": bool(translated_content),
+            "created_at": timezone.now(),
+        }
+        with self.cond:
+            self.buffer.append(row)
+            self.stats["enqueued"] += 1
+            if len(self.buffer) >= self.batch_size:
+                self.cond.notify()
+        return client_id
+
+    def pending(self) -> int:
+        with self.cond:
+            return len(self.buffer)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self.stopped and len(self.buffer) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                if self.stopped:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Message writer flush failed: {e}")
+
+    def flush(self):
+        """Write everything buffered (and any spooled rows) to the database."""
+        with self.flush_lock:
+            with self.cond:
+                rows, self.buffer = self.buffer, []
+            spooled = self.stats["spooled"]
+            try:
+                close_old_connections()
+                if rows:
+                    self._write(rows)
+                    self.stats["flushes"] += 1
+            except Exception:
+                # Keep the rows for the next flush; client_id is unique, so rows already written are skipped
+                with self.cond:
+                    self.buffer[:0] = rows
+                raise
+            if self.stats["spooled"] == spooled:  # Skip the replay while the database is unavailable
+                self._replay_spool()
+
+    def _write(self, rows: List[dict]):
+        try:
+            Message.objects.bulk_create([Message(**row) for row in rows], ignore_conflicts=True)
+            self.stats["written"] += len(rows)
+        except IntegrityError:
+            # A bad sender/receiver id must not take the whole batch down with it
+            for row in rows:
+                try:
+                    Message.objects.bulk_create([Message(**row)], ignore_conflicts=True)
+                    self.stats["written"] += 1
+                except IntegrityError as e:
+                    self.stats["dropped"] += 1
+                    logging.error(f"Dropping message {row['client_id']}: {e}")
+                except DatabaseError:
+                    self._spool([row])
+        except DatabaseError as e:
+            logging.error(f"Database unavailable, spooling {len(rows)} messages: {e}")
+            self._spool(rows)
+
+    def _spool(self, rows: List[dict]):
+        with open(self.spool_path, "ab+") as spool:
+            if spool.tell():
+                spool.seek(-1, os.SEEK_END)
+                if spool.read(1) != b"\n":
+                    spool.write(b"\n")  # Don't glue rows onto a line torn by a crash
+            for row in rows:
+                spool.write(json.dumps({**row, "client_id": str(row["client_id"]),
+                                        "created_at": row["created_at"].isoformat()}).encode() + b"\n")
+            spool.flush()
+            os.fsync(spool.fileno())
+        self.stats["spooled"] += len(rows)
+
+    def _replay_spool(self):
+        replay_path = f"{self.spool_path}.replay"
+        if os.path.exists(self.spool_path):
+            # Append to any replay file left behind by an interrupted replay
+            with open(self.spool_path, "rb") as spool, open(replay_path, "ab") as replay:
+                data = spool.read()
+                replay.write(data if data.endswith(b"\n") else data + b"\n")
+            os.remove(self.spool_path)
+        if not os.path.exists(replay_path):
+            return
+        rows, corrupt = [], []
+        with open(replay_path, encoding="utf-8", errors="replace") as replay:
+            for line in replay:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    row["client_id"] = uuid.UUID(row["client_id"])
+                    row["created_at"] = parse_datetime(row["created_at"])
+                    if row["created_at"] is None:
+                        raise ValueError("created_at")
+                    Message(**row)
+                    rows.append(row)
+                except (ValueError, TypeError, KeyError, AttributeError):
+                    corrupt.append(line if line.endswith("\n") else line + "\n")
+        if corrupt:
+            # A torn or corrupt line must not block the rest of the spool; keep it for inspection
+            with open(f"{self.spool_path}.corrupt", "a", encoding="utf-8") as quarantine:
+                quarantine.writelines(corrupt)
+            self.stats["corrupt"] += len(corrupt)
+            logging.error(f"Moved {len(corrupt)} unreadable spool lines to {self.spool_path}.corrupt")
+        if rows:
+            logging.info(f"Replaying {len(rows)} spooled messages")
+            # client_id is unique, so rows that already made it to the database are skipped
+            self._write(rows)
+        os.remove(replay_path)
+
+    def drain(self):
+        """Stop the background thread and write out everything still buffered."""
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        self.thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Message writer drain failed: {e}")
+
+
+_writer: Optional[MessageWriter] = None
+_writer_lock = Lock()
+
+
+def get_message_writer() -> MessageWriter:
+    """
+    Return the process-wide message writer, starting it on first use.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MessageWriter()
+            atexit.register(_writer.drain)
+        return _writer
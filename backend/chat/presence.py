@@ -0,0 +1,225 @@
+"""
+presence.py
+
+Presence service backed by Redis.
+Each open WebSocket is a field in the user's connection hash with its own expiry, so
+multiple tabs and devices are counted correctly and connections of crashed workers expire
+on their own. Online/offline transitions are pushed to friends through the channel layer,
+and last_seen / is_online are written to UserProfile in periodic bulk updates instead of
+on every connect. Without PRESENCE_REDIS_URL an in-process backend is used.
+"""
+
+import logging
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+CONN_KEY = "presence:conn:{}"
+DIRTY_KEY = "presence:dirty"
+
+
+class PresenceService:
+    """
+    Tracks live connections per user and flushes presence to the database in batches.
+    """
+    def __init__(self, redis_url: str = None, ttl: int = None, flush_interval: float = None):
+        self.ttl = ttl or settings.PRESENCE_TTL
+        self.flush_interval = flush_interval or settings.PRESENCE_FLUSH_INTERVAL
+        self.redis = self.aredis = None
+        redis_url = settings.PRESENCE_REDIS_URL if redis_url is None else redis_url
+        if redis_url:
+            import redis
+            import redis.asyncio
+            self.redis = redis.Redis.from_url(redis_url)
+            self.aredis = redis.asyncio.Redis.from_url(redis_url)
+        # In-process fallback state
+        self.connections: Dict[int, Dict[str, float]] = {}
+        self.dirty: Dict[int, Tuple[float, bool]] = {}
+        self.lock = Lock()
+        self.stopped = Event()
+        self.flusher: Optional[Thread] = None
+
+    # Connection tracking
+
+    async def connect(self, user_id: int, channel_name: str) -> bool:
+        """Register a connection; True if the user just came online."""
+        now = time.time()
+        if self.aredis is None:
+            with self.lock:
+                conns = self.connections.setdefault(user_id, {})
+                was_online = any(expiry > now for expiry in conns.values())
+                conns[channel_name] = now + self.ttl
+                self.dirty[user_id] = (now, True)
+            return not was_online
+        key = CONN_KEY.format(user_id)
+        async with self.aredis.pipeline(transaction=True) as pipe:
+            pipe.hgetall(key)
+            pipe.hset(key, channel_name, now + self.ttl)
+            pipe.expire(key, self.ttl * 2)
+            pipe.hset(DIRTY_KEY, user_id, f"{now}|1")
+            before, *_ = await pipe.execute()
+        return not any(float(expiry) > now for field, expiry in before.items() if field.decode() != channel_name)
+
+    async def heartbeat(self, user_id: int, channel_name: str):
+        """Extend a live connection's expiry."""
+        now = time.time()
+        if self.aredis is None:
+            with self.lock:
+                self.connections.setdefault(user_id, {})[channel_name] = now + self.ttl
+            return
+        key = CONN_KEY.format(user_id)
+        async with self.aredis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, channel_name, now + self.ttl)
+            pipe.expire(key, self.ttl * 2)
+            await pipe.execute()
+
+    async def disconnect(self, user_id: int, channel_name: str) -> bool:
+        """Remove a connection; True if it was the user's last live one."""
+        now = time.time()
+        if self.aredis is None:
+            with self.lock:
+                conns = self.connections.get(user_id, {})
+                conns.pop(channel_name, None)
+                online = any(expiry > now for expiry in conns.values())
+                if not online:
+                    self.connections.pop(user_id, None)
+                    self.dirty[user_id] = (now, False)
+            return not online
+        key = CONN_KEY.format(user_id)
+        async with self.aredis.pipeline(transaction=True) as pipe:
+            pipe.hdel(key, channel_name)
+            pipe.hgetall(key)
+            _, remaining = await pipe.execute()
+        online = any(float(expiry) > now for expiry in remaining.values())
+        if not online:
+            await self.aredis.hset(DIRTY_KEY, user_id, f"{now}|0")
+        return not online
+
+    def online_users(self, user_ids: Iterable[int]) -> Set[int]:
+        """Subset of user_ids with at least one live connection."""
+        user_ids = list(user_ids)
+        now = time.time()
+        if self.redis is None:
+            with self.lock:
+                return {
+                    uid for uid in user_ids
+                    if any(expiry > now for expiry in self.connections.get(uid, {}).values())
+                }
+        with self.redis.pipeline(transaction=False) as pipe:
+            for uid in user_ids:
+                pipe.hvals(CONN_KEY.format(uid))
+            results = pipe.execute()
+        return {uid for uid, expiries in zip(user_ids, results) if any(float(e) > now for e in expiries)}
+
+    # Batched database writes
+
+    def _take_dirty(self) -> Dict[int, Tuple[float, bool]]:
+        if self.redis is None:
+            with self.lock:
+                dirty, self.dirty = self.dirty, {}
+            return dirty
+        # Renaming is atomic, so marks written during the flush land in a fresh hash
+        batch_key = f"{DIRTY_KEY}:{uuid.uuid4().hex}"
+        import redis
+        try:
+            self.redis.rename(DIRTY_KEY, batch_key)
+        except redis.ResponseError:
+            return {}  # Nothing dirty (the key does not exist)
+        with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hgetall(batch_key)
+            pipe.delete(batch_key)
+            raw, _ = pipe.execute()
+        dirty = {}
+        for uid, value in raw.items():
+            ts, online = value.decode().split("|")
+            dirty[int(uid)] = (float(ts), online == "1")
+        return dirty
+
+    def _restore_dirty(self, dirty: Dict[int, Tuple[float, bool]]):
+        """Put back marks from a failed flush; marks written since then are newer and win."""
+        if self.redis is None:
+            with self.lock:
+                for uid, mark in dirty.items():
+                    if uid not in self.dirty or self.dirty[uid][0] < mark[0]:
+                        self.dirty[uid] = mark
+            return
+        with self.redis.pipeline(transaction=False) as pipe:
+            for uid, (ts, online) in dirty.items():
+                pipe.hsetnx(DIRTY_KEY, uid, f"{ts}|{int(online)}")
+            pipe.execute()
+
+    def flush(self) -> int:
+        """
+        Write pending last_seen / is_online changes with one bulk update; returns rows touched.
+        If the write fails, the marks are restored for the next flush.
+        """
+        dirty = self._take_dirty()
+        if not dirty:
+            return 0
+        try:
+            return self._write(dirty)
+        except Exception:
+            self._restore_dirty(dirty)
+            raise
+
+    def _write(self, dirty: Dict[int, Tuple[float, bool]]) -> int:
+        from django.contrib.auth import get_user_model
+        from .models import UserProfile
+
+        close_old_connections()
+        existing = dict(UserProfile.objects.filter(user_id__in=dirty).values_list("user_id", "id"))
+        missing = set(get_user_model().objects.filter(id__in=set(dirty) - set(existing)).values_list("id", flat=True))
+        if missing:
+            # bulk_create stamps last_seen (auto_now) with the current time, so the real values are
+            # written by the bulk_update below, with the existing profiles
+            UserProfile.objects.bulk_create([UserProfile(user_id=uid) for uid in missing], ignore_conflicts=True)
+            existing = dict(UserProfile.objects.filter(user_id__in=dirty).values_list("user_id", "id"))
+        profiles = [
+            UserProfile(id=existing[uid], user_id=uid, is_online=online,
+                        last_seen=datetime.fromtimestamp(ts, tz=dt_timezone.utc))
+            for uid, (ts, online) in dirty.items() if uid in existing  # Users deleted since are dropped
+        ]
+        UserProfile.objects.bulk_update(profiles, ["is_online", "last_seen"], batch_size=500)
+        return len(profiles)
+
+    def _run_flusher(self):
+        while not self.stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Presence flush failed: {e}")
+
+    def start(self):
+        if self.flusher is None:
+            self.flusher = Thread(target=self._run_flusher, name="presence-flusher", daemon=True)
+            self.flusher.start()
+
+    def stop(self):
+        self.stopped.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Presence flush failed: {e}")
+
+
+_presence: Optional[PresenceService] = None
+_presence_lock = Lock()
+
+
+def get_presence() -> PresenceService:
+    """
+    Return the process-wide presence service, starting its flusher on first use.
+    """
+    global _presence
+    with _presence_lock:
+        if _presence is None:
+            import atexit
+            _presence = PresenceService()
+            _presence.start()
+            atexit.register(_presence.stop)
+        return _presence
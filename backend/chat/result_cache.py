@@ -0,0 +1,188 @@
+"""
+result_cache.py
+
+Two-tier cache of finished translations.
+Keys combine normalized source text, language pair, model name and decoding settings.
+The local tier is a byte-budgeted LRU with TTL; the optional shared tier lives on the Redis
+instance used for CHANNEL_LAYERS so every daphne worker benefits from each other's work.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple
+
+RESULT_CACHE_ENABLED = os.environ.get("TRANSLATOR_RESULT_CACHE", "1") == "1"
+RESULT_CACHE_BYTES = int(os.environ.get("TRANSLATOR_RESULT_CACHE_BYTES", 16 * 1024 * 1024))
+RESULT_CACHE_TTL = int(os.environ.get("TRANSLATOR_RESULT_CACHE_TTL", 24 * 3600))
+RESULT_CACHE_REDIS = os.environ.get("TRANSLATOR_RESULT_CACHE_REDIS", "0") == "1"
+RESULT_CACHE_REDIS_URL = os.environ.get("TRANSLATOR_RESULT_CACHE_REDIS_URL", "")
+
+REDIS_KEY_PREFIX = "translator:result"
+ENTRY_OVERHEAD_BYTES = 200  # Rough per-entry cost of the OrderedDict node, tuple and str headers
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, trimmed, internal whitespace collapsed."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def _redis_url_from_settings() -> str:
+    """Build a redis:// URL from the first CHANNEL_LAYERS host, if Django is configured."""
+    try:
+        from django.conf import settings
+        host = settings.CHANNEL_LAYERS["default"]["CONFIG"]["hosts"][0]
+    except Exception:
+        return ""
+    if isinstance(host, str):
+        return host
+    return f"redis://{host[0]}:{host[1]}/0"
+
+
+class ResultCache:
+    """
+    Thread-safe translation result cache with an optional Redis tier.
+    """
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES, ttl: int = RESULT_CACHE_TTL,
+                 redis_url: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[str, float, int, Tuple[str, str]]]" = OrderedDict()
+        self.bytes = 0
+        self.lock = Lock()
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+                      "invalidations": 0, "shared_errors": 0}
+        self.redis = None
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.05, socket_connect_timeout=0.05)
+            except Exception as e:
+                logging.error(f"Result cache: Redis tier disabled ({e})")
+
+    @staticmethod
+    def make_key(text: str, src_lang: str, tgt_lang: str, namespace: str) -> str:
+        """
+        `namespace` identifies the model and decoding settings that produced the result.
+        """
+        digest = hashlib.sha1(
+            f"{namespace}\x00{normalize_text(text)}".encode("utf-8")
+        ).hexdigest()
+        return f"{src_lang}:{tgt_lang}:{digest}"
+
+    def get(self, text: str, src_lang: str, tgt_lang: str, namespace: str) -> Optional[str]:
+        key = self.make_key(text, src_lang, tgt_lang, namespace)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[0]
+                self._drop(key)
+                self.stats["expirations"] += 1
+        value = self._shared_get(key)
+        with self.lock:
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["shared_hits"] += 1
+        self._local_set(key, value, (src_lang, tgt_lang))
+        return value
+
+    def set(self, text: str, src_lang: str, tgt_lang: str, namespace: str, value: str):
+        key = self.make_key(text, src_lang, tgt_lang, namespace)
+        self._local_set(key, value, (src_lang, tgt_lang))
+        self._shared_set(key, value)
+
+    def invalidate_pair(self, src_lang: str, tgt_lang: str):
+        """
+        Drop every cached result for a language pair, locally and in Redis.
+        Call this whenever the model serving the pair changes.
+        """
+        with self.lock:
+            for key in [k for k, entry in self.entries.items() if entry[3] == (src_lang, tgt_lang)]:
+                self._drop(key)
+            self.stats["invalidations"] += 1
+        if self.redis is not None:
+            try:
+                keys = list(self.redis.scan_iter(match=f"{REDIS_KEY_PREFIX}:{src_lang}:{tgt_lang}:*", count=500))
+                if keys:
+                    self.redis.delete(*keys)
+            except Exception as e:
+                logging.error(f"Result cache: Redis invalidation failed for {src_lang}->{tgt_lang}: {e}")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries), "bytes": self.bytes,
+                    "max_bytes": self.max_bytes, "shared": self.redis is not None}
+
+    def _local_set(self, key: str, value: str, pair: Tuple[str, str]):
+        size = len(key) + len(value.encode("utf-8")) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (value, time.monotonic() + self.ttl, size, pair)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._drop(oldest)
+                self.stats["evictions"] += 1
+
+    def _drop(self, key: str):
+        # Caller holds self.lock
+        entry = self.entries.pop(key)
+        self.bytes -= entry[2]
+
+    def _shared_get(self, key: str) -> Optional[str]:
+        if self.redis is None:
+            return None
+        try:
+            value = self.redis.get(f"{REDIS_KEY_PREFIX}:{key}")
+        except Exception:
+            with self.lock:
+                self.stats["shared_errors"] += 1
+            return None
+        return value.decode("utf-8") if value is not None else None
+
+    def _shared_set(self, key: str, value: str):
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(f"{REDIS_KEY_PREFIX}:{key}", value.encode("utf-8"), ex=self.ttl)
+        except Exception:
+            with self.lock:
+                self.stats["shared_errors"] += 1
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    Return the process-wide result cache, or None when TRANSLATOR_RESULT_CACHE=0.
+    """
+    global _result_cache
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            redis_url = (RESULT_CACHE_REDIS_URL or _redis_url_from_settings()) if RESULT_CACHE_REDIS else None
+            _result_cache = ResultCache(redis_url=redis_url)
+        return _result_cache
@@ -0,0 +1,58 @@
+"""
+sample_corpus.py
+
+Fixed, chat-like sample sentences per source language.
+Used to compare inference modes and to warm up models with realistic inputs.
+"""
+
+SAMPLE_SENTENCES = {
+    "en": [
+        "Hi!",
+        "How are you doing today?",
+        "I'll be there in ten minutes, traffic is terrible.",
+        "Thank you so much for your help yesterday.",
+        "Can we move the meeting to Friday afternoon?",
+        "The new version of the app crashes when I open the settings page.",
+        "Happy birthday! I hope you have a wonderful day with your family.",
+        "I didn't understand the last message, could you explain it again in simpler words?",
+        "We are planning a trip to the mountains next month and would love for you to join us.",
+        "Please remember to bring your passport, the train tickets and some warm clothes, "
+        "because it gets very cold at night.",
+    ],
+    "es": [
+        "¡Hola!",
+        "¿Cómo estás hoy?",
+        "Llego en diez minutos, hay mucho tráfico.",
+        "Muchas gracias por tu ayuda ayer.",
+        "¿Podemos mover la reunión al viernes por la tarde?",
+        "La nueva versión de la aplicación se cierra cuando abro la configuración.",
+        "¡Feliz cumpleaños! Espero que pases un día maravilloso con tu familia.",
+        "No entendí el último mensaje, ¿me lo puedes explicar con palabras más sencillas?",
+        "Estamos planeando un viaje a la montaña el próximo mes y nos encantaría que vinieras.",
+        "Recuerda traer el pasaporte, los billetes de tren y ropa de abrigo, porque por la noche hace mucho frío.",
+    ],
+    "fr": [
+        "Salut !",
+        "Comment vas-tu aujourd'hui ?",
+        "J'arrive dans dix minutes, il y a beaucoup de circulation.",
+        "Merci beaucoup pour ton aide hier.",
+        "Pouvons-nous déplacer la réunion à vendredi après-midi ?",
+        "La nouvelle version de l'application plante quand j'ouvre les paramètres.",
+        "Joyeux anniversaire ! J'espère que tu passes une merveilleuse journée en famille.",
+        "Je n'ai pas compris le dernier message, peux-tu me l'expliquer plus simplement ?",
+        "Nous prévoyons un voyage à la montagne le mois prochain et nous aimerions que tu viennes.",
+        "N'oublie pas ton passeport, les billets de train et des vêtements chauds, car il fait très froid la nuit.",
+    ],
+    "de": [
+        "Hallo!",
+        "Wie geht es dir heute?",
+        "Ich bin in zehn Minuten da, der Verkehr ist schrecklich.",
+        "Vielen Dank für deine Hilfe gestern.",
+        "Können wir das Treffen auf Freitagnachmittag verschieben?",
+        "Die neue Version der App stürzt ab, wenn ich die Einstellungen öffne.",
+        "Alles Gute zum Geburtstag! Ich wünsche dir einen wunderschönen Tag mit deiner Familie.",
+        "Ich habe die letzte Nachricht nicht verstanden, kannst du sie einfacher erklären?",
+        "Wir planen nächsten Monat eine Reise in die Berge und würden uns freuen, wenn du mitkommst.",
+        "Denk bitte an deinen Reisepass, die Zugtickets und warme Kleidung, denn nachts wird es sehr kalt.",
+    ],
+}
@@ -0,0 +1,139 @@
+"""
+search.py
+
+Full-text search over message text in every language it is stored in: the original,
+the send-time translation and each MessageTranslation. The inverted index lives in the
+database and is kept in sync by triggers (migration 0005), so bulk_create/bulk_update
+writes are indexed too:
+
+- SQLite: FTS5 tables chat_message_fts (rowid = message id) and chat_messagetranslation_fts
+  (rowid = translation id). Each row also indexes a conversation token, so a search within a
+  conversation is an intersection of posting lists instead of a filter over every match.
+- PostgreSQL: generated tsvector columns with GIN indexes on both tables.
+
+Text is indexed without stemming ('simple' / unicode61) since a conversation mixes languages;
+the last query word matches as a prefix. Databases without either index fall back to
+icontains scans.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Message, MessageTranslation
+from .pagination import DEFAULT_PAGE_SIZE, MESSAGE_FIELDS, decode_cursor
+
+MAX_QUERY_TERMS = 8
+MIN_PREFIX_CHARS = 2  # FTS5 prefix indexes cover 2 and 3 characters
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_backend: Optional[str] = None
+
+
+def query_terms(query: str) -> List[str]:
+    return [word.lower() for word in _WORD_RE.findall(query or "")][:MAX_QUERY_TERMS]
+
+
+def conversation_token(user_id: int, friend_id: int) -> str:
+    """Indexed token shared by both directions of a conversation (must match the SQLite triggers)."""
+    return f"c{min(user_id, friend_id)}x{max(user_id, friend_id)}"
+
+
+def search_backend() -> str:
+    """'fts5', 'postgres' or 'scan', depending on which index migration 0005 could create."""
+    global _backend
+    if _backend is None:
+        tables = connection.introspection.table_names()
+        if connection.vendor == 'sqlite' and 'chat_message_fts' in tables:
+            _backend = 'fts5'
+        elif connection.vendor == 'postgresql':
+            _backend = 'postgres'
+        else:
+            _backend = 'scan'
+    return _backend
+
+
+def _fts5_expression(terms: List[str], conversation: Optional[str]) -> str:
+    columns = "{content translated_content}"
+    parts = [f'conversation : "{conversation}"'] if conversation else []
+    for i, term in enumerate(terms):
+        prefix = " *" if i == len(terms) - 1 and len(term) >= MIN_PREFIX_CHARS else ""
+        parts.append(f'{columns} : "{term}"{prefix}')
+    return " AND ".join(parts)
+
+
+def _tsquery(terms: List[str]) -> str:
+    return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+
+
+def matching_ids(query: str, user_id: Optional[int] = None, friend_id: Optional[int] = None) -> Optional[RawSQL]:
+    """
+    Subquery of ids of messages whose text in any language matches `query`, optionally
+    limited to the conversation between two users. None when the query has no words.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return None
+    scoped = user_id is not None and friend_id is not None
+    backend = search_backend()
+    if backend == 'fts5':
+        # The translation table has no translated_content column; its column filter names only content
+        expression = _fts5_expression(terms, conversation_token(user_id, friend_id) if scoped else None)
+        translation_expression = expression.replace("{content translated_content}", "content")
+        return RawSQL(
+            "SELECT rowid FROM chat_message_fts WHERE chat_message_fts MATCH %s "
+            "UNION SELECT t.message_id FROM chat_messagetranslation_fts f "
+            "JOIN chat_messagetranslation t ON t.id = f.rowid WHERE chat_messagetranslation_fts MATCH %s",
+            (expression, translation_expression),
+        )
+    if backend == 'postgres':
+        scope, params = "", []
+        if scoped:
+            scope = " AND ((m.sender_id = %s AND m.receiver_id = %s) OR (m.sender_id = %s AND m.receiver_id = %s))"
+            params = [user_id, friend_id, friend_id, user_id]
+        tsquery = _tsquery(terms)
+        return RawSQL(
+            "SELECT m.id FROM chat_message m WHERE m.search_vector @@ to_tsquery('simple', %s)" + scope +
+            " UNION SELECT t.message_id FROM chat_messagetranslation t JOIN chat_message m ON m.id = t.message_id"
+            " WHERE t.search_vector @@ to_tsquery('simple', %s)" + scope,
+            (tsquery, *params, tsquery, *params),
+        )
+    return None
+
+
+def text_filter(query: str, user_id: Optional[int] = None, friend_id: Optional[int] = None) -> Optional[Q]:
+    """Message filter for `query` through the index, or icontains scans without one."""
+    terms = query_terms(query)
+    if not terms:
+        return None
+    ids = matching_ids(query, user_id, friend_id)
+    if ids is not None:
+        return Q(id__in=ids)
+    condition = Q()
+    for term in terms:
+        # Subquery rather than a join on translations, so a match in several languages is one row
+        translated = MessageTranslation.objects.filter(content__icontains=term).values('message_id')
+        condition &= Q(content__icontains=term) | Q(translated_content__icontains=term) | Q(id__in=translated)
+    return condition
+
+
+def search_conversation(user_id: int, friend_id: int, query: str, before: Optional[str] = None,
+                        limit: int = DEFAULT_PAGE_SIZE) -> Tuple[List[dict], bool]:
+    """
+    Messages between two users matching `query`, newest first, as value dicts, plus whether
+    older matches exist. `before` is the cursor of the last row of the previous page.
+    """
+    condition = text_filter(query, user_id, friend_id)
+    if condition is None:
+        return [], False
+    queryset = Message.objects.filter(
+        condition, Q(sender_id=user_id, receiver_id=friend_id) | Q(sender_id=friend_id, receiver_id=user_id),
+    )
+    if before is not None:
+        created_at, message_id = decode_cursor(before)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id))
+    rows = list(queryset.order_by('-created_at', '-id').values(*MESSAGE_FIELDS)[:limit + 1])
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,102 @@
+"""
+segmentation.py
+
+Sentence segmentation for incremental and long-message translation.
+Segments keep their surrounding whitespace so that joining them reproduces the input exactly.
+URLs, e-mail addresses, code spans and text without letters (emoji, numbers) are never sent
+to the model and are stitched back verbatim.
+"""
+
+import os
+import re
+from typing import List, Tuple
+
+SEGMENT_MIN_CHARS = int(os.environ.get("TRANSLATOR_SEGMENT_MIN_CHARS", 200))
+MAX_SEGMENT_CHARS = int(os.environ.get("TRANSLATOR_MAX_SEGMENT_CHARS", 400))  # Well below the 512-token model limit
+
+# Sentence-final punctuation (optionally followed by closing quotes/brackets) plus whitespace, or a line break
+_SENTENCE_BOUNDARY_RE = re.compile(r"[.!?…。！？]+[\"'”’)\]]*\s+|\n\s*")
+_CLAUSE_BOUNDARY_RE = re.compile(r"[,;:]\s+|\s+")
+_PROTECTED_RE = re.compile(
+    r"```.*?```"                                   # fenced code block
+    r"|`[^`\n]+`"                                  # inline code
+    r"|(?:https?://|www\.)[^\s<>\"]*[^\s<>\".,;:!?)\]]"  # URL, minus trailing punctuation
+    r"|[\w.+-]+@[\w-]+\.[\w.-]*\w",                # e-mail address
+    re.DOTALL,
+)
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences; trailing whitespace stays attached to each sentence.
+    """
+    segments, start = [], 0
+    for match in _SENTENCE_BOUNDARY_RE.finditer(text):
+        if match.end() > start:
+            segments.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        segments.append(text[start:])
+    return segments
+
+
+def split_padding(segment: str) -> Tuple[str, str, str]:
+    """
+    Return (leading whitespace, core text, trailing whitespace) for a segment.
+    """
+    core = segment.strip()
+    if not core:
+        return segment, "", ""
+    head = segment[:len(segment) - len(segment.lstrip())]
+    tail = segment[len(segment.rstrip()):]
+    return head, core, tail
+
+
+def should_segment(text: str) -> bool:
+    """True for texts that are long or contain spans the model must not see."""
+    return len(text) > SEGMENT_MIN_CHARS or "\n" in text.strip() or _PROTECTED_RE.search(text) is not None
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Break an over-long sentence at clause boundaries, then at whitespace."""
+    if len(sentence) <= max_chars:
+        return [sentence]
+    chunks, start, cut = [], 0, 0
+    for match in _CLAUSE_BOUNDARY_RE.finditer(sentence):
+        if match.end() - start > max_chars and cut > start:
+            chunks.append(sentence[start:cut])
+            start = cut
+        cut = match.end()
+    if len(sentence) - start > max_chars and cut > start:
+        chunks.append(sentence[start:cut])
+        start = cut
+    chunks.append(sentence[start:])
+    return chunks
+
+
+def segment_text(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> List[Tuple[str, bool]]:
+    """
+    Split text into (piece, translatable) pairs whose concatenation equals `text`.
+    Translatable pieces are whitespace-trimmed sentences (or clauses of over-long
+    sentences); everything else is kept verbatim.
+    """
+    pieces: List[Tuple[str, bool]] = []
+
+    def add_prose(prose: str):
+        for sentence in split_sentences(prose):
+            for chunk in _split_long(sentence, max_chars):
+                head, core, tail = split_padding(chunk)
+                if head:
+                    pieces.append((head, False))
+                if core:
+                    pieces.append((core, any(ch.isalpha() for ch in core)))
+                if tail:
+                    pieces.append((tail, False))
+
+    start = 0
+    for match in _PROTECTED_RE.finditer(text):
+        add_prose(text[start:match.start()])
+        pieces.append((match.group(), False))
+        start = match.end()
+    add_prose(text[start:])
+    return pieces
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .friends import friend_ids, invalidate_friends
+from .models import Friendship, UserProfile
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=Friendship)
+def friendship_changed(sender, instance, **kwargs):
+    invalidate_friends(instance.sender_id, instance.receiver_id)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_friends(*friend_ids(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_friends(*friend_ids(instance.id))
@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from chat.admission import AdmissionController, TokenBucket
+
+User = get_user_model()
+
+
+def controller(**overrides):
+    options = {"max_in_flight": 2, "long_share": 0.5, "short_chars": 10, "user_rate": 100, "user_burst": 100}
+    return AdmissionController(**{**options, **overrides})
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def test_sheds_when_in_flight_capacity_is_full(self):
+        admission = controller()
+        self.assertIsNone(admission.admit("hi"))
+        self.assertIsNone(admission.admit("hi"))
+        rejection = admission.admit("hi")
+        self.assertEqual((rejection["error"], rejection["reason"]), ("overloaded", "queue_full"))
+        self.assertGreater(rejection["retry_after"], 0)
+        admission.release(0.1)
+        self.assertIsNone(admission.admit("hi"))
+        self.assertEqual({k: admission.snapshot()[k] for k in ("admitted", "shed", "in_flight")},
+                         {"admitted": 3, "shed": 1, "in_flight": 2})
+
+    def test_long_messages_keep_headroom_for_short_ones(self):
+        admission = controller()
+        self.assertIsNone(admission.admit("a much longer message"))
+        self.assertEqual(admission.admit("another long message")["reason"], "queue_full")
+        self.assertIsNone(admission.admit("short"))
+
+    def test_rate_limits_refund_tokens_they_did_not_use(self):
+        admission = controller(user_rate=0.001, user_burst=1)
+        connection = TokenBucket(0.001, 2)
+        self.assertIsNone(admission.admit("hi", connection, user_id=1))
+        self.assertEqual(admission.admit("hi", connection, user_id=1)["reason"], "user_rate")
+        # The connection token taken before the user bucket refused is given back
+        self.assertIsNone(admission.admit("hi", connection, user_id=2))
+        self.assertEqual(admission.admit("hi", connection, user_id=3)["reason"], "connection_rate")
+        self.assertEqual(admission.snapshot()["rate_limited"], 2)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+@patch("chat.views.translate_many", lambda texts, *pair: [f"<{text}>" for text in texts])
+@patch("chat.views.translate", lambda text, *pair: f"<{text}>")
+class RestAdmissionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="ana", password="pw", phone_number="0"))
+        self.admission = controller(max_in_flight=1)
+        patcher = patch("chat.views.get_admission", return_value=self.admission)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def translate(self):
+        return self.client.post(reverse("translate_message"),
+                                {"message": "hi", "source_lang": "en", "target_lang": "es"}, format="json")
+
+    def translate_batch(self):
+        return self.client.post(reverse("translate_messages_batch"), {"items": [
+            {"id": 1, "text": "hi", "source_lang": "en", "target_lang": "es"},
+            {"id": 2, "text": "bye", "source_lang": "en", "target_lang": "es"},
+        ]}, format="json")
+
+    def test_admitted_requests_release_their_slot(self):
+        self.assertEqual(self.translate().data["translated"], "<hi>")
+        self.assertEqual(self.translate_batch().data["results"][1], {"id": 2, "translated": "<bye>"})
+        self.assertEqual((self.admission.in_flight, self.admission.stats["admitted"]), (0, 2))
+
+    def test_requests_over_capacity_get_429_with_retry_after(self):
+        self.assertIsNone(self.admission.admit("busy"))
+        for response in (self.translate(), self.translate_batch()):
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual((response.data["error"], response.data["reason"]), ("overloaded", "queue_full"))
+            self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(self.admission.stats["shed"], 2)
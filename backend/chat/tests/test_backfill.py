@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+from concurrent.futures import Future
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from chat.models import Message
+
+User = get_user_model()
+
+COMMAND = "chat.management.commands.backfill_translations"
+
+
+class InlineExecutor:
+    """Runs chunks in the calling thread, so the test sees them in submission order."""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class Interrupted(BaseException):
+    pass
+
+
+@patch(f"{COMMAND}.ProcessPoolExecutor", InlineExecutor)
+class BackfillResumeTests(TestCase):
+    def setUp(self):
+        ana = User.objects.create_user(username="ana", password="pw", phone_number="0")
+        ben = User.objects.create_user(username="ben", password="pw", phone_number="0")
+        self.ids = [
+            Message.objects.create(sender=ana, receiver=ben, content=f"m{i}", source_language="en",
+                                   target_language="es").id
+            for i in range(6)
+        ]
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        self.checkpoint = os.path.join(checkpoint_dir.name, "checkpoint.json")
+        self.translated = []
+
+    def fake_chunk(self, interrupt_at=None):
+        def translate_chunk(texts, src_lang, tgt_lang, profile):
+            if interrupt_at in texts:
+                raise Interrupted()
+            self.translated.extend(texts)
+            return [f"{tgt_lang}:{text}" for text in texts]
+        return translate_chunk
+
+    def backfill(self, *args):
+        call_command("backfill_translations", "--pairs", "en-es", "--workers", "1", "--batch-size", "1",
+                     "--buffer-rows", "1", "--checkpoint", self.checkpoint, *args, stdout=StringIO())
+
+    def test_interrupted_run_resumes_after_the_written_rows(self):
+        with patch(f"{COMMAND}._translate_chunk", self.fake_chunk(interrupt_at="m4")):
+            with self.assertRaises(Interrupted):
+                self.backfill()
+        written = list(Message.objects.exclude(translated_content=None).order_by("id").values_list("content", flat=True))
+        self.assertEqual(written, ["m0", "m1"])  # m2 and m3 were in flight when m4 was interrupted
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        self.assertEqual(state["last_id"], self.ids[len(written) - 1])
+        self.assertEqual(state["pairs"], ["en-es"])
+
+        self.translated.clear()
+        with patch(f"{COMMAND}._translate_chunk", self.fake_chunk()):
+            self.backfill("--resume")
+        self.assertEqual(self.translated, [f"m{i}" for i in range(len(written), 6)])
+        self.assertEqual(
+            list(Message.objects.order_by("id").values_list("translated_content", flat=True)),
+            [f"es:m{i}" for i in range(6)],
+        )
+
+    def test_resume_with_other_row_selection_is_refused(self):
+        with patch(f"{COMMAND}._translate_chunk", self.fake_chunk(interrupt_at="m4")):
+            with self.assertRaises(Interrupted):
+                self.backfill()
+        for args in (("--retranslate",), ("--pairs", "en-es", "es-en")):
+            with self.assertRaisesMessage(CommandError, "run without --resume"):
+                self.backfill("--resume", *args)
@@ -0,0 +1,84 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from chat.admission import AdmissionController
+from chat.translator import FALLBACK_MESSAGE
+
+User = get_user_model()
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], CHAT_BATCH_MAX_ITEMS=5, CHAT_BATCH_MAX_CHARS=200)
+class TranslateBatchViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="ana", password="pw", phone_number="0"))
+        self.batches = []
+        for target, replacement in (
+            ("chat.views.get_admission", lambda: AdmissionController(max_in_flight=4, user_rate=100, user_burst=100)),
+            ("chat.views.translate_many", self.fake_translate_many),
+            ("chat.views.translate", lambda text, src, tgt, profile: f"{tgt}[{text}]"),
+        ):
+            patcher = patch(target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fake_translate_many(self, texts, src_lang, tgt_lang, profile):
+        self.batches.append((src_lang, tgt_lang, list(texts)))
+        # "zz" stands in for a pair whose model is unavailable
+        return [FALLBACK_MESSAGE if tgt_lang == "zz" else f"{tgt_lang}:{text}" for text in texts]
+
+    def post(self, items, **extra):
+        return self.client.post(reverse("translate_messages_batch"), {"items": items, **extra}, format="json")
+
+    def test_results_keep_request_order_with_per_item_errors(self):
+        response = self.post([
+            {"id": "a", "text": "one", "source_lang": "en", "target_lang": "es"},
+            {"id": "b", "text": "two", "source_lang": "en", "target_lang": "fr"},
+            {"id": "c", "text": "", "source_lang": "en", "target_lang": "es"},
+            {"id": "d", "text": "three", "source_lang": "en", "target_lang": "es"},
+            {"id": "e", "text": "four", "source_lang": "en", "target_lang": "zz"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], [
+            {"id": "a", "translated": "es:one"},
+            {"id": "b", "translated": "fr:two"},
+            {"id": "c", "error": "Missing required fields: text, source_lang, target_lang"},
+            {"id": "d", "translated": "es:three"},
+            {"id": "e", "error": "Translation failed or unsupported language pair"},
+        ])
+        # One batched call per language pair
+        self.assertEqual(sorted(self.batches), [
+            ("en", "es", ["one", "three"]), ("en", "fr", ["two"]), ("en", "zz", ["four"]),
+        ])
+
+    def test_items_needing_segmentation_are_translated_on_their_own(self):
+        multiline = "First line.\nSecond line."
+        response = self.post([
+            {"id": 1, "text": "short", "source_lang": "en", "target_lang": "es"},
+            {"id": 2, "text": multiline, "source_lang": "en", "target_lang": "es"},
+        ])
+        self.assertEqual(response.data["results"][1], {"id": 2, "translated": f"es[{multiline}]"})
+        self.assertEqual(self.batches, [("en", "es", ["short"])])
+
+    def test_item_count_and_character_limits(self):
+        item = {"text": "hi", "source_lang": "en", "target_lang": "es"}
+        response = self.post([item] * 6)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Too many items: 6 (max 5)")
+        response = self.post([{**item, "text": "x" * 150}, {**item, "text": "y" * 60}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Too much text: 210 characters (max 200)")
+        self.assertEqual(self.post([item] * 5).status_code, 200)
+        self.assertEqual(self.batches, [("en", "es", ["hi"] * 5)])
+
+    def test_malformed_requests(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.client.post(reverse("translate_messages_batch"), {"items": "hi"},
+                                          format="json").status_code, 400)
+        response = self.post([{"text": "hi", "source_lang": "en", "target_lang": "es"}], profile="turbo")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.batches)
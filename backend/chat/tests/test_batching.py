@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from concurrent.futures import CancelledError, wait
+
+from django.test import SimpleTestCase
+
+from chat.batching import BatchScheduler
+from chat.metrics import BATCH_SIZE, QUEUE_WAIT_SECONDS, render
+
+
+class RecordingRunner:
+    """Batch runner that upper-cases texts and remembers every batch it was given."""
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def __call__(self, texts, src_lang, tgt_lang, *options):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        return [text.upper() for text in texts]
+
+
+class BatchSchedulerTests(SimpleTestCase):
+    def test_concurrent_requests_share_a_batch_and_fan_out_in_order(self):
+        runner = RecordingRunner()
+        scheduler = BatchScheduler(runner, max_batch_size=8, max_wait_ms=50)
+        futures = [scheduler.submit(f"text {i}", "en", "es") for i in range(8)]
+        self.assertEqual([f.result(5) for f in futures], [f"TEXT {i}" for i in range(8)])
+        self.assertEqual(len(runner.batches), 1)
+
+    def test_pairs_and_options_are_batched_separately(self):
+        runner = RecordingRunner()
+        scheduler = BatchScheduler(runner, max_batch_size=8, max_wait_ms=20)
+        futures = [
+            scheduler.submit("a", "en", "es", "fast"),
+            scheduler.submit("b", "en", "es", "quality"),
+            scheduler.submit("c", "es", "en", "fast"),
+        ]
+        wait(futures, 5)
+        self.assertEqual(sorted(map(sorted, runner.batches)), [["a"], ["b"], ["c"]])
+
+    def test_cancelled_request_is_skipped_and_queue_keeps_draining(self):
+        runner = RecordingRunner()
+        runner.release.clear()
+        scheduler = BatchScheduler(runner, max_batch_size=1, max_wait_ms=0)
+        first = scheduler.submit("first", "en", "es")
+        self.assertTrue(runner.started.wait(5))
+        abandoned = scheduler.submit("abandoned", "en", "es")
+        self.assertTrue(abandoned.cancel())
+        runner.release.set()
+
+        self.assertEqual(first.result(5), "FIRST")
+        self.assertEqual(scheduler.submit("after", "en", "es").result(5), "AFTER")
+        self.assertNotIn(["abandoned"], runner.batches)
+        with self.assertRaises(CancelledError):
+            abandoned.result(0)
+
+    def test_cancelled_asyncio_waiter_does_not_kill_the_pair_thread(self):
+        runner = RecordingRunner()
+        runner.release.clear()
+        scheduler = BatchScheduler(runner, max_batch_size=4, max_wait_ms=0)
+
+        async def abandon():
+            task = asyncio.ensure_future(asyncio.wrap_future(scheduler.submit("gone", "en", "es")))
+            await asyncio.get_running_loop().run_in_executor(None, runner.started.wait, 5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(abandon())
+        runner.release.set()
+        self.assertEqual(scheduler.submit("next", "en", "es").result(5), "NEXT")
+
+    def test_runner_returning_too_few_results_fails_the_whole_batch(self):
+        scheduler = BatchScheduler(lambda texts, *key: texts[:1], max_batch_size=2, max_wait_ms=50)
+        futures = [scheduler.submit("a", "en", "es"), scheduler.submit("b", "en", "es")]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(5)
+        self.assertEqual(scheduler.submit("c", "en", "es").result(5), "c")
+
+    def test_runner_errors_reach_every_waiter(self):
+        def runner(texts, *key):
+            raise ValueError("model unavailable")
+
+        scheduler = BatchScheduler(runner, max_batch_size=4, max_wait_ms=20)
+        futures = [scheduler.submit(text, "en", "es") for text in "ab"]
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(5)
+
+    def test_batch_sizes_and_queue_waits_are_exported(self):
+        def observed(histogram):
+            series = histogram.values.get(("en", "yy"), [0.0, 0.0])
+            return sum(series[:-1]), series[-1]  # Observation count and sum
+
+        batches, texts = observed(BATCH_SIZE)
+        waits, _ = observed(QUEUE_WAIT_SECONDS)
+        scheduler = BatchScheduler(RecordingRunner(), max_batch_size=3, max_wait_ms=50)
+        wait([scheduler.submit(text, "en", "yy") for text in "abc"], 5)
+
+        self.assertEqual(observed(BATCH_SIZE), (batches + 1, texts + 3))
+        self.assertEqual(observed(QUEUE_WAIT_SECONDS)[0], waits + 3)
+        self.assertEqual(scheduler.stats.snapshot()["max_batch_size"], 3)
+        self.assertIn('translator_batch_size_bucket{src="en",tgt="yy",le="4"}', render())
@@ -0,0 +1,148 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.consumers import ChatTranslateConsumer
+from chat.models import Friendship, Message, UserProfile
+from chat.presence import PresenceService
+from chat.translator import FALLBACK_MESSAGE
+
+User = get_user_model()
+
+
+async def fake_translate(text, src_lang, tgt_lang, profile=None):
+    # French stands in for a pair whose model is unavailable
+    return FALLBACK_MESSAGE if tgt_lang == "fr" else f"{tgt_lang}:{text}"
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    CHAT_WRITE_BEHIND=False,
+)
+@patch("chat.consumers.get_warmup")
+@patch("chat.consumers.translate_async", fake_translate)
+class ChatConsumerFanOutTests(TransactionTestCase):
+    def setUp(self):
+        self.users = {}
+        for name, language in (("alice", "en"), ("bob", "es"), ("carol", "fr"), ("dave", "de")):
+            user = User.objects.create_user(username=name, password="pw", phone_number="0")
+            UserProfile.objects.create(user=user, preferred_language=language)
+            self.users[name] = user
+        for friend in ("bob", "carol"):
+            Friendship.objects.create(sender=self.users["alice"], receiver=self.users[friend], status="accepted")
+        Friendship.objects.create(sender=self.users["alice"], receiver=self.users["dave"], status="pending")
+        # A presence service per test, flushed while its users still exist
+        self.presence = PresenceService(redis_url="", flush_interval=3600)
+        patcher = patch("chat.consumers.get_presence", return_value=self.presence)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.presence.stop)
+
+    async def connect(self, name=None):
+        path = f"/ws/chat/?token={AccessToken.for_user(self.users[name])}" if name else "/ws/chat/"
+        communicator = WebsocketCommunicator(ChatTranslateConsumer.as_asgi(), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive_message(self, communicator):
+        """Next frame other than presence updates."""
+        while True:
+            frame = json.loads(await communicator.receive_from(timeout=5))
+            if frame.get("type") != "presence":
+                return frame
+
+    async def test_unauthenticated_socket_cannot_send(self, warmup):
+        anonymous = await self.connect()
+        await anonymous.send_to(text_data=json.dumps({
+            "message": "hello", "source_lang": "en", "target_lang": "es",
+            "sender_id": self.users["alice"].id, "receiver_id": self.users["bob"].id,
+        }))
+        self.assertEqual(await self.receive_message(anonymous), {"error": "Authentication required."})
+        await anonymous.disconnect()
+        self.assertEqual(await Message.objects.acount(), 0)
+
+    async def test_message_fans_out_to_each_friend_in_their_language(self, warmup):
+        bob, carol = await self.connect("bob"), await self.connect("carol")
+        alice = await self.connect("alice")
+        await alice.send_to(text_data=json.dumps({
+            "message": "hello", "source_lang": "en", "target_lang": "es",
+            "sender_id": self.users["dave"].id,  # ignored: the sender is the socket's user
+            "receiver_ids": [self.users["bob"].id, self.users["carol"].id],
+        }))
+        reply = await self.receive_message(alice)
+        self.assertEqual((reply["translated"], reply["sender_id"]), ("es:hello", self.users["alice"].id))
+
+        to_bob, to_carol = await self.receive_message(bob), await self.receive_message(carol)
+        self.assertEqual((to_bob["translated"], to_bob["target_lang"]), ("es:hello", "es"))
+        self.assertEqual((to_carol["translated"], to_carol["target_lang"]), (None, "fr"))
+        for communicator in (alice, bob, carol):
+            await communicator.disconnect()
+
+        rows = {
+            row["receiver_id"]: row async for row in Message.objects.values(
+                "sender_id", "receiver_id", "translated_content", "target_language", "client_id")
+        }
+        self.assertEqual(set(rows), {self.users["bob"].id, self.users["carol"].id})
+        self.assertTrue(all(row["sender_id"] == self.users["alice"].id for row in rows.values()))
+        self.assertEqual(str(rows[self.users["bob"].id]["client_id"]), to_bob["id"])
+        # A failed translation keeps the recipient's language and no text, for backfill_translations
+        carol_row = rows[self.users["carol"].id]
+        self.assertEqual((carol_row["translated_content"], carol_row["target_language"]), (None, "fr"))
+
+    async def test_recipients_must_be_accepted_friends(self, warmup):
+        dave = await self.connect("dave")
+        alice = await self.connect("alice")
+        await alice.send_to(text_data=json.dumps({
+            "message": "hello", "source_lang": "en", "target_lang": "es",
+            "receiver_ids": [self.users["bob"].id, self.users["dave"].id],
+        }))
+        reply = await self.receive_message(alice)
+        self.assertEqual(reply["error"], "Recipients must be accepted friends.")
+        self.assertEqual(reply["receiver_ids"], [self.users["dave"].id])
+        self.assertTrue(await dave.receive_nothing())
+        for communicator in (alice, dave):
+            await communicator.disconnect()
+        self.assertEqual(await Message.objects.acount(), 0)
+
+    async def test_primary_receiver_must_be_a_listed_recipient(self, warmup):
+        alice = await self.connect("alice")
+        await alice.send_to(text_data=json.dumps({
+            "message": "hello", "source_lang": "en", "target_lang": "es",
+            "receiver_id": self.users["dave"].id, "receiver_ids": [self.users["bob"].id],
+        }))
+        reply = await self.receive_message(alice)
+        self.assertEqual(reply["error"], "'receiver_id' must be one of 'receiver_ids'.")
+        await alice.disconnect()
+        self.assertEqual(await Message.objects.acount(), 0)
+
+    async def test_unknown_profile_is_rejected(self, warmup):
+        alice = await self.connect("alice")
+        await alice.send_to(text_data=json.dumps({
+            "message": "hello", "source_lang": "en", "target_lang": "es",
+            "receiver_id": self.users["bob"].id, "profile": "turbo",
+        }))
+        reply = await self.receive_message(alice)
+        self.assertEqual(reply["error"], "Unknown profile 'turbo'; use one of: quality, balanced, fast")
+        await alice.disconnect()
+        self.assertEqual(await Message.objects.acount(), 0)
+
+    async def test_overloaded_messages_are_shed_before_the_friend_lookup(self, warmup):
+        admission = MagicMock()
+        admission.admit.return_value = {"error": "overloaded", "reason": "queue_full", "retry_after": 1.0}
+        admission.snapshot.return_value = {"queue_depth": 7}
+        alice = await self.connect("alice")
+        with patch("chat.consumers.get_admission", return_value=admission), \
+                patch("chat.consumers.friend_ids") as friend_ids:
+            await alice.send_to(text_data=json.dumps({
+                "message": "hello", "source_lang": "en", "target_lang": "es", "receiver_id": self.users["bob"].id,
+            }))
+            reply = await self.receive_message(alice)
+        self.assertEqual((reply["error"], reply["queue_depth"]), ("overloaded", 7))
+        friend_ids.assert_not_called()
+        admission.release.assert_not_called()
+        await alice.disconnect()
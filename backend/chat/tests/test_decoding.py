@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from chat.decoding import SLO_MIN_SAMPLES, DecodingController
+
+
+class DecodingControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = patch("chat.decoding.time.monotonic", side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.controller = DecodingController(default="quality", slo_ms=200, queue_slo=10, window=50, cooldown=5)
+
+    def observe(self, seconds, count=SLO_MIN_SAMPLES, queue_depth=0):
+        for _ in range(count):
+            self.controller.observe(seconds, queue_depth)
+
+    def test_without_an_slo_the_requested_profile_is_served(self):
+        controller = DecodingController(default="balanced", slo_ms=0)
+        for _ in range(SLO_MIN_SAMPLES):
+            controller.observe(10.0, 1000)
+        self.assertEqual(controller.choose("quality"), "quality")
+        self.assertEqual(controller.choose(None), "balanced")
+        self.assertEqual(controller.snapshot()["served"], {"quality": 1, "balanced": 1})
+
+    def test_steps_down_one_profile_per_cooldown_while_over_the_slo(self):
+        self.now += 10
+        self.observe(0.5)
+        self.assertEqual(self.controller.choose("quality"), "balanced")
+        self.observe(0.5)  # Still within the cooldown
+        self.assertEqual(self.controller.current, "balanced")
+        self.now += 5
+        self.observe(0.5)
+        self.assertEqual(self.controller.choose("quality"), "fast")
+        self.now += 5
+        self.observe(0.5)
+        self.assertEqual(self.controller.current, "fast")  # Nothing cheaper
+        self.assertEqual(self.controller.switches, 2)
+
+    def test_queue_depth_alone_triggers_a_step_down(self):
+        self.now += 10
+        self.controller.observe(0.01, queue_depth=11)
+        self.assertEqual(self.controller.current, "balanced")
+
+    def test_steps_back_up_only_well_below_the_slo(self):
+        self.now += 10
+        self.observe(0.5)
+        self.assertEqual(self.controller.current, "balanced")
+        self.now += 10
+        self.observe(0.15)  # Under the SLO but above half of it: hold
+        self.assertEqual(self.controller.current, "balanced")
+        self.observe(0.05, count=100)  # The window now only holds fast samples
+        self.assertEqual(self.controller.current, "quality")
+        self.now += 10
+        self.observe(0.05)
+        self.assertEqual(self.controller.current, "quality")  # Never above the default
+
+    def test_cheaper_requested_profile_is_kept(self):
+        self.now += 10
+        self.observe(0.5)
+        self.assertEqual(self.controller.choose("fast"), "fast")
+        self.assertEqual(self.controller.choose("unknown"), "balanced")
@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from chat.friends import LOCAL_SNAPSHOT_TTL, etag_matches, snapshot_ttl
+from chat.models import Friendship, UserProfile
+
+User = get_user_model()
+
+
+class EtagMatchTests(SimpleTestCase):
+    def test_if_none_match_is_parsed_as_a_list_of_entity_tags(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"abc"', '"xyz", W/"abc"'))
+        self.assertTrue(etag_matches('"abc"', '*'))
+        self.assertFalse(etag_matches('"abc"', '"abcd"'))
+        self.assertFalse(etag_matches('"abc"', 'x"abc"y'))
+        self.assertFalse(etag_matches('"abc"', None))
+
+    def test_process_local_cache_keeps_snapshots_briefly(self):
+        self.assertEqual(snapshot_ttl(), LOCAL_SNAPSHOT_TTL)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+@patch("chat.presence.get_presence")
+class FriendsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ana = User.objects.create_user(username="ana", password="pw", phone_number="0")
+        ben = User.objects.create_user(username="ben", password="pw", phone_number="0")
+        UserProfile.objects.create(user=ben, preferred_language="es")
+        Friendship.objects.create(sender=ana, receiver=ben, status="accepted")
+        self.client = APIClient()
+        self.client.force_authenticate(ana)
+
+    def test_not_modified_only_for_a_matching_entity_tag(self, get_presence):
+        get_presence.return_value.online_users.return_value = set()
+        first = self.client.get(reverse("get_friends"))
+        self.assertEqual([friend["name"] for friend in first.data], ["ben"])
+        etag = first["ETag"]
+
+        for header in (etag, f'"stale", W/{etag}', "*"):
+            self.assertEqual(self.client.get(reverse("get_friends"), HTTP_IF_NONE_MATCH=header).status_code, 304)
+        self.assertEqual(self.client.get(reverse("get_friends"), HTTP_IF_NONE_MATCH=f"x{etag}").status_code, 200)
@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase
+
+from chat.langid import confident_language, identify
+
+
+class LanguageIdentificationTests(SimpleTestCase):
+    def test_served_languages_are_identified(self):
+        for text, language in (
+            ("I'll be there in ten minutes", "en"),
+            ("Hoy no puedo salir, tengo mucho trabajo", "es"),
+            ("Je suis en retard, désolé", "fr"),
+            ("Ich komme heute etwas später nach Hause", "de"),
+        ):
+            self.assertEqual(confident_language(text), language, text)
+
+    def test_italian_and_portuguese_are_not_taken_for_spanish(self):
+        for text, language in (
+            ("Domani mattina ho un appuntamento dal dentista", "it"),
+            ("Eu adoro pizza e massa", "pt"),
+        ):
+            self.assertEqual(identify(text)[0], language, text)
+            self.assertIsNone(confident_language(text), text)
+
+    def test_short_texts_are_not_classified(self):
+        self.assertEqual(identify("Hola!"), (None, 0.0))
@@ -0,0 +1,40 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from chat import metrics
+from chat.admission import get_admission
+from chat.result_cache import ENTRY_OVERHEAD_BYTES, ResultCache
+
+
+class MetricsExpositionTests(SimpleTestCase):
+    def types(self):
+        return dict(line.split()[2:4] for line in metrics.render().splitlines() if line.startswith("# TYPE"))
+
+    def test_running_totals_are_counters_named_total(self):
+        types = self.types()
+        for name in ("translator_model_cache_events_total", "translator_result_cache_events_total",
+                     "translator_memory_segments_total", "chat_admission_total",
+                     "translator_decoding_profile_requests_total"):
+            self.assertEqual(types.get(name), "counter", name)
+        self.assertEqual(types["chat_admission"], "gauge")
+        for name, kind in types.items():
+            self.assertEqual(kind == "counter", name.endswith("_total"), name)
+
+    def test_scrape_time_counters_read_the_snapshot(self):
+        admitted = get_admission().snapshot()["admitted"]
+        self.assertIn(f'chat_admission_total{{outcome="admitted"}} {admitted}', metrics.render())
+        self.assertNotIn('chat_admission{key="admitted"}', metrics.render())
+
+    def test_every_result_cache_counter_is_exported(self):
+        cache = ResultCache(max_bytes=2 * ENTRY_OVERHEAD_BYTES + 200, ttl=60)
+        for word in ("one", "two", "three"):
+            cache.set(word, "en", "es", "ns", word.upper())
+        cache.invalidate_pair("en", "fr")
+        with patch("chat.result_cache.get_result_cache", return_value=cache):
+            rendered = metrics.render()
+        for event in cache.stats:
+            self.assertIn(f'translator_result_cache_events_total{{event="{event}"}}', rendered)
+        self.assertIn('translator_result_cache_events_total{event="evictions"} 1', rendered)
+        self.assertIn('translator_result_cache_events_total{event="invalidations"} 1', rendered)
+        self.assertIn('translator_result_cache_size{key="entries"} 2', rendered)
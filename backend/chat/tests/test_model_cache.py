@@ -0,0 +1,100 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from chat.translator import ModelCache
+
+
+class FakeModel:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+def loader(name, size=100):
+    return lambda: (FakeModel(name, size), f"tokenizer:{name}")
+
+
+@patch("chat.translator.model_size_bytes", lambda model: model.size)
+class ModelCacheTests(SimpleTestCase):
+    def test_concurrent_misses_share_one_load(self):
+        cache = ModelCache(max_bytes=1000)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow_loader():
+            calls.append(threading.get_ident())
+            started.set()
+            release.wait(5)
+            return FakeModel("a", 100), "tokenizer:a"
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            owner = pool.submit(cache.get_or_load, "a", slow_loader)
+            self.assertTrue(started.wait(5))
+            waiters = [pool.submit(cache.get_or_load, "a", slow_loader) for _ in range(3)]
+            while cache.snapshot()["load_waits"] < 3:
+                threading.Event().wait(0.01)
+            release.set()
+            results = [future.result(5) for future in [owner, *waiters]]
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(model is results[0][0] for model, _ in results))
+        snapshot = cache.snapshot()
+        self.assertEqual((snapshot["misses"], snapshot["load_waits"], snapshot["loads"]), (4, 3, 1))
+        self.assertEqual(cache.get_or_load("a", slow_loader)[0], results[0][0])
+        self.assertEqual(cache.snapshot()["hits"], 1)
+
+    def test_failed_load_reaches_waiters_and_is_retried(self):
+        cache = ModelCache(max_bytes=1000)
+        started, release = threading.Event(), threading.Event()
+
+        def failing_loader():
+            started.set()
+            release.wait(5)
+            raise OSError("download failed")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            owner = pool.submit(cache.get_or_load, "a", failing_loader)
+            self.assertTrue(started.wait(5))
+            waiter = pool.submit(cache.get_or_load, "a", failing_loader)
+            while cache.snapshot()["load_waits"] < 1:
+                threading.Event().wait(0.01)
+            release.set()
+            for future in (owner, waiter):
+                with self.assertRaises(OSError):
+                    future.result(5)
+        self.assertEqual(cache.get_or_load("a", loader("a"))[1], "tokenizer:a")
+
+    def test_evicts_least_recently_used_models_over_the_byte_budget(self):
+        cache = ModelCache(max_bytes=300)
+        for name in "abc":
+            cache.get_or_load(name, loader(name))
+        cache.get_or_load("a", loader("a"))  # a is now the most recently used
+        cache.get_or_load("d", loader("d"))
+        snapshot = cache.snapshot()
+        self.assertEqual(set(snapshot["models"]), {"a", "c", "d"})
+        self.assertEqual((snapshot["resident_bytes"], snapshot["evictions"]), (300, 1))
+        cache.get_or_load("e", loader("e", size=250))
+        self.assertEqual(set(cache.snapshot()["models"]), {"e"})
+
+    def test_pinned_models_are_never_evicted(self):
+        cache = ModelCache(max_bytes=200)
+        cache.pin("a")
+        for name in "abc":
+            cache.get_or_load(name, loader(name))
+        self.assertEqual(set(cache.snapshot()["models"]), {"a", "c"})
+        cache.get_or_load("d", loader("d", size=150))  # Evicts c, then d itself: a stays
+        self.assertEqual(set(cache.snapshot()["models"]), {"a"})
+        self.assertTrue(cache.snapshot()["models"]["a"]["pinned"])
+
+    def test_unpinning_applies_the_budget_again(self):
+        cache = ModelCache(max_bytes=200)
+        cache.pin("a")
+        cache.pin("b")
+        for name in "ab":
+            cache.get_or_load(name, loader(name, size=150))
+        self.assertEqual(cache.snapshot()["resident_bytes"], 300)  # Pinned models may exceed the budget
+        cache.unpin("a")
+        self.assertEqual(set(cache.snapshot()["models"]), {"b"})
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from chat.models import Message
+from chat.pagination import InvalidCursor, conversation_page, decode_cursor, encode_cursor
+
+User = get_user_model()
+
+START = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        cursor = encode_cursor({"created_at": START, "id": 42})
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor), (START, 42))
+
+    def test_garbage_is_rejected(self):
+        for cursor in ("not-a-cursor", "", encode_cursor({"created_at": START, "id": 1})[:-3] + "!!"):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+
+class ConversationPageTests(TestCase):
+    def setUp(self):
+        self.ana = User.objects.create_user(username="ana", password="pw", phone_number="0")
+        self.ben = User.objects.create_user(username="ben", password="pw", phone_number="0")
+        cleo = User.objects.create_user(username="cleo", password="pw", phone_number="0")
+        # Alternating directions, with pairs sharing a timestamp to exercise the id tie-break
+        self.ids = []
+        for i in range(7):
+            sender, receiver = (self.ana, self.ben) if i % 2 == 0 else (self.ben, self.ana)
+            message = Message.objects.create(sender=sender, receiver=receiver, content=f"m{i}",
+                                             created_at=START + timedelta(minutes=i // 2))
+            self.ids.append(message.id)
+        Message.objects.create(sender=cleo, receiver=self.ana, content="other", created_at=START)
+
+    def pages(self, **kwargs):
+        rows, has_more = conversation_page(self.ana.id, self.ben.id, limit=3, **kwargs)
+        return [row["id"] for row in rows], has_more
+
+    def test_newest_page_then_older_pages(self):
+        ids, has_more = self.pages()
+        self.assertEqual(ids, self.ids[4:])
+        self.assertTrue(has_more)
+        cursor = encode_cursor(Message.objects.values("id", "created_at").get(id=ids[0]))
+        ids, has_more = self.pages(before=cursor)
+        self.assertEqual(ids, self.ids[1:4])
+        self.assertTrue(has_more)
+        cursor = encode_cursor(Message.objects.values("id", "created_at").get(id=ids[0]))
+        self.assertEqual(self.pages(before=cursor), ([self.ids[0]], False))
+
+    def test_newer_pages_after_a_cursor(self):
+        cursor = encode_cursor(Message.objects.values("id", "created_at").get(id=self.ids[1]))
+        self.assertEqual(self.pages(after=cursor), (self.ids[2:5], True))
+        cursor = encode_cursor(Message.objects.values("id", "created_at").get(id=self.ids[4]))
+        self.assertEqual(self.pages(after=cursor), (self.ids[5:], False))
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class GetMessagesViewTests(TestCase):
+    def setUp(self):
+        self.ana = User.objects.create_user(username="ana", password="pw", phone_number="0")
+        self.ben = User.objects.create_user(username="ben", password="pw", phone_number="0")
+        for i in range(5):
+            Message.objects.create(sender=self.ana, receiver=self.ben, content=f"m{i}",
+                                   created_at=START + timedelta(minutes=i))
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        self.url = reverse("get_messages", args=[self.ben.id])
+
+    def test_cursors_walk_the_whole_conversation(self):
+        contents = []
+        response = self.client.get(self.url, {"limit": 2, "lang": "en"})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            contents = [m["content"] for m in response.data["results"]] + contents
+            self.assertTrue(all(m["translation"] == m["content"] for m in response.data["results"]))
+            if not response.data["has_more"]:
+                break
+            response = self.client.get(self.url, {"limit": 2, "lang": "en", "before": response.data["before"]})
+        self.assertEqual(contents, [f"m{i}" for i in range(5)])
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        response = self.client.get(self.url, {"before": "garbage"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase
+
+from chat.models import Message
+from chat.persistence import MessageWriter
+
+User = get_user_model()
+
+
+class WriterMixin:
+    def setUp(self):
+        self.ana = User.objects.create_user(username="ana", password="pw", phone_number="0")
+        self.ben = User.objects.create_user(username="ben", password="pw", phone_number="0")
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        self.spool_path = os.path.join(spool_dir.name, "spool.jsonl")
+        # Only explicit flushes write, so everything runs on the test's connection
+        self.writer = MessageWriter(batch_size=1000, flush_interval_ms=600000, spool_path=self.spool_path)
+        self.addCleanup(self.writer.drain)
+
+    def enqueue(self, content):
+        return self.writer.enqueue(self.ana.id, self.ben.id, content, None, "en", "en")
+
+
+class MessageWriterSpoolTests(WriterMixin, TestCase):
+    def test_unavailable_database_spools_and_next_flush_replays(self):
+        ids = [self.enqueue("one"), self.enqueue("two")]
+        with patch.object(Message.objects, "bulk_create", side_effect=OperationalError("database is down")):
+            self.writer.flush()
+        with open(self.spool_path, encoding="utf-8") as spool:
+            spooled = [json.loads(line) for line in spool]
+        self.assertEqual([row["client_id"] for row in spooled], [str(i) for i in ids])
+        self.assertEqual(self.writer.stats["spooled"], 2)
+        self.assertFalse(Message.objects.exists())
+
+        self.writer.flush()
+        self.assertEqual(
+            list(Message.objects.order_by("created_at").values_list("client_id", "content")),
+            [(ids[0], "one"), (ids[1], "two")],
+        )
+        self.assertFalse(os.path.exists(self.spool_path))
+        self.assertFalse(os.path.exists(f"{self.spool_path}.replay"))
+
+    def test_replay_skips_rows_already_written(self):
+        self.enqueue("hello")
+        self.writer.flush()
+        row = Message.objects.values("client_id", "sender_id", "receiver_id", "content", "translated_content",
+                                     "source_language", "target_language", "is_translated", "created_at").get()
+        self.writer._spool([row])
+        self.writer.flush()
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_interrupted_replay_is_finished_with_the_new_spool(self):
+        self.enqueue("left behind")
+        self.enqueue("spooled later")
+        rows, self.writer.buffer = self.writer.buffer, []
+        self.writer._spool(rows[:1])
+        os.rename(self.spool_path, f"{self.spool_path}.replay")
+        self.writer._spool(rows[1:])
+        self.writer.flush()
+        self.assertEqual(sorted(Message.objects.values_list("content", flat=True)), ["left behind", "spooled later"])
+        self.assertFalse(os.path.exists(f"{self.spool_path}.replay"))
+
+
+    def test_corrupt_spool_lines_are_quarantined_and_the_batch_is_written(self):
+        self.enqueue("spooled")
+        rows, self.writer.buffer = self.writer.buffer, []
+        with open(self.spool_path, "w", encoding="utf-8") as spool:
+            spool.write('{"client_id": "torn')  # A crash mid-write
+        self.writer._spool(rows)
+        self.enqueue("fresh")
+        self.writer.flush()
+        self.assertEqual(sorted(Message.objects.values_list("content", flat=True)), ["fresh", "spooled"])
+        self.assertEqual(self.writer.stats["corrupt"], 1)
+        with open(f"{self.spool_path}.corrupt", encoding="utf-8") as quarantine:
+            self.assertEqual(quarantine.read(), '{"client_id": "torn\n')
+        self.enqueue("later")
+        self.writer.flush()
+        self.assertEqual(Message.objects.count(), 3)
+
+    def test_rows_are_kept_when_they_can_be_neither_written_nor_spooled(self):
+        self.enqueue("kept")
+        with patch.object(Message.objects, "bulk_create", side_effect=OperationalError("database is down")), \
+                patch.object(self.writer, "_spool", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.writer.flush()
+        self.assertEqual(self.writer.pending(), 1)
+        self.writer.flush()
+        self.assertEqual(list(Message.objects.values_list("content", flat=True)), ["kept"])
+
+class MessageWriterIntegrityTests(WriterMixin, TransactionTestCase):
+    """Foreign keys are only checked at commit, so these rows must be written outside a test transaction."""
+    def test_rows_with_unknown_users_are_dropped_alone(self):
+        self.enqueue("kept")
+        self.writer.enqueue(self.ana.id, 987654, "orphan", None, "en", "en")
+        self.writer.flush()
+        self.assertEqual(list(Message.objects.values_list("content", flat=True)), ["kept"])
+        self.assertEqual(self.writer.stats["dropped"], 1)
+        self.assertFalse(os.path.exists(self.spool_path))
@@ -0,0 +1,43 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from chat.models import UserProfile
+from chat.presence import PresenceService
+
+User = get_user_model()
+
+
+class PresenceFlushTests(TestCase):
+    def setUp(self):
+        self.presence = PresenceService(redis_url="", ttl=60, flush_interval=60)
+        self.ana = User.objects.create_user(username="ana", password="pw", phone_number="0")
+
+    def test_new_profiles_keep_the_flushed_last_seen(self):
+        seen = time.time() - 3600
+        self.presence.dirty[self.ana.id] = (seen, True)
+        self.assertEqual(self.presence.flush(), 1)
+        profile = UserProfile.objects.get(user=self.ana)
+        self.assertTrue(profile.is_online)
+        self.assertEqual(profile.last_seen, datetime.fromtimestamp(seen, tz=dt_timezone.utc))
+
+    def test_failed_flush_restores_marks_without_clobbering_newer_ones(self):
+        ben = User.objects.create_user(username="ben", password="pw", phone_number="0")
+        self.presence.dirty = {self.ana.id: (100.0, True), ben.id: (100.0, True)}
+
+        def fail(dirty):
+            self.presence.dirty[ben.id] = (200.0, False)  # Marked while the flush was running
+            raise RuntimeError("database unavailable")
+
+        with patch.object(self.presence, "_write", side_effect=fail):
+            with self.assertRaises(RuntimeError):
+                self.presence.flush()
+        self.assertEqual(self.presence.dirty, {self.ana.id: (100.0, True), ben.id: (200.0, False)})
+
+    def test_marks_of_deleted_users_are_dropped(self):
+        self.presence.dirty = {self.ana.id: (100.0, False), 987654: (100.0, True)}
+        self.assertEqual(self.presence.flush(), 1)
+        self.assertEqual(self.presence.dirty, {})
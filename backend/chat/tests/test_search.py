@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from chat.models import Message, MessageTranslation
+from chat.pagination import encode_cursor
+from chat.search import search_backend, search_conversation
+
+User = get_user_model()
+
+START = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class SearchConversationTests(TestCase):
+    def setUp(self):
+        self.ana = User.objects.create_user(username="ana", password="pw", phone_number="0")
+        self.ben = User.objects.create_user(username="ben", password="pw", phone_number="0")
+        self.cleo = User.objects.create_user(username="cleo", password="pw", phone_number="0")
+
+    def search(self, query, user=None, friend=None, **kwargs):
+        rows, has_more = search_conversation((user or self.ana).id, (friend or self.ben).id, query, **kwargs)
+        return [row["content"] for row in rows]
+
+    def test_sqlite_uses_the_fts5_index(self):
+        self.assertEqual(search_backend(), "fts5")
+
+    def test_bulk_created_messages_and_translations_are_indexed(self):
+        messages = Message.objects.bulk_create([
+            Message(sender=self.ana, receiver=self.ben, content="see you at the station", created_at=START),
+            Message(sender=self.ben, receiver=self.ana, content="hasta luego", translated_content="see you later",
+                    created_at=START + timedelta(minutes=1)),
+            Message(sender=self.ana, receiver=self.cleo, content="station closed", created_at=START),
+        ])
+        MessageTranslation.objects.create(message=Message.objects.get(content=messages[0].content),
+                                          language="es", content="nos vemos en la estación")
+        self.assertEqual(self.search("station"), ["see you at the station"])
+        self.assertEqual(self.search("see you"), ["hasta luego", "see you at the station"])
+        self.assertEqual(self.search("estacion"), ["see you at the station"])  # Diacritics folded
+        self.assertEqual(self.search("stat"), ["see you at the station"])  # Last word is a prefix
+        self.assertEqual(self.search("station", friend=self.cleo), ["station closed"])
+        self.assertEqual(self.search("station", user=self.ben, friend=self.cleo), [])
+
+    def test_updates_and_deletes_keep_the_index_in_sync(self):
+        message = Message.objects.create(sender=self.ana, receiver=self.ben, content="old words")
+        Message.objects.filter(id=message.id).update(content="new words")
+        self.assertEqual(self.search("old"), [])
+        self.assertEqual(self.search("new"), ["new words"])
+        message.delete()
+        self.assertEqual(self.search("words"), [])
+
+    def test_pages_through_matches_newest_first(self):
+        for i in range(5):
+            Message.objects.create(sender=self.ana, receiver=self.ben, content=f"ping {i}",
+                                   created_at=START + timedelta(minutes=i))
+        rows, has_more = search_conversation(self.ana.id, self.ben.id, "ping", limit=3)
+        self.assertEqual([row["content"] for row in rows], ["ping 4", "ping 3", "ping 2"])
+        self.assertTrue(has_more)
+        self.assertEqual(self.search("ping", before=encode_cursor(rows[-1])), ["ping 1", "ping 0"])
+
+    def test_scan_fallback_matches_the_index(self):
+        Message.objects.create(sender=self.ana, receiver=self.ben, content="lunch tomorrow?", created_at=START)
+        Message.objects.create(sender=self.ben, receiver=self.ana, content="claro", translated_content="sure, lunch",
+                               created_at=START + timedelta(minutes=1))
+        indexed = self.search("lunch")
+        with patch("chat.search._backend", "scan"):
+            self.assertEqual(self.search("lunch"), indexed)
+        self.assertEqual(indexed, ["claro", "lunch tomorrow?"])
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class SearchMessagesViewTests(TestCase):
+    def setUp(self):
+        self.ana = User.objects.create_user(username="ana", password="pw", phone_number="0")
+        self.ben = User.objects.create_user(username="ben", password="pw", phone_number="0")
+        Message.objects.create(sender=self.ben, receiver=self.ana, content="hola amigo", source_language="es")
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+        self.url = reverse("search_messages", args=[self.ben.id])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+    @patch("chat.translations.translate_many")
+    def test_returns_matches_without_translating(self, translate_many):
+        response = self.client.get(self.url, {"q": "amigo", "lang": "en"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m["content"] for m in response.data["results"]], ["hola amigo"])
+        self.assertFalse(response.data["has_more"])
+        translate_many.assert_not_called()
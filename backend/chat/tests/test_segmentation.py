@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from chat.segmentation import segment_text, should_segment
+from chat.translator import _translate_segmented
+
+SAMPLES = [
+    "Hello there.  How are you?\n\nSee https://example.com/a?b=1, then mail me at ana@example.com!",
+    "Run `pip install -r requirements.txt` first.\n```\ndef f():\n    return 1\n```\nDone 🎉",
+    "  leading and trailing whitespace survive.  ",
+    "¿Qué tal? «Bien», dijo… Vale.\n\t- item one\n\t- item two",
+    "one, two, three, four, five, six, seven, eight, nine, ten, eleven, twelve, thirteen",
+    "",
+]
+
+
+class SegmentTextTests(SimpleTestCase):
+    def test_pieces_join_back_to_the_original_text(self):
+        for text in SAMPLES:
+            for max_chars in (400, 20):
+                with self.subTest(text=text, max_chars=max_chars):
+                    self.assertEqual("".join(piece for piece, _ in segment_text(text, max_chars)), text)
+
+    def test_urls_emails_code_and_emoji_are_not_translatable(self):
+        for text in SAMPLES[:2]:
+            verbatim = [piece for piece, translatable in segment_text(text) if not translatable]
+            translatable = [piece for piece, translatable in segment_text(text) if translatable]
+            for span in ("https://example.com/a?b=1", "ana@example.com", "`pip install -r requirements.txt`",
+                         "```\ndef f():\n    return 1\n```"):
+                if span in text:
+                    self.assertIn(span, verbatim)
+                    self.assertFalse(any(span in piece for piece in translatable), span)
+        # Sentences without letters (emoji, numbers) are kept verbatim too
+        self.assertEqual(segment_text("Great. 🎉👍\n42"), [("Great.", True), (" ", False), ("🎉👍", False),
+                                                           ("\n", False), ("42", False)])
+        # Trailing punctuation is prose, not part of the URL
+        self.assertIn(("https://example.com/a?b=1", False), segment_text("Go to https://example.com/a?b=1."))
+
+    def test_over_long_sentences_are_split_at_clauses(self):
+        pieces = [piece for piece, translatable in segment_text(SAMPLES[4], 20) if translatable]
+        self.assertGreater(len(pieces), 1)
+        self.assertTrue(all(len(piece) <= 20 for piece in pieces))
+
+    def test_protected_spans_trigger_segmentation(self):
+        self.assertTrue(should_segment("see https://example.com"))
+        self.assertTrue(should_segment("run `ls`"))
+        self.assertFalse(should_segment("just a short sentence."))
+
+
+class TranslateSegmentedTests(SimpleTestCase):
+    @patch("chat.translator._translate_routed", lambda texts, *pair: [text.upper() for text in texts])
+    def test_only_prose_reaches_the_model_and_is_stitched_back_in_place(self):
+        text = SAMPLES[0] + "\n" + SAMPLES[1]
+        self.assertEqual(
+            _translate_segmented(text, "en", "es", "fast"),
+            "HELLO THERE.  HOW ARE YOU?\n\nSEE https://example.com/a?b=1, THEN MAIL ME AT ana@example.com!\n"
+            "RUN `pip install -r requirements.txt` FIRST.\n```\ndef f():\n    return 1\n```\nDONE 🎉",
+        )
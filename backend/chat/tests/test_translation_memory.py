@@ -0,0 +1,61 @@
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from chat.translation_memory import TranslationMemory, jaccard, shingles
+
+NAMESPACE = "test-model"
+
+
+class TranslationMemoryTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.memory = TranslationMemory(directory.name)
+        self.addCleanup(self.memory.close)
+
+    def lookup(self, *segments):
+        return self.memory.lookup(segments, "en", "es", NAMESPACE)
+
+    def test_exact_and_surface_matches_are_reused(self):
+        self.memory.add([("I will be there at the station tonight.", "Estaré en la estación esta noche.")],
+                        "en", "es", NAMESPACE)
+        self.assertEqual(self.lookup("I will be there at the station tonight.", "i will be there, at the STATION tonight"),
+                         ["Estaré en la estación esta noche."] * 2)
+        self.assertEqual(self.memory.snapshot()["fuzzy_hits"], 1)
+
+    def test_near_matches_with_different_words_are_not_reused_by_default(self):
+        stored = [
+            "I will be there at the train station tonight after work.",
+            "Maria is waiting for you at the front door of the building",
+            "I can come to the meeting tomorrow morning with the documents",
+        ]
+        near = [
+            "I will not be there at the train station tonight after work.",
+            "Mario is waiting for you at the front door of the building",
+            "I cant come to the meeting tomorrow morning with the documents",
+        ]
+        self.memory.add([(text, f"translation {i}") for i, text in enumerate(stored)], "en", "es", NAMESPACE)
+        self.assertEqual(self.lookup(*near), [None, None, None])
+        # Trigram similarity alone cannot tell these apart
+        for a, b in zip(stored, near):
+            self.assertGreater(jaccard(shingles(a), shingles(b)), 0.85)
+
+    def test_question_marks_stay_significant(self):
+        self.memory.add([("you are coming to the party tonight", "vienes a la fiesta esta noche")], "en", "es", NAMESPACE)
+        self.assertEqual(self.lookup("you are coming to the party tonight?"), [None])
+
+    def test_similarity_threshold_is_opt_in_and_keeps_numbers_equal(self):
+        self.memory.threshold = 0.8
+        self.memory.add([("Please bring 3 bottles of water tomorrow", "Trae 3 botellas de agua mañana")],
+                        "en", "es", NAMESPACE)
+        self.assertEqual(self.lookup("Please bring 3 bottle of water tomorrow", "Please bring 4 bottles of water tomorrow"),
+                         ["Trae 3 botellas de agua mañana", None])
+
+    def test_pairs_do_not_wait_on_each_other(self):
+        self.memory.lookup(["warm up"], "en", "fr", NAMESPACE)
+        with self.memory._pair_lock("en", "fr"):
+            done = threading.Event()
+            threading.Thread(target=lambda: (self.lookup("hello there"), done.set())).start()
+            self.assertTrue(done.wait(5))
@@ -0,0 +1,71 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from chat.models import Message, MessageTranslation
+from chat.tests.test_backfill import COMMAND, InlineExecutor
+from chat.translations import translations_for
+from chat.translator import FALLBACK_MESSAGE, model_version
+
+User = get_user_model()
+
+
+def fake_translate_many(texts, src_lang, tgt_lang, profile=None):
+    return [FALLBACK_MESSAGE if text == "untranslatable" else f"{tgt_lang}:{text}" for text in texts]
+
+
+class TranslationsForTests(TestCase):
+    def setUp(self):
+        ana = User.objects.create_user(username="ana", password="pw", phone_number="0")
+        ben = User.objects.create_user(username="ben", password="pw", phone_number="0")
+        self.messages = [
+            Message.objects.create(sender=ana, receiver=ben, content=content, source_language="en",
+                                   target_language="es", translated_content=f"es:{content}")
+            for content in ("hello", "bye", "untranslatable")
+        ]
+
+    def rows(self):
+        return list(Message.objects.order_by("id").values())
+
+    @patch("chat.translations.translate_many", side_effect=fake_translate_many)
+    def test_translated_once_stored_and_reused(self, translate_many):
+        hello, bye, untranslatable = (m.id for m in self.messages)
+        self.assertEqual(translations_for(self.rows(), "fr"), {hello: "fr:hello", bye: "fr:bye"})
+        self.assertEqual(translate_many.call_count, 1)  # One batch for the page
+        stored = MessageTranslation.objects.filter(language="fr")
+        self.assertEqual(dict(stored.values_list("message_id", "content")), {hello: "fr:hello", bye: "fr:bye"})
+        self.assertEqual(set(stored.values_list("model_version", flat=True)), {model_version("en", "fr")})
+
+        translate_many.reset_mock()
+        self.assertEqual(translations_for(self.rows(), "fr"), {hello: "fr:hello", bye: "fr:bye"})
+        translate_many.assert_called_once_with(["untranslatable"], "en", "fr")  # Only the failed one is retried
+        self.assertEqual(translations_for(self.rows(), "fr", translate_missing=False),
+                         {hello: "fr:hello", bye: "fr:bye"})
+        self.assertEqual(translate_many.call_count, 1)
+
+    @patch("chat.translations.translate_many", side_effect=fake_translate_many)
+    def test_original_and_send_time_languages_need_no_translation(self, translate_many):
+        hello = self.messages[0].id
+        self.assertEqual(translations_for(self.rows(), "en")[hello], "hello")
+        self.assertEqual(translations_for(self.rows(), "es")[hello], "es:hello")
+        translate_many.assert_not_called()
+
+    @patch(f"{COMMAND}.ProcessPoolExecutor", InlineExecutor)
+    @patch(f"{COMMAND}._translate_chunk", lambda texts, src, tgt, profile: [f"new {tgt}:{text}" for text in texts])
+    def test_stale_translations_are_refreshed_by_the_backfill(self):
+        hello, bye, _ = self.messages
+        MessageTranslation.objects.create(message=hello, language="fr", content="old", model_version="old-model@v0")
+        MessageTranslation.objects.create(message=bye, language="fr", content="fr:bye",
+                                          model_version=model_version("en", "fr"))
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            call_command("backfill_translations", "--stale-translations", "--pairs", "en-fr", "--workers", "1",
+                         "--checkpoint", os.path.join(checkpoint_dir, "checkpoint.json"), stdout=StringIO())
+        refreshed = MessageTranslation.objects.get(message=hello, language="fr")
+        self.assertEqual((refreshed.content, refreshed.model_version), ("new fr:hello", model_version("en", "fr")))
+        self.assertEqual(MessageTranslation.objects.get(message=bye, language="fr").content, "fr:bye")
+        self.assertEqual(translations_for(self.rows(), "fr", translate_missing=False)[hello.id], "new fr:hello")
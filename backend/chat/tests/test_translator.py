@@ -0,0 +1,69 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from chat import translator
+from chat.result_cache import ResultCache
+
+
+class RecordingRedis:
+    """Stand-in for the shared cache tier that records which thread called it."""
+    def __init__(self):
+        self.values = {}
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.threads.append(threading.get_ident())
+        self.values[key] = value
+
+
+def fake_run_batch(texts, src_lang, tgt_lang, profile=None):
+    return [f"<{text}>" for text in texts]
+
+
+@patch("chat.translator.BATCHING_ENABLED", False)
+@patch("chat.translator.run_batch", fake_run_batch)
+@patch("chat.translator.LANGID_ENABLED", False)
+class TranslateAsyncTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = ResultCache()
+        self.cache.redis = RecordingRedis()
+        patcher = patch("chat.translator.get_result_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def translate_and_settle(self, text):
+        result = await translator.translate_async(text, "en", "es", "balanced")
+        await asyncio.gather(*translator._pending_writes)
+        return result, threading.get_ident()
+
+    def test_shared_cache_tier_is_used_off_the_event_loop(self):
+        result, loop_thread = asyncio.run(self.translate_and_settle("Good morning"))
+        self.assertEqual(result, "<Good morning>")
+        self.assertEqual(len(self.cache.redis.threads), 2)  # One miss, one write
+        self.assertNotIn(loop_thread, self.cache.redis.threads)
+
+        self.cache.clear()
+        result, _ = asyncio.run(self.translate_and_settle("Good morning"))
+        self.assertEqual(result, "<Good morning>")
+        self.assertEqual(self.cache.snapshot()["shared_hits"], 1)
+
+    def test_failed_background_write_is_logged_and_released(self):
+        async def run():
+            with patch("chat.translator._remember", side_effect=RuntimeError("redis down")):
+                result = await translator.translate_async("Good evening", "en", "es", "balanced")
+                writes = list(translator._pending_writes)
+                await asyncio.wait(writes)
+            await asyncio.sleep(0)
+            return result
+
+        with self.assertLogs(level="ERROR") as logs:
+            self.assertEqual(asyncio.run(run()), "<Good evening>")
+        self.assertIn("redis down", logs.output[0])
+        self.assertEqual(translator._pending_writes, set())
@@ -0,0 +1,62 @@
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from chat.models import Friendship, UserProfile
+from chat.translator import FALLBACK_MESSAGE
+from chat.warmup import WARMUP_SAMPLE, Warmup, friend_language_pairs
+
+User = get_user_model()
+
+
+class WarmupTests(SimpleTestCase):
+    def test_source_language_without_samples_falls_back_to_a_default_sentence(self):
+        run_batch = MagicMock(return_value=["Ciao, come stai?"])
+        with patch("chat.translator.run_batch", run_batch), \
+                patch("chat.translator.SUPPORTED_LANGUAGE_PAIRS", {("xx", "it")}):
+            self.assertTrue(Warmup([]).warm_pair("xx", "it"))
+        run_batch.assert_called_once_with([WARMUP_SAMPLE], "xx", "it")
+
+    def test_warms_with_the_first_sample_sentence(self):
+        run_batch = MagicMock(return_value=[FALLBACK_MESSAGE])
+        with patch("chat.translator.run_batch", run_batch), \
+                patch.dict("chat.sample_corpus.SAMPLE_SENTENCES", {"en": ["Hi!"]}):
+            self.assertFalse(Warmup([]).warm_pair("en", "es"))
+        run_batch.assert_called_once_with(["Hi!"], "en", "es")
+
+    def preloaded(self, outcomes):
+        warmup = Warmup(list(outcomes))
+        with patch.object(warmup, "warm_pair", side_effect=lambda *pair: outcomes[pair]):
+            self.assertEqual(warmup.snapshot()["state"], "warming")
+            warmup._preload()
+        return warmup.snapshot()
+
+    def test_ready_only_when_a_preloaded_pair_works(self):
+        self.assertEqual(self.preloaded({("en", "es"): True, ("es", "en"): True})["state"], "ready")
+        degraded = self.preloaded({("en", "es"): True, ("es", "en"): False})
+        self.assertEqual((degraded["ready"], degraded["state"]), (True, "degraded"))
+        failed = self.preloaded({("en", "es"): False, ("es", "en"): False})
+        self.assertEqual((failed["ready"], failed["state"]), (False, "failed"))
+
+    def test_prefetch_is_capped_and_cooled_down(self):
+        warmup = Warmup([])
+        warmup.executor = MagicMock()
+        with patch("chat.warmup.PREFETCH_MAX_PAIRS", 1):
+            self.assertEqual(warmup.prefetch([("en", "es"), ("en", "fr")]), [("en", "es")])
+            self.assertEqual(warmup.prefetch([("en", "es"), ("en", "fr")]), [])
+        self.assertEqual(warmup.executor.submit.call_count, 1)
+
+
+class FriendLanguagePairsTests(TestCase):
+    def test_outgoing_pairs_of_online_friends_most_common_first(self):
+        users = {}
+        for name, language in (("ana", "es"), ("ben", "en"), ("cal", "fr"), ("dee", "fr"), ("eve", "de")):
+            users[name] = User.objects.create_user(username=name, password="pw", phone_number="0")
+            UserProfile.objects.create(user=users[name], preferred_language=language)
+        for name in ("ben", "cal", "dee", "eve"):
+            Friendship.objects.create(sender=users["ana"], receiver=users[name], status="accepted")
+        online = {users[name].id for name in ("ben", "cal", "dee")}
+        presence = MagicMock(online_users=lambda ids: {i for i in ids if i in online})
+        with patch("chat.presence.get_presence", return_value=presence):
+            self.assertEqual(friend_language_pairs(users["ana"].id), [("es", "fr"), ("es", "en")])
@@ -0,0 +1,51 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from chat.metrics import BATCH_TEXTS, INFERENCE_SECONDS
+from chat.workers import TranslationWorkerPool
+
+
+def finished(result=None, exception=None):
+    future = Future()
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+    return future
+
+
+@patch.object(TranslationWorkerPool, "_new_executor", side_effect=lambda: MagicMock(name="executor"))
+class TranslationWorkerPoolTests(SimpleTestCase):
+    @staticmethod
+    def observations(stage):
+        return sum(INFERENCE_SECONDS.values.get((stage,), [0.0])[:-1])  # Bucket counts, then the sum
+
+    def test_worker_stage_timings_are_recorded_in_this_process(self, new_executor):
+        pool = TranslationWorkerPool(num_workers=1)
+        pool.executors[0].submit.return_value = finished(
+            (["hola", "adiós"], {"tokenize": 0.001, "generate": 0.2, "decode": 0.001}))
+        generated = self.observations("generate")
+        texts = BATCH_TEXTS.values.get(("en", "zz"), 0.0)
+
+        self.assertEqual(pool.run_batch(["hello", "bye"], "en", "zz", "balanced"), ["hola", "adiós"])
+        self.assertEqual(self.observations("generate"), generated + 1)
+        self.assertEqual(BATCH_TEXTS.values[("en", "zz")], texts + 2)
+
+    def test_concurrent_failures_replace_a_dead_worker_once(self, new_executor):
+        pool = TranslationWorkerPool(num_workers=1)
+        failed = pool.executors[0]
+        failed.submit.return_value = finished(exception=BrokenProcessPool("worker died"))
+        # Both callers picked the failed executor before either replaced it
+        with patch.object(pool, "_executor_for", return_value=(0, failed)):
+            for _ in range(2):
+                with self.assertRaises(BrokenProcessPool):
+                    pool.run_batch(["hello"], "en", "es", "balanced")
+
+        replacement = pool.executors[0]
+        self.assertIsNot(replacement, failed)
+        failed.shutdown.assert_called_once()
+        replacement.shutdown.assert_not_called()
+        self.assertEqual(new_executor.call_count, 2)  # The original and one replacement
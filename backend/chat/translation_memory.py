@@ -0,0 +1,235 @@
+"""
+translation_memory.py
+
+Persistent sentence-level translation memory, consulted before a sentence is sent to MarianMT.
+Each language pair has its own SQLite file in TRANSLATOR_MEMORY_DIR holding previously
+translated segments, keyed by the same model/precision/profile namespace as the result cache.
+A segment is served from memory on an exact match of its normalized text, or on a near match:
+MinHash signatures over character trigrams are banded into an LSH table, and a candidate sharing a
+band is reused only if it has the same words, differing in case, spacing or punctuation (other than
+? and !). One changed word can flip the meaning ("will" / "will not", "Maria" / "Mario") while
+barely moving trigram similarity, so reusing segments with different words is opt-in: set
+TRANSLATOR_MEMORY_FUZZY_THRESHOLD below 1 to accept candidates at that trigram Jaccard similarity
+that contain the same numbers. Each pair's file has its own connection and lock, and files use
+WAL so every daphne and worker process can share them.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import struct
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from .result_cache import normalize_text
+
+MEMORY_DIR = os.environ.get("TRANSLATOR_MEMORY_DIR", "")  # empty = no translation memory
+FUZZY_THRESHOLD = float(os.environ.get("TRANSLATOR_MEMORY_FUZZY_THRESHOLD", 1))  # < 1 also reuses different words
+FUZZY_MIN_CHARS = int(os.environ.get("TRANSLATOR_MEMORY_FUZZY_MIN_CHARS", 20))  # Shorter segments match exactly only
+
+NUM_PERMUTATIONS = 32
+BANDS = 8  # 4 rows per band: a pair at similarity 0.85 shares a band with probability > 0.99
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_MERSENNE_PRIME - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME)
+    for i in range(NUM_PERMUTATIONS)
+]
+
+_NUMBER_RE = re.compile(r"\d+")
+_INSIGNIFICANT_RE = re.compile(r"[^\w\s?!]+")  # Commas, quotes, periods... but not question/exclamation marks
+_WHITESPACE_RE = re.compile(r"\s+")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, source TEXT NOT NULL, "
+    "target TEXT NOT NULL, UNIQUE (namespace, source))",
+    "CREATE TABLE IF NOT EXISTS lsh (bucket INTEGER NOT NULL, segment_id INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS lsh_bucket ON lsh (bucket)",
+)
+
+
+def fold(text: str) -> str:
+    """Case-folded text with insignificant punctuation removed and whitespace collapsed."""
+    return _WHITESPACE_RE.sub(' ', _INSIGNIFICANT_RE.sub(' ', text.casefold())).strip()
+
+
+def shingles(text: str) -> Set[str]:
+    """Character trigrams of the folded text, padded so that short words still count."""
+    folded = f" {fold(text)} "
+    return {folded[i:i + 3] for i in range(max(1, len(folded) - 2))}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def minhash(grams: Set[str]) -> List[int]:
+    hashes = [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "big") for g in grams]
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(namespace: str, signature: Sequence[int]) -> List[int]:
+    """One signed 64-bit bucket id per band, namespaced so models never share candidates."""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(
+            namespace.encode() + struct.pack(f">I{ROWS_PER_BAND}I", band, *rows), digest_size=8,
+        ).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+class TranslationMemory:
+    """
+    Thread-safe per-pair segment store with exact and MinHash-LSH near-match lookup.
+    Lookups and writes for different pairs run concurrently; self.lock only guards the
+    connection/lock tables and the stats.
+    """
+    def __init__(self, directory: str = MEMORY_DIR, threshold: float = FUZZY_THRESHOLD,
+                 fuzzy_min_chars: int = FUZZY_MIN_CHARS):
+        self.directory = Path(directory)
+        self.threshold = threshold
+        self.fuzzy_min_chars = fuzzy_min_chars
+        self.connections: Dict[Tuple[str, str], sqlite3.Connection] = {}
+        self.pair_locks: Dict[Tuple[str, str], Lock] = {}
+        self.lock = Lock()
+        self.stats = {"segments": 0, "exact_hits": 0, "fuzzy_hits": 0, "misses": 0, "stored": 0, "errors": 0}
+
+    def _pair_lock(self, src_lang: str, tgt_lang: str) -> Lock:
+        with self.lock:
+            return self.pair_locks.setdefault((src_lang, tgt_lang), Lock())
+
+    def _connection(self, src_lang: str, tgt_lang: str) -> sqlite3.Connection:
+        # Caller holds the pair's lock
+        connection = self.connections.get((src_lang, tgt_lang))
+        if connection is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.directory / f"{src_lang}-{tgt_lang}.sqlite3", timeout=1.0, check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self.connections[(src_lang, tgt_lang)] = connection
+        return connection
+
+    def _fuzzy(self, connection: sqlite3.Connection, source: str, namespace: str) -> Optional[Tuple[int, str]]:
+        grams = shingles(source)
+        buckets = lsh_buckets(namespace, minhash(grams))
+        candidates = connection.execute(
+            "SELECT DISTINCT s.id, s.source, s.target FROM lsh JOIN segments s ON s.id = lsh.segment_id "
+            f"WHERE lsh.bucket IN ({','.join('?' * len(buckets))}) AND s.namespace = ?",
+            (*buckets, namespace),
+        ).fetchall()
+        folded = fold(source)
+        numbers = _NUMBER_RE.findall(source)
+        best, best_score = None, self.threshold
+        for segment_id, candidate, target in candidates:
+            if fold(candidate) == folded:
+                return segment_id, target
+            if self.threshold >= 1 or _NUMBER_RE.findall(candidate) != numbers:
+                continue  # "3 apples" must never come back as "4 manzanas"
+            score = jaccard(grams, shingles(candidate))
+            if score >= best_score:
+                best, best_score = (segment_id, target), score
+        return best
+
+    def lookup(self, segments: Sequence[str], src_lang: str, tgt_lang: str, namespace: str) -> List[Optional[str]]:
+        """Stored translations for `segments` in order; None where the model is still needed."""
+        results: List[Optional[str]] = [None] * len(segments)
+        counts = {"exact_hits": 0, "fuzzy_hits": 0, "misses": 0}
+        with self._pair_lock(src_lang, tgt_lang):
+            try:
+                connection = self._connection(src_lang, tgt_lang)
+                for i, segment in enumerate(segments):
+                    source = normalize_text(segment)
+                    row = connection.execute(
+                        "SELECT id, target FROM segments WHERE namespace = ? AND source = ?", (namespace, source),
+                    ).fetchone()
+                    if row is not None:
+                        counts["exact_hits"] += 1
+                    elif len(source) >= self.fuzzy_min_chars:
+                        row = self._fuzzy(connection, source, namespace)
+                        if row is not None:
+                            counts["fuzzy_hits"] += 1
+                    if row is None:
+                        counts["misses"] += 1
+                    else:
+                        results[i] = row[1]
+            except sqlite3.Error as e:
+                logging.error(f"Translation memory lookup failed for {src_lang}->{tgt_lang}: {e}")
+                counts = {"exact_hits": 0, "fuzzy_hits": 0, "misses": len(segments), "errors": 1}
+                results = [None] * len(segments)
+        with self.lock:
+            self.stats["segments"] += len(segments)
+            for key, value in counts.items():
+                self.stats[key] += value
+        return results
+
+    def add(self, pairs: Sequence[Tuple[str, str]], src_lang: str, tgt_lang: str, namespace: str):
+        """Store (segment, translation) pairs produced by the model."""
+        stored = errors = 0
+        with self._pair_lock(src_lang, tgt_lang):
+            try:
+                connection = self._connection(src_lang, tgt_lang)
+                for segment, target in pairs:
+                    source = normalize_text(segment)
+                    cursor = connection.execute(
+                        "INSERT OR IGNORE INTO segments (namespace, source, target) VALUES (?, ?, ?)",
+                        (namespace, source, target),
+                    )
+                    if not cursor.rowcount:
+                        continue  # Another process stored it first
+                    stored += 1
+                    if len(source) >= self.fuzzy_min_chars:
+                        connection.executemany(
+                            "INSERT INTO lsh (bucket, segment_id) VALUES (?, ?)",
+                            [(bucket, cursor.lastrowid) for bucket in lsh_buckets(namespace, minhash(shingles(source)))],
+                        )
+                connection.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Translation memory write failed for {src_lang}->{tgt_lang}: {e}")
+                stored, errors = 0, 1
+        with self.lock:
+            self.stats["stored"] += stored
+            self.stats["errors"] += errors
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            served = self.stats["exact_hits"] + self.stats["fuzzy_hits"]
+            share = served / self.stats["segments"] if self.stats["segments"] else 0.0
+            return {**self.stats, "served_share": round(share, 4), "fuzzy_threshold": self.threshold}
+
+    def close(self):
+        with self.lock:
+            pairs = list(self.pair_locks.items())
+        for pair, lock in pairs:
+            with lock:
+                connection = self.connections.pop(pair, None)
+                if connection is not None:
+                    connection.close()
+
+
+_memory: Optional[TranslationMemory] = None
+_memory_lock = Lock()
+
+
+def get_translation_memory() -> Optional[TranslationMemory]:
+    """
+    Return the process-wide translation memory, or None when TRANSLATOR_MEMORY_DIR is unset.
+    """
+    global _memory
+    if not MEMORY_DIR:
+        return None
+    with _memory_lock:
+        if _memory is None:
+            _memory = TranslationMemory()
+        return _memory
@@ -0,0 +1,74 @@
+"""
+translations.py
+
+Per-language translations of stored messages, for whoever is reading them.
+A message already carries its original text and the translation made when it was sent;
+every other language is kept in MessageTranslation. Reading a page translates only the
+messages still missing the viewer's language, in one batch per source language, and
+persists the results so no (message, language) pair is ever translated twice.
+"""
+
+import logging
+from typing import Dict, Iterable, List
+
+from .models import MessageTranslation
+from .translator import FALLBACK_MESSAGE, model_version, translate_many
+
+
+def _known_text(row: dict, language: str):
+    """Text in `language` that the message row itself already holds, if any."""
+    if row['source_language'] == language:
+        return row['content']
+    if row['target_language'] == language and row['translated_content']:
+        return row['translated_content']
+    return None
+
+
+def translations_for(rows: Iterable[dict], language: str, translate_missing: bool = True) -> Dict[int, str]:
+    """
+    Map message id -> text in `language` for message value dicts (as returned by
+    conversation_page). Messages that cannot be translated are left out.
+    """
+    rows = list(rows)
+    texts = {}
+    missing: List[dict] = []
+    for row in rows:
+        known = _known_text(row, language)
+        if known is not None:
+            texts[row['id']] = known
+        else:
+            missing.append(row)
+    if not missing:
+        return texts
+
+    stored = dict(
+        MessageTranslation.objects.filter(message_id__in=[row['id'] for row in missing], language=language)
+        .values_list('message_id', 'content')
+    )
+    texts.update(stored)
+    missing = [row for row in missing if row['id'] not in stored]
+    if not missing or not translate_missing:
+        return texts
+
+    by_source: Dict[str, List[dict]] = {}
+    for row in missing:
+        by_source.setdefault(row['source_language'], []).append(row)
+    created = []
+    for source_language, group in by_source.items():
+        version = model_version(source_language, language)
+        if version is None:
+            continue  # Unsupported pair; the client shows the original
+        translated = translate_many([row['content'] for row in group], source_language, language)
+        for row, text in zip(group, translated):
+            if text == FALLBACK_MESSAGE:
+                continue
+            texts[row['id']] = text
+            created.append(MessageTranslation(message_id=row['id'], language=language, content=text,
+                                              model_version=version))
+    if created:
+        try:
+            # A concurrent reader may have stored the same pair first; the unique constraint keeps one
+            MessageTranslation.objects.bulk_create(created, ignore_conflicts=True)
+        except Exception as e:
+            logging.error(f"Error saving {len(created)} message translations: {e}")
+    return texts
@@ -2,18 +2,35 @@
 translator.py
 
 Provides real-time translation using Hugging Face's MarianMT models for a Django chat application.
-Optimized for low memory and fast execution, with LRU model/tokenizer caching for WebSocket use.
+Optimized for low memory and fast execution, with LRU model/tokenizer caching and per-pair
+micro-batching of concurrent requests for WebSocket use.
 Compatible with Python 3.11.9 and Django Channels.
+torch and transformers are only imported on first use.
 """
 
+from __future__ import annotations
+
+import asyncio
 import logging
-from typing import Optional, Tuple
-from threading import Lock
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+from threading import Lock, Thread
 from collections import OrderedDict
 import os
 
-from transformers import MarianMTModel, MarianTokenizer
-import torch
+# torch and transformers are imported where they are used, so that importing this module
+# (every view, consumer and manage.py command does) stays cheap until the first translation.
+if TYPE_CHECKING:
+    from transformers import MarianMTModel, MarianTokenizer
+
+from .result_cache import get_result_cache
+from .translation_memory import get_translation_memory
+from .segmentation import segment_text, should_segment
+from .model_store import MODEL_STORE_DIR, load_shared, mapping_stats
+from .metrics import BATCH_TEXTS, INFERENCE_SECONDS, LANGID_OUTCOMES, MODEL_LOAD_SECONDS
+from .langid import LANGID_ENABLED, confident_language
+from .decoding import DEFAULT_PROFILE, decoding_kwargs, get_decoding_controller, profile_key
 
 # Supported language pairs (expand as needed)
 SUPPORTED_LANGUAGE_PAIRS = {
@@ -28,88 +45,671 @@ SUPPORTED_LANGUAGE_PAIRS = {
 
 FALLBACK_MESSAGE = "[Translation unavailable for the selected language pair.]"
 DEFAULT_CACHE_SIZE = int(os.environ.get("TRANSLATOR_MODEL_CACHE_SIZE", 2))  # Heroku free tier: keep this low
+BATCHING_ENABLED = os.environ.get("TRANSLATOR_BATCHING", "1") == "1"
+MODEL_REVISION = os.environ.get("TRANSLATOR_MODEL_REVISION", "main")  # Bump to invalidate cached results
+
+DEFAULT_CACHE_BYTES = int(os.environ.get("TRANSLATOR_MODEL_CACHE_BYTES", 0))  # 0 = bound by count only
+PINNED_PAIRS = [
+    tuple(p.split("-", 1)) for p in os.environ.get("TRANSLATOR_PINNED_PAIRS", "").split(",") if "-" in p
+]
+
+# Inference precision: "fp32" (default), "int8" (dynamic quantization of Linear layers) or "bf16"
+PRECISIONS = ("fp32", "int8", "bf16")
+DEFAULT_PRECISION = os.environ.get("TRANSLATOR_PRECISION", "fp32")
+PRECISION_OVERRIDES = {  # e.g. TRANSLATOR_PRECISION_PAIRS=en-es:int8,de-en:bf16
+    tuple(pair.split("-", 1)): precision
+    for pair, _, precision in (
+        item.partition(":") for item in os.environ.get("TRANSLATOR_PRECISION_PAIRS", "").split(",")
+    )
+    if "-" in pair and precision in PRECISIONS
+}
+
+def precision_for(src_lang: str, tgt_lang: str) -> str:
+    precision = PRECISION_OVERRIDES.get((src_lang, tgt_lang), DEFAULT_PRECISION)
+    return precision if precision in PRECISIONS else "fp32"
+
+def bf16_supported() -> bool:
+    """True when the CPU has native bf16 arithmetic (AVX512-BF16 or AMX)."""
+    import torch
+    cpu = getattr(torch, "cpu", None)
+    for check in ("_is_avx512_bf16_supported", "_is_amx_tile_supported"):
+        if cpu is not None and getattr(cpu, check, lambda: False)():
+            return True
+    return False
+
+def apply_precision(model: MarianMTModel, precision: str) -> MarianMTModel:
+    """
+    Convert a freshly loaded fp32 model to the requested inference precision.
+    bf16 falls back to fp32 on CPUs without native support, where it would be slower.
+    """
+    import torch
+    if precision == "int8":
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if precision == "bf16":
+        if bf16_supported():
+            return model.to(torch.bfloat16)
+        logging.warning("bf16 requested but not supported natively on this CPU; using fp32")
+    return model
+
+def model_size_bytes(model) -> int:
+    """
+    Resident size of a model's weights and buffers, including packed quantized params.
+    """
+    import torch
+    total = 0
+    stack = list(model.state_dict().values())
+    while stack:
+        value = stack.pop()
+        if isinstance(value, torch.Tensor):
+            total += value.numel() * value.element_size()
+        elif isinstance(value, (tuple, list)):
+            stack.extend(value)
+    return total
+
+class _CacheEntry:
+    __slots__ = ("model", "tokenizer", "size_bytes", "load_seconds", "hits")
+
+    def __init__(self, model, tokenizer, size_bytes: int, load_seconds: float):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.hits = 0
 
 class ModelCache:
     """
     Thread-safe LRU cache for MarianMT models and tokenizers.
+    Bounded by resident bytes when max_bytes > 0, otherwise by model count.
+    Pinned models are never evicted, and concurrent misses for the same model
+    share a single load.
     """
-    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, max_bytes: int = DEFAULT_CACHE_BYTES):
         self.max_size = max_size
-        self.models = OrderedDict()
-        self.tokenizers = OrderedDict()
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.loading = {}  # model_name -> Future shared by callers waiting on an in-flight load
+        self.pinned = set()
+        self.resident_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "load_waits": 0, "evictions": 0}
         self.lock = Lock()
 
     def get(self, model_name: str) -> Optional[Tuple[MarianMTModel, MarianTokenizer]]:
         with self.lock:
-            if model_name in self.models:
-                # Move to end to mark as recently used
-                self.models.move_to_end(model_name)
-                self.tokenizers.move_to_end(model_name)
-                return self.models[model_name], self.tokenizers[model_name]
-            return None
-
-    def set(self, model_name: str, model: MarianMTModel, tokenizer: MarianTokenizer):
+            entry = self.entries.get(model_name)
+            if entry is None:
+                return None
+            # Move to end to mark as recently used
+            self.entries.move_to_end(model_name)
+            entry.hits += 1
+            self.stats["hits"] += 1
+            return entry.model, entry.tokenizer
+
+    def get_or_load(self, model_name: str, loader) -> Tuple[MarianMTModel, MarianTokenizer]:
+        """
+        Return the cached pair or run `loader()` once, even under concurrent misses.
+        Exceptions raised by the loader propagate to every waiting caller.
+        """
+        with self.lock:
+            entry = self.entries.get(model_name)
+            if entry is not None:
+                self.entries.move_to_end(model_name)
+                entry.hits += 1
+                self.stats["hits"] += 1
+                return entry.model, entry.tokenizer
+            self.stats["misses"] += 1
+            pending = self.loading.get(model_name)
+            if pending is None:
+                pending = self.loading[model_name] = Future()
+                owner = True
+            else:
+                self.stats["load_waits"] += 1
+                owner = False
+        if not owner:
+            return pending.result()
+        try:
+            started = time.perf_counter()
+            model, tokenizer = loader()
+            load_seconds = time.perf_counter() - started
+            MODEL_LOAD_SECONDS.observe(load_seconds)
+            self.set(model_name, model, tokenizer, load_seconds=load_seconds)
+            pending.set_result((model, tokenizer))
+            return model, tokenizer
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.loading.pop(model_name, None)
+
+    def set(self, model_name: str, model: MarianMTModel, tokenizer: MarianTokenizer, load_seconds: float = 0.0):
+        entry = _CacheEntry(model, tokenizer, model_size_bytes(model), load_seconds)
+        with self.lock:
+            if model_name in self.entries:
+                self.resident_bytes -= self.entries.pop(model_name).size_bytes
+            self.entries[model_name] = entry
+            self.resident_bytes += entry.size_bytes
+            self.stats["loads"] += 1
+            self._evict()
+
+    def _evict(self):
+        # Caller holds self.lock; remove least recently used unpinned models until within budget
+        def over_budget():
+            if self.max_bytes > 0:
+                return self.resident_bytes > self.max_bytes
+            return len(self.entries) > self.max_size
+        for name in list(self.entries):
+            if not over_budget():
+                break
+            if name in self.pinned:
+                continue
+            old = self.entries.pop(name)
+            self.resident_bytes -= old.size_bytes
+            self.stats["evictions"] += 1
+            logging.info(f"Evicted {name} from model cache ({old.size_bytes} bytes)")
+            del old  # Help GC
+
+    def pin(self, model_name: str):
+        with self.lock:
+            self.pinned.add(model_name)
+
+    def unpin(self, model_name: str):
+        with self.lock:
+            self.pinned.discard(model_name)
+            self._evict()
+
+    def discard(self, model_name: str):
         with self.lock:
-            if model_name in self.models:
-                self.models.move_to_end(model_name)
-                self.tokenizers.move_to_end(model_name)
-            self.models[model_name] = model
-            self.tokenizers[model_name] = tokenizer
-            if len(self.models) > self.max_size:
-                # Remove least recently used
-                old_model, old_tokenizer = self.models.popitem(last=False), self.tokenizers.popitem(last=False)
-                del old_model, old_tokenizer  # Help GC
+            entry = self.entries.pop(model_name, None)
+            if entry is not None:
+                self.resident_bytes -= entry.size_bytes
 
     def clear(self):
         with self.lock:
-            self.models.clear()
-            self.tokenizers.clear()
+            self.entries.clear()
+            self.resident_bytes = 0
+
+    def snapshot(self) -> dict:
+        """Cache-wide counters plus resident bytes, load time and hits per model."""
+        with self.lock:
+            return {
+                **self.stats,
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+                "models": {
+                    name: {
+                        "bytes": entry.size_bytes,
+                        "load_seconds": round(entry.load_seconds, 3),
+                        "hits": entry.hits,
+                        "pinned": name in self.pinned,
+                    }
+                    for name, entry in self.entries.items()
+                },
+            }
 
 _model_cache = ModelCache()
 
+for _pair in PINNED_PAIRS:
+    if _pair in SUPPORTED_LANGUAGE_PAIRS:
+        _model_cache.pin(SUPPORTED_LANGUAGE_PAIRS[_pair])
+
+def model_memory_report() -> dict:
+    """
+    Model cache snapshot with per-model memory. With TRANSLATOR_MODEL_STORE_DIR set, each
+    model also reports the resident (rss) and proportional (pss) size of its mapped weights,
+    i.e. its memory cost without and with sharing across worker processes.
+    """
+    report = _model_cache.snapshot()
+    if MODEL_STORE_DIR:
+        for name, info in report["models"].items():
+            info["mapped"] = mapping_stats(name)
+    return report
+
 def get_model_and_tokenizer(src_lang: str, tgt_lang: str) -> Optional[Tuple[MarianMTModel, MarianTokenizer]]:
     """
     Retrieve or load the MarianMT model and tokenizer for the given language pair.
-    Uses a thread-safe LRU cache to minimize memory and latency.
+    Uses a thread-safe, memory-budgeted LRU cache with single-flight loading.
     """
     pair = (src_lang, tgt_lang)
     model_name = SUPPORTED_LANGUAGE_PAIRS.get(pair)
     if not model_name:
         return None
-    cached = _model_cache.get(model_name)
-    if cached:
-        return cached
+
+    def load():
+        if MODEL_STORE_DIR:
+            model, tokenizer = load_shared(model_name)
+        else:
+            from transformers import MarianMTModel, MarianTokenizer
+            tokenizer = MarianTokenizer.from_pretrained(model_name)
+            model = MarianMTModel.from_pretrained(model_name)
+            model.eval()
+        return apply_precision(model, precision_for(src_lang, tgt_lang)), tokenizer
+
     try:
-        tokenizer = MarianTokenizer.from_pretrained(model_name)
-        model = MarianMTModel.from_pretrained(model_name)
-        _model_cache.set(model_name, model, tokenizer)
-        return model, tokenizer
+        return _model_cache.get_or_load(model_name, load)
     except (OSError, ValueError) as e:
         logging.error(f"Failed to load model/tokenizer for {model_name}: {e}")
         return None
 
-def translate(text: str, src_lang: str, tgt_lang: str) -> str:
+def translate_batch_timed(texts: List[str], src_lang: str, tgt_lang: str,
+                          profile: str = DEFAULT_PROFILE) -> Tuple[List[str], Dict[str, float]]:
     """
-    Translate text from src_lang to tgt_lang using MarianMT.
-    Returns the translated string, or a fallback message on error.
+    `translate_batch` without recording metrics: also returns the seconds spent in each
+    inference stage (tokenize, generate, decode) that ran, so that worker processes can hand
+    them back to the process serving /metrics.
     """
-    if not text or not isinstance(text, str):
-        return FALLBACK_MESSAGE
+    timings: Dict[str, float] = {}
     if src_lang == tgt_lang:
-        return text  # No translation needed
+        return list(texts), timings
     result = get_model_and_tokenizer(src_lang, tgt_lang)
     if not result:
-        return FALLBACK_MESSAGE
+        return [FALLBACK_MESSAGE] * len(texts), timings
     model, tokenizer = result
+    import torch
     try:
         with torch.no_grad():
-            inputs = tokenizer([text], return_tensors="pt", truncation=True, max_length=512)
-            translated = model.generate(**inputs, max_length=512, num_beams=3, early_stopping=True)
-            tgt_text = tokenizer.batch_decode(translated, skip_special_tokens=True)[0]
-        return tgt_text
+            started = time.perf_counter()
+            inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=512)
+            timings["tokenize"] = time.perf_counter() - started
+            started = time.perf_counter()
+            translated = model.generate(**inputs, **decoding_kwargs(profile, inputs["input_ids"].shape[1]))
+            timings["generate"] = time.perf_counter() - started
+            started = time.perf_counter()
+            decoded = tokenizer.batch_decode(translated, skip_special_tokens=True)
+            timings["decode"] = time.perf_counter() - started
+            return decoded, timings
+    except Exception as e:
+        logging.error(f"Batch translation error for {len(texts)} texts ({src_lang}->{tgt_lang}): {e}")
+        return [FALLBACK_MESSAGE] * len(texts), timings
+
+def record_batch(src_lang: str, tgt_lang: str, size: int, timings: Dict[str, float]):
+    """Record the stage timings of one batch from `translate_batch_timed` in this process's metrics."""
+    for stage, seconds in timings.items():
+        INFERENCE_SECONDS.observe(seconds, stage=stage)
+    if "decode" in timings:
+        BATCH_TEXTS.inc(size, src=src_lang, tgt=tgt_lang)
+
+def translate_batch(texts: List[str], src_lang: str, tgt_lang: str, profile: str = DEFAULT_PROFILE) -> List[str]:
+    """
+    Translate a list of texts for one language pair with a single padded `generate` call,
+    using the given decoding profile and a max_length derived from the longest input.
+    Returns one translated string per input, or fallback messages on error.
+    """
+    translated, timings = translate_batch_timed(texts, src_lang, tgt_lang, profile)
+    record_batch(src_lang, tgt_lang, len(texts), timings)
+    return translated
+
+def run_batch(texts: List[str], src_lang: str, tgt_lang: str, profile: str = DEFAULT_PROFILE) -> List[str]:
+    """
+    Translate a batch on the configured executor: the worker pool if
+    TRANSLATOR_WORKERS > 0, otherwise in the calling thread.
+    """
+    from .workers import get_worker_pool
+    pool = get_worker_pool()
+    if pool is None:
+        return translate_batch(texts, src_lang, tgt_lang, profile)
+    return pool.run_batch(texts, src_lang, tgt_lang, profile)
+
+_scheduler = None
+_scheduler_lock = Lock()
+
+def get_scheduler():
+    """
+    Return the process-wide micro-batching scheduler, creating it on first use.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from .batching import BatchScheduler
+            _scheduler = BatchScheduler(runner=run_batch)
+        return _scheduler
+
+def register_language_pair(src_lang: str, tgt_lang: str, model_name: str):
+    """
+    Serve a language pair with a (new) model. Drops the previously cached model and
+    every cached translation for the pair so stale results are never returned.
+    """
+    previous = SUPPORTED_LANGUAGE_PAIRS.get((src_lang, tgt_lang))
+    SUPPORTED_LANGUAGE_PAIRS[(src_lang, tgt_lang)] = model_name
+    if previous and previous != model_name:
+        _model_cache.discard(previous)
+    cache = get_result_cache()
+    if cache is not None:
+        cache.invalidate_pair(src_lang, tgt_lang)
+
+def model_version(src_lang: str, tgt_lang: str) -> Optional[str]:
+    """Identifier of the model currently serving a pair (model@revision), or None if unsupported."""
+    model_name = SUPPORTED_LANGUAGE_PAIRS.get((src_lang, tgt_lang))
+    return f"{model_name}@{MODEL_REVISION}" if model_name else None
+
+def _result_namespace(src_lang: str, tgt_lang: str, profile: str) -> str:
+    precision = precision_for(src_lang, tgt_lang)
+    return f"{SUPPORTED_LANGUAGE_PAIRS[(src_lang, tgt_lang)]}@{MODEL_REVISION}/{precision}|{profile_key(profile)}"
+
+def _resolve_without_model(text: str, src_lang: str, tgt_lang: str, profile: str) -> Optional[str]:
+    """
+    Return the final result for requests that never reach a model (including
+    result cache hits), or None.
+    """
+    if not text or not isinstance(text, str):
+        return FALLBACK_MESSAGE
+    if src_lang == tgt_lang:
+        return text  # No translation needed
+    if (src_lang, tgt_lang) not in SUPPORTED_LANGUAGE_PAIRS:
+        return FALLBACK_MESSAGE
+    cache = get_result_cache()
+    if cache is not None:
+        return cache.get(text, src_lang, tgt_lang, _result_namespace(src_lang, tgt_lang, profile))
+    return None
+
+def _remember(text: str, src_lang: str, tgt_lang: str, profile: str, translated: str):
+    cache = get_result_cache()
+    if cache is not None and translated != FALLBACK_MESSAGE:
+        cache.set(text, src_lang, tgt_lang, _result_namespace(src_lang, tgt_lang, profile), translated)
+
+def _observe(started: float):
+    """Feed a model-path latency and the current queue depth to the decoding controller."""
+    depth = get_scheduler().queue_depth() if BATCHING_ENABLED else 0
+    get_decoding_controller().observe(time.perf_counter() - started, depth)
+
+def _recall(text: str, src_lang: str, tgt_lang: str, profile: str) -> Optional[str]:
+    """Translation of a single sentence from the translation memory, if enabled and known."""
+    memory = get_translation_memory()
+    if memory is None:
+        return None
+    return memory.lookup([text], src_lang, tgt_lang, _result_namespace(src_lang, tgt_lang, profile))[0]
+
+def _memorize(text: str, src_lang: str, tgt_lang: str, profile: str, translated: str):
+    memory = get_translation_memory()
+    if memory is not None and translated != FALLBACK_MESSAGE:
+        memory.add([(text, translated)], src_lang, tgt_lang, _result_namespace(src_lang, tgt_lang, profile))
+
+_pending_writes: Set[asyncio.Future] = set()  # Cache/memory writes not awaited by translate_async, kept referenced
+
+def _store(text: str, src_lang: str, tgt_lang: str, profile: str, translated: str, memorize: bool):
+    _remember(text, src_lang, tgt_lang, profile, translated)
+    if memorize:
+        _memorize(text, src_lang, tgt_lang, profile, translated)
+
+def _store_done(future: asyncio.Future):
+    _pending_writes.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        logging.error(f"Storing translation failed: {future.exception()}")
+
+def _segmented(text: str) -> bool:
+    """Whether a message is translated piece by piece rather than in one model input."""
+    if should_segment(text):
+        return True
+    # With a translation memory every sentence is looked up (and later reused) on its own
+    return get_translation_memory() is not None and sum(translatable for _, translatable in segment_text(text)) > 1
+
+def _route(text: str, src_lang: str, tgt_lang: str) -> Tuple[Optional[str], str]:
+    """
+    Language identification stage, ahead of the caches and the model. Returns the final
+    result for texts that need no translation (nothing but numbers, links, code or emoji, or
+    already in the target language), else None, and the source language to translate from:
+    the client's, unless the text is confidently in another language the target supports.
+    """
+    if not LANGID_ENABLED or not text or not isinstance(text, str) or src_lang == tgt_lang:
+        return None, src_lang
+    prose = " ".join(piece for piece, translatable in segment_text(text) if translatable)
+    if not prose:
+        LANGID_OUTCOMES.inc(outcome="untranslatable")
+        return text, src_lang
+    detected = confident_language(prose)
+    if detected is None:
+        outcome = "undetermined"
+    elif detected == tgt_lang:
+        LANGID_OUTCOMES.inc(outcome="already_target")
+        return text, src_lang
+    elif detected != src_lang and (detected, tgt_lang) in SUPPORTED_LANGUAGE_PAIRS:
+        LANGID_OUTCOMES.inc(outcome="source_corrected")
+        return None, detected
+    else:
+        outcome = "confirmed"
+    LANGID_OUTCOMES.inc(outcome=outcome)
+    return None, src_lang
+
+def translate_many(texts: List[str], src_lang: str, tgt_lang: str, profile: Optional[str] = None) -> List[str]:
+    """
+    Translate many texts for one language pair, returning results in input order.
+    Texts that need no translation are returned as they are and mislabeled ones are
+    translated from their detected language (see `_route`). Cached and duplicate texts are
+    resolved next; the rest are sorted by length and run in batches of the scheduler's max
+    batch size so each batch pads to similar lengths.
+    With TRANSLATOR_MEMORY_DIR set, texts are split into sentences and only sentences
+    missing from the translation memory reach the model.
+    Without a profile, the decoding controller chooses one.
+    """
+    profile = profile or get_decoding_controller().choose()
+    results: List[Optional[str]] = [None] * len(texts)
+    by_source = {}  # source language -> indices of texts to translate from it
+    for i, text in enumerate(texts):
+        skipped, source = _route(text, src_lang, tgt_lang)
+        if skipped is not None:
+            results[i] = skipped
+        else:
+            by_source.setdefault(source, []).append(i)
+    for source, indices in by_source.items():
+        translated = _translate_routed([texts[i] for i in indices], source, tgt_lang, profile)
+        for i, result in zip(indices, translated):
+            results[i] = result
+    return results
+
+def _translate_routed(texts: List[str], src_lang: str, tgt_lang: str, profile: str) -> List[str]:
+    memory = get_translation_memory()
+    if memory is not None and (src_lang, tgt_lang) in SUPPORTED_LANGUAGE_PAIRS and src_lang != tgt_lang:
+        return _translate_many_from_memory(texts, src_lang, tgt_lang, profile, memory)
+    return _translate_many_direct(texts, src_lang, tgt_lang, profile)
+
+def _translate_many_from_memory(texts: List[str], src_lang: str, tgt_lang: str, profile: str, memory) -> List[str]:
+    """
+    Sentence-level translation memory stage in front of `_translate_many_direct`: every
+    distinct sentence is looked up once, the misses are translated in one call and stored,
+    and each text is stitched back from its pieces.
+    """
+    namespace = _result_namespace(src_lang, tgt_lang, profile)
+    plans = []  # Per text: a final result, or its (piece, translatable) list
+    sentences = {}  # Distinct translatable pieces, in first-seen order
+    for text in texts:
+        shortcut = _resolve_without_model(text, src_lang, tgt_lang, profile)
+        if shortcut is not None:
+            plans.append(shortcut)
+            continue
+        pieces = segment_text(text)
+        plans.append(pieces)
+        for piece, translatable in pieces:
+            if translatable:
+                sentences.setdefault(piece, None)
+    unique = list(sentences)
+    known = dict(zip(unique, memory.lookup(unique, src_lang, tgt_lang, namespace)))
+    missing = [sentence for sentence in unique if known[sentence] is None]
+    if missing:
+        translated = _translate_many_direct(missing, src_lang, tgt_lang, profile)
+        known.update(zip(missing, translated))
+        memory.add([pair for pair in zip(missing, translated) if pair[1] != FALLBACK_MESSAGE],
+                   src_lang, tgt_lang, namespace)
+
+    results = []
+    for text, plan in zip(texts, plans):
+        if isinstance(plan, str):
+            results.append(plan)
+            continue
+        translated_pieces = [known[piece] if translatable else piece for piece, translatable in plan]
+        if any(translatable and known[piece] == FALLBACK_MESSAGE for piece, translatable in plan):
+            results.append(FALLBACK_MESSAGE)
+            continue
+        result = "".join(translated_pieces)
+        _remember(text, src_lang, tgt_lang, profile, result)
+        results.append(result)
+    return results
+
+def _translate_many_direct(texts: List[str], src_lang: str, tgt_lang: str, profile: str) -> List[str]:
+    results: List[Optional[str]] = [None] * len(texts)
+    missing = {}  # text -> indices waiting for it
+    for i, text in enumerate(texts):
+        shortcut = _resolve_without_model(text, src_lang, tgt_lang, profile)
+        if shortcut is not None:
+            results[i] = shortcut
+        else:
+            missing.setdefault(text, []).append(i)
+    ordered = sorted(missing, key=len)
+    batch_size = get_scheduler().max_batch_size
+    for start in range(0, len(ordered), batch_size):
+        chunk = ordered[start:start + batch_size]
+        try:
+            translated = run_batch(chunk, src_lang, tgt_lang, profile)
+        except Exception as e:
+            logging.error(f"Batch translation error for {len(chunk)} texts ({src_lang}->{tgt_lang}): {e}")
+            translated = [FALLBACK_MESSAGE] * len(chunk)
+        for text, result in zip(chunk, translated):
+            _remember(text, src_lang, tgt_lang, profile, result)
+            for i in missing[text]:
+                results[i] = result
+    return results
+
+def _translate_segmented(text: str, src_lang: str, tgt_lang: str, profile: str) -> str:
+    """
+    Translate a long or mixed-content message segment by segment and stitch the
+    results back in order, keeping whitespace, URLs, code and emoji verbatim.
+    """
+    pieces = segment_text(text)
+    translated = _translate_routed([piece for piece, translatable in pieces if translatable], src_lang, tgt_lang, profile)
+    if FALLBACK_MESSAGE in translated:
+        return FALLBACK_MESSAGE
+    results = iter(translated)
+    return "".join(next(results) if translatable else piece for piece, translatable in pieces)
+
+def translate(text: str, src_lang: str, tgt_lang: str, profile: Optional[str] = None) -> str:
+    """
+    Translate text from src_lang to tgt_lang using MarianMT.
+    Repeated texts are served from the result cache; concurrent misses are
+    micro-batched per language pair unless TRANSLATOR_BATCHING=0. Long messages
+    are segmented instead of being truncated at the model's 512-token limit.
+    Texts already in the target language, or with nothing but numbers, links, code or
+    emoji, are returned unchanged; a confidently mislabeled source language is corrected.
+    `profile` is a decoding profile from chat.decoding; callers that report the profile
+    used should pick it with `get_decoding_controller().choose()`, otherwise it is chosen here.
+    Returns the translated string, or a fallback message on error.
+    """
+    profile = profile or get_decoding_controller().choose()
+    skipped, src_lang = _route(text, src_lang, tgt_lang)
+    if skipped is not None:
+        return skipped
+    shortcut = _resolve_without_model(text, src_lang, tgt_lang, profile)
+    if shortcut is not None:
+        return shortcut
+    segmented = _segmented(text)
+    if not segmented:
+        recalled = _recall(text, src_lang, tgt_lang, profile)
+        if recalled is not None:
+            return recalled
+    started = time.perf_counter()
+    try:
+        if segmented:
+            translated = _translate_segmented(text, src_lang, tgt_lang, profile)
+        elif BATCHING_ENABLED:
+            translated = get_scheduler().submit(text, src_lang, tgt_lang, profile).result()
+        else:
+            translated = run_batch([text], src_lang, tgt_lang, profile)[0]
+    except Exception as e:
+        logging.error(f"Translation error for '{text}' ({src_lang}->{tgt_lang}): {e}")
+        return FALLBACK_MESSAGE
+    _observe(started)
+    _remember(text, src_lang, tgt_lang, profile, translated)
+    if not segmented:
+        _memorize(text, src_lang, tgt_lang, profile, translated)
+    return translated
+
+async def translate_async(text: str, src_lang: str, tgt_lang: str, profile: Optional[str] = None) -> str:
+    """
+    Awaitable variant of `translate` for consumers; never blocks the event loop.
+    Redis (shared result cache) and SQLite (translation memory) calls run in the executor,
+    and storing a new result is not awaited.
+    """
+    profile = profile or get_decoding_controller().choose()
+    skipped, src_lang = _route(text, src_lang, tgt_lang)
+    if skipped is not None:
+        return skipped
+    loop = asyncio.get_running_loop()
+    cache = get_result_cache()
+    shared = cache is not None and cache.redis is not None
+    if shared:
+        shortcut = await loop.run_in_executor(None, _resolve_without_model, text, src_lang, tgt_lang, profile)
+    else:
+        shortcut = _resolve_without_model(text, src_lang, tgt_lang, profile)
+    if shortcut is not None:
+        return shortcut
+    segmented = _segmented(text)
+    if not segmented and get_translation_memory() is not None:
+        # SQLite lookups stay off the event loop
+        recalled = await loop.run_in_executor(None, _recall, text, src_lang, tgt_lang, profile)
+        if recalled is not None:
+            return recalled
+    started = time.perf_counter()
+    try:
+        if segmented:
+            translated = await loop.run_in_executor(None, _translate_segmented, text, src_lang, tgt_lang, profile)
+        elif BATCHING_ENABLED:
+            translated = await asyncio.wrap_future(get_scheduler().submit(text, src_lang, tgt_lang, profile))
+        else:
+            translated = (await loop.run_in_executor(None, run_batch, [text], src_lang, tgt_lang, profile))[0]
     except Exception as e:
         logging.error(f"Translation error for '{text}' ({src_lang}->{tgt_lang}): {e}")
         return FALLBACK_MESSAGE
+    _observe(started)
+    memorize = not segmented and get_translation_memory() is not None
+    if shared or memorize:
+        write = loop.run_in_executor(None, _store, text, src_lang, tgt_lang, profile, translated, memorize)
+        _pending_writes.add(write)
+        write.add_done_callback(_store_done)
+    else:
+        _remember(text, src_lang, tgt_lang, profile, translated)
+    return translated
+
+def stream_tokens(text: str, src_lang: str, tgt_lang: str) -> Optional[Iterator[str]]:
+    """
+    Start greedy generation in a background thread and return an iterator of decoded
+    text chunks as tokens are produced. Returns None when the model is not available
+    in this process (unsupported pair, failed load, or inference on the worker pool).
+    """
+    from .workers import get_worker_pool
+    if src_lang == tgt_lang or get_worker_pool() is not None:
+        return None
+    result = get_model_and_tokenizer(src_lang, tgt_lang)
+    if not result:
+        return None
+    model, tokenizer = result
+    import torch
+    from transformers import TextIteratorStreamer
+    streamer = TextIteratorStreamer(tokenizer, skip_special_tokens=True, timeout=60)
+    inputs = tokenizer([text], return_tensors="pt", truncation=True, max_length=512)
+
+    def generate():
+        try:
+            with torch.no_grad():
+                model.generate(**inputs, streamer=streamer, **decoding_kwargs("fast", inputs["input_ids"].shape[1]))
+        except Exception as e:
+            logging.error(f"Streaming translation error ({src_lang}->{tgt_lang}): {e}")
+            streamer.end()
+
+    Thread(target=generate, name="translate-stream", daemon=True).start()
+    return iter(streamer)
+
+async def stream_tokens_async(text: str, src_lang: str, tgt_lang: str) -> AsyncIterator[str]:
+    """
+    Async iterator over greedy token-level translation chunks; yields nothing when
+    token streaming is unavailable so callers can fall back to whole-sentence results.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = await loop.run_in_executor(None, stream_tokens, text, src_lang, tgt_lang)
+    if chunks is None:
+        return
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            return
+        if chunk:
+            yield chunk
 
 # Example usage (remove or comment out in production):
-# print(translate("Hello, how are you?", "en", "es")) 
\ No newline at end of file
+# print(translate("Hello, how are you?", "en", "es"))
@@ -4,7 +4,10 @@ from . import views
 
 urlpatterns = [
     path('translate/', views.translate_message, name='translate_message'),
+    path('translate/batch/', views.translate_messages_batch, name='translate_messages_batch'),
     path('messages/<int:friend_id>/', views.get_messages, name='get_messages'),
+    path('messages/<int:friend_id>/search/', views.search_messages, name='search_messages'),
     path('friends/', views.get_friends, name='get_friends'),
     path('friends/request/', views.send_friend_request, name='send_friend_request'),
+    path('ready/', views.ready, name='ready'),
 ]
\ No newline at end of file
@@ -1,35 +1,80 @@
-from django.shortcuts import render
+import math
+import time
+from django.http import HttpResponse
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .translator import translate
-from .models import Message, UserProfile, Friendship
-from django.utils import timezone
+from .translator import BATCHING_ENABLED, FALLBACK_MESSAGE, get_scheduler, translate, translate_many
+from .segmentation import should_segment
+from .decoding import DECODING_PROFILES, get_decoding_controller
+from .metrics import FAILURES, MESSAGES, STAGE_SECONDS, render as render_metrics
+from .models import UserProfile, Friendship
+from .friends import etag_matches, friends_snapshot, with_live_presence
+from .warmup import get_warmup
+from .admission import get_admission
+from .translations import translations_for
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, conversation_page, encode_cursor
+from .search import search_conversation
+from .translation_memory import get_translation_memory
 from django.db import models
 
 User = get_user_model()
 
 # Create your views here.
 
+def overloaded(rejection):
+    """429 for a request turned away by admission control, with the same body as the WebSocket frame."""
+    response = Response({**rejection, 'queue_depth': get_admission().snapshot()['queue_depth']},
+                        status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(math.ceil(rejection['retry_after']))
+    return response
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def translate_message(request):
-    """API endpoint for translating messages."""
+    """
+    API endpoint for translating messages.
+    Accepts an optional decoding `profile` (quality, balanced or fast); the profile
+    actually used is returned, as it is downgraded while the service is over its latency SLO.
+    """
+    received = time.perf_counter()
     try:
-        message = request.data.get('message')
-        source_lang = request.data.get('source_lang')
-        target_lang = request.data.get('target_lang')
+        data = request.data  # Parsed lazily by DRF on first access
+        STAGE_SECONDS.observe(time.perf_counter() - received, source="http", stage="json_parse")
+        message = data.get('message')
+        source_lang = data.get('source_lang')
+        target_lang = data.get('target_lang')
+        profile = data.get('profile')
         
         if not all([message, source_lang, target_lang]):
             return Response({
                 'error': 'Missing required fields: message, source_lang, target_lang'
             }, status=status.HTTP_400_BAD_REQUEST)
+        if profile is not None and profile not in DECODING_PROFILES:
+            return Response({
+                'error': f"Unknown profile '{profile}'; use one of: {', '.join(DECODING_PROFILES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        translated = translate(message, source_lang, target_lang)
+        # Shed load before any model work, as the WebSocket consumer does
+        admission = get_admission()
+        rejection = admission.admit(message, user_id=request.user.id)
+        if rejection:
+            return overloaded(rejection)
+        started = time.monotonic()
+        try:
+            profile = get_decoding_controller().choose(profile)
+            MESSAGES.inc(source="http", src=source_lang, tgt=target_lang)
+            with STAGE_SECONDS.time(source="http", stage="translate"):
+                translated = translate(message, source_lang, target_lang, profile)
+        finally:
+            admission.release(time.monotonic() - started)
+        STAGE_SECONDS.observe(time.perf_counter() - received, source="http", stage="total")
         
         if translated.startswith("[") and "unavailable" in translated:
+            FAILURES.inc(source="http", src=source_lang, tgt=target_lang)
             return Response({
                 'error': 'Translation failed or unsupported language pair',
                 'original': message
@@ -39,7 +84,8 @@ def translate_message(request):
             'translated': translated,
             'original': message,
             'source_lang': source_lang,
-            'target_lang': target_lang
+            'target_lang': target_lang,
+            'profile': profile
         })
         
     except Exception as e:
@@ -47,31 +93,132 @@ def translate_message(request):
             'error': f'Translation error: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def translate_messages_batch(request):
+    """
+    Translate a list of `{id, text, source_lang, target_lang}` items in one request.
+    Items are grouped by language pair and run through batched inference; results come
+    back in request order as `{id, translated}` or `{id, error}`. Limited to
+    CHAT_BATCH_MAX_ITEMS items and CHAT_BATCH_MAX_CHARS characters per request.
+    """
+    received = time.perf_counter()
+    try:
+        data = request.data
+        STAGE_SECONDS.observe(time.perf_counter() - received, source="http", stage="json_parse")
+        items = data.get('items') if isinstance(data, dict) else None
+        profile = data.get('profile') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({
+                'error': "Expected a non-empty 'items' list of {id, text, source_lang, target_lang}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.CHAT_BATCH_MAX_ITEMS:
+            return Response({
+                'error': f'Too many items: {len(items)} (max {settings.CHAT_BATCH_MAX_ITEMS})'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        texts = [item['text'] for item in items if isinstance(item, dict) and isinstance(item.get('text'), str)]
+        total_chars = sum(map(len, texts))
+        if total_chars > settings.CHAT_BATCH_MAX_CHARS:
+            return Response({
+                'error': f'Too much text: {total_chars} characters (max {settings.CHAT_BATCH_MAX_CHARS})'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if profile is not None and profile not in DECODING_PROFILES:
+            return Response({
+                'error': f"Unknown profile '{profile}'; use one of: {', '.join(DECODING_PROFILES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # The whole batch takes one slot, sized by its combined text so it counts as a long message
+        admission = get_admission()
+        rejection = admission.admit("".join(texts), user_id=request.user.id)
+        if rejection:
+            return overloaded(rejection)
+        started = time.monotonic()
+        try:
+            profile = get_decoding_controller().choose(profile)
+            results = [None] * len(items)
+            by_pair = {}  # (src, tgt) -> indices of short items, translated together
+            with STAGE_SECONDS.time(source="http", stage="translate"):
+                for i, item in enumerate(items):
+                    item_id = item.get('id') if isinstance(item, dict) else None
+                    if not isinstance(item, dict) or not all(
+                        isinstance(item.get(field), str) and item.get(field) for field in ('text', 'source_lang', 'target_lang')
+                    ):
+                        results[i] = {'id': item_id, 'error': 'Missing required fields: text, source_lang, target_lang'}
+                        continue
+                    pair = (item['source_lang'], item['target_lang'])
+                    MESSAGES.inc(source="http", src=pair[0], tgt=pair[1])
+                    if should_segment(item['text']):
+                        results[i] = translate(item['text'], *pair, profile)  # Segmented and batched internally
+                    else:
+                        by_pair.setdefault(pair, []).append(i)
+                for pair, indices in by_pair.items():
+                    translated = translate_many([items[i]['text'] for i in indices], *pair, profile)
+                    for i, text in zip(indices, translated):
+                        results[i] = text
+        finally:
+            admission.release(time.monotonic() - started)
+
+        response = []
+        for item, result in zip(items, results):
+            if isinstance(result, dict):
+                response.append(result)
+            elif result == FALLBACK_MESSAGE:
+                FAILURES.inc(source="http", src=item['source_lang'], tgt=item['target_lang'])
+                response.append({'id': item.get('id'), 'error': 'Translation failed or unsupported language pair'})
+            else:
+                response.append({'id': item.get('id'), 'translated': result})
+        STAGE_SECONDS.observe(time.perf_counter() - received, source="http", stage="total")
+        return Response({'results': response, 'profile': profile})
+
+    except Exception as e:
+        return Response({
+            'error': f'Translation error: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_messages(request, friend_id):
-    """Get messages between current user and a friend."""
+    """
+    Get messages between current user and a friend, one page at a time.
+    Query params: `before` / `after` cursors from a previous page, `limit`, and `lang`
+    (defaults to the viewer's preferred language). Each message includes its text in
+    that language; messages still missing it are translated in one batch and stored.
+    Without a cursor the newest page is returned.
+    """
     try:
-        messages = Message.objects.filter(
-            (models.Q(sender=request.user, receiver_id=friend_id) |
-             models.Q(sender_id=friend_id, receiver=request.user))
-        ).order_by('created_at')
-        
-        message_data = []
-        for msg in messages:
-            message_data.append({
-                'id': msg.id,
-                'content': msg.content,
-                'translated_content': msg.translated_content,
-                'sender_id': msg.sender.id,
-                'receiver_id': msg.receiver.id,
-                'source_language': msg.source_language,
-                'target_language': msg.target_language,
-                'is_translated': msg.is_translated,
-                'created_at': msg.created_at.isoformat(),
-            })
-        
-        return Response(message_data)
+        try:
+            limit = min(max(int(request.query_params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            rows, has_more = conversation_page(
+                request.user.id, friend_id,
+                before=request.query_params.get('before'),
+                after=request.query_params.get('after'),
+                limit=limit,
+            )
+        except (InvalidCursor, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        language = request.query_params.get('lang') or (
+            UserProfile.objects.filter(user_id=request.user.id).values_list('preferred_language', flat=True).first()
+            or 'en'
+        )
+        texts = translations_for(rows, language)
+        message_data = [
+            {
+                **row,
+                'client_id': str(row['client_id']),
+                'created_at': row['created_at'].isoformat(),
+                'translation_language': language,
+                'translation': texts.get(row['id']),
+            }
+            for row in rows
+        ]
+        return Response({
+            'results': message_data,
+            'has_more': has_more,
+            # Cursors for the adjacent pages (older / newer than this one)
+            'before': encode_cursor(rows[0]) if rows else request.query_params.get('after'),
+            'after': encode_cursor(rows[-1]) if rows else request.query_params.get('before'),
+        })
         
     except Exception as e:
         return Response({
@@ -80,30 +227,67 @@ def get_messages(request, friend_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_friends(request):
-    """Get user's friends list."""
+def search_messages(request, friend_id):
+    """
+    Search the conversation with a friend for `q`, in the original and every stored
+    translation. Matches are returned newest first, `limit` at a time; pass the returned
+    `before` cursor to get older matches. `lang` selects the included translation, as in
+    get_messages, but nothing is translated here.
+    """
     try:
-        # Get accepted friendships
-        friendships = Friendship.objects.filter(
-            (models.Q(sender=request.user) | models.Q(receiver=request.user)),
-            status='accepted'
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            rows, has_more = search_conversation(
+                request.user.id, friend_id, query, before=request.query_params.get('before'), limit=limit,
+            )
+        except (InvalidCursor, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        language = request.query_params.get('lang') or (
+            UserProfile.objects.filter(user_id=request.user.id).values_list('preferred_language', flat=True).first()
+            or 'en'
         )
-        
-        friends = []
-        for friendship in friendships:
-            friend = friendship.receiver if friendship.sender == request.user else friendship.sender
-            profile, created = UserProfile.objects.get_or_create(user=friend)
-            
-            friends.append({
-                'id': friend.id,
-                'name': friend.username,
-                'email': friend.email,
-                'is_online': profile.is_online,
-                'last_seen': profile.last_seen.isoformat(),
-                'preferred_language': profile.preferred_language,
-            })
-        
-        return Response(friends)
+        texts = translations_for(rows, language, translate_missing=False)
+        return Response({
+            'results': [
+                {
+                    **row,
+                    'client_id': str(row['client_id']),
+                    'created_at': row['created_at'].isoformat(),
+                    'translation_language': language,
+                    'translation': texts.get(row['id']),
+                }
+                for row in rows
+            ],
+            'has_more': has_more,
+            'before': encode_cursor(rows[-1]) if rows and has_more else None,
+        })
+
+    except Exception as e:
+        return Response({
+            'error': f'Error searching messages: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_friends(request):
+    """
+    Get user's friends list.
+    Served from a cached snapshot; clients sending the last ETag in
+    If-None-Match get an empty 304 when nothing changed.
+    """
+    try:
+        friends, etag = with_live_presence(*friends_snapshot(request.user.id))
+        if etag_matches(etag, request.headers.get('If-None-Match')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(friends)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
         
     except Exception as e:
         return Response({
@@ -153,3 +337,24 @@ def send_friend_request(request):
         return Response({
             'error': f'Error sending friend request: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def ready(request):
+    """
+    Readiness probe: 503 until the preloaded translation models are warm, or if none of them
+    could be loaded; `state` is "degraded" when only some of them failed.
+    Also reports admission load (in-flight translations, queue depth, shed counts), the
+    decoding controller (current profile, p95 latency, requests served per profile), micro-batch
+    sizes and queue waits and, when enabled, the translation memory (share of sentences served
+    without the model).
+    """
+    warmup = get_warmup().snapshot()
+    memory = get_translation_memory()
+    return Response({**warmup, 'load': get_admission().snapshot(), 'decoding': get_decoding_controller().snapshot(),
+                     'batching': get_scheduler().stats.snapshot() if BATCHING_ENABLED else None,
+                     'memory': memory.snapshot() if memory is not None else None}, status=status.HTTP_200_OK if warmup['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+def metrics(request):
+    """Prometheus scrape endpoint (text exposition format) for this process."""
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,148 @@
+"""
+warmup.py
+
+Model preloading and warmup.
+At ASGI startup the pairs in TRANSLATOR_PRELOAD_PAIRS are loaded and run through one dummy
+generation in the background; the worker reports ready once they are done and at least one
+of them works ("degraded" if some failed, not ready if all did). At runtime, the models a
+connecting user is most likely to need first (from their language into their online friends'
+languages) are prefetched so the first message does not pay the from_pretrained and
+first-generate cost. Prefetch is capped at TRANSLATOR_PREFETCH_MAX_PAIRS per connection so
+it does not evict the models serving everyone else from the small model cache.
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PRELOAD_PAIRS = [
+    tuple(p.split("-", 1)) for p in os.environ.get("TRANSLATOR_PRELOAD_PAIRS", "").split(",") if "-" in p
+]
+PREFETCH_ENABLED = os.environ.get("TRANSLATOR_PREFETCH", "1") == "1"
+PREFETCH_COOLDOWN = float(os.environ.get("TRANSLATOR_PREFETCH_COOLDOWN", 300))  # Seconds between prefetches of a pair
+PREFETCH_MAX_PAIRS = int(os.environ.get("TRANSLATOR_PREFETCH_MAX_PAIRS", 1))  # Keep below TRANSLATOR_MODEL_CACHE_SIZE
+WARMUP_SAMPLE = "Hello, how are you?"  # For source languages without sample sentences
+
+
+class Warmup:
+    """
+    Loads and warms models on a single background thread and tracks readiness.
+    """
+    def __init__(self, preload_pairs: Iterable[Tuple[str, str]] = PRELOAD_PAIRS):
+        self.preload_pairs = list(preload_pairs)
+        self.status: Dict[str, str] = {"-".join(pair): "pending" for pair in self.preload_pairs}
+        self.ready = Event()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="translate-warmup")
+        self.last_prefetch: Dict[Tuple[str, str], float] = {}
+        self.lock = Lock()
+        if not self.preload_pairs:
+            self.ready.set()
+
+    def warm_pair(self, src_lang: str, tgt_lang: str) -> bool:
+        """Load a pair's model wherever inference runs and run one dummy generation."""
+        from .sample_corpus import SAMPLE_SENTENCES
+        from .translator import FALLBACK_MESSAGE, SUPPORTED_LANGUAGE_PAIRS, run_batch
+
+        if (src_lang, tgt_lang) not in SUPPORTED_LANGUAGE_PAIRS:
+            return False
+        started = time.perf_counter()
+        sample = (SAMPLE_SENTENCES.get(src_lang) or [WARMUP_SAMPLE])[0]
+        ok = run_batch([sample], src_lang, tgt_lang)[0] != FALLBACK_MESSAGE
+        logging.info(f"Warmed {src_lang}->{tgt_lang} in {time.perf_counter() - started:.2f}s (ok={ok})")
+        return ok
+
+    def _preload(self):
+        for src_lang, tgt_lang in self.preload_pairs:
+            key = f"{src_lang}-{tgt_lang}"
+            try:
+                self.status[key] = "ready" if self.warm_pair(src_lang, tgt_lang) else "failed"
+            except Exception as e:
+                logging.error(f"Warmup failed for {key}: {e}")
+                self.status[key] = "failed"
+        self.ready.set()
+
+    def start(self):
+        self.executor.submit(self._preload)
+
+    def prefetch(self, pairs: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Queue background warmup for the first TRANSLATOR_PREFETCH_MAX_PAIRS of `pairs` (most
+        needed first), skipping pairs prefetched recently; returns the queued pairs.
+        """
+        if not PREFETCH_ENABLED:
+            return []
+        now = time.monotonic()
+        queued = []
+        with self.lock:
+            for pair in list(dict.fromkeys(pairs))[:PREFETCH_MAX_PAIRS]:
+                if pair[0] == pair[1] or now - self.last_prefetch.get(pair, -PREFETCH_COOLDOWN) < PREFETCH_COOLDOWN:
+                    continue
+                self.last_prefetch[pair] = now
+                queued.append(pair)
+        for pair in queued:
+            self.executor.submit(self._safe_warm, *pair)
+        return queued
+
+    def _safe_warm(self, src_lang: str, tgt_lang: str):
+        try:
+            self.warm_pair(src_lang, tgt_lang)
+        except Exception as e:
+            logging.error(f"Prefetch failed for {src_lang}->{tgt_lang}: {e}")
+
+    def state(self) -> str:
+        """'warming' until preloading finishes, then 'ready', 'degraded' (some pairs failed) or 'failed'."""
+        if not self.ready.is_set():
+            return "warming"
+        results = set(self.status.values())
+        if "failed" not in results:
+            return "ready"
+        return "degraded" if "ready" in results else "failed"
+
+    def snapshot(self) -> dict:
+        state = self.state()
+        return {"ready": state in ("ready", "degraded"), "state": state, "pairs": dict(self.status)}
+
+
+_warmup: Optional[Warmup] = None
+_warmup_lock = Lock()
+
+
+def get_warmup() -> Warmup:
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = Warmup()
+        return _warmup
+
+
+def start_warmup() -> Warmup:
+    """Begin preloading TRANSLATOR_PRELOAD_PAIRS; call once at process startup."""
+    warmup = get_warmup()
+    warmup.start()
+    return warmup
+
+
+def friend_language_pairs(user_id: int) -> List[Tuple[str, str]]:
+    """
+    Pairs a user's messages are translated with: from their language into each language of
+    their currently online friends, the most common first. Replies are translated by the
+    friends' own connections, so the reverse directions are not included.
+    """
+    from .friends import friend_ids
+    from .models import UserProfile
+    from .presence import get_presence
+
+    friends = friend_ids(user_id)
+    if not friends:
+        return []
+    online = get_presence().online_users(friends)
+    languages = dict(
+        UserProfile.objects.filter(user_id__in=[user_id, *online]).values_list("user_id", "preferred_language")
+    )
+    own = languages.pop(user_id, "en")
+    counts = Counter(lang for lang in languages.values() if lang != own)
+    return [(own, lang) for lang, _ in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
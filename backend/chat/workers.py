@@ -0,0 +1,112 @@
+"""
+workers.py
+
+Multi-process executor for MarianMT inference.
+Each worker process owns its own ModelCache and torch intra-op thread count, so translation
+uses all cores without contending with the ORM thread of the ASGI server. Requests for the
+same language pair are always routed to the same worker to keep its model cache hot.
+Workers return each batch's inference stage timings with its results, and the parent records
+them, so /metrics reports them as it does for in-process inference.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+WORKER_PROCESSES = int(os.environ.get("TRANSLATOR_WORKERS", 0))  # 0 = translate in-process
+WORKER_TORCH_THREADS = int(os.environ.get(
+    "TRANSLATOR_WORKER_TORCH_THREADS", max(1, (os.cpu_count() or 1) // max(1, WORKER_PROCESSES))
+))
+
+
+def _init_worker(torch_threads: int):
+    import torch
+    torch.set_num_threads(torch_threads)
+
+
+def _run_batch(texts: List[str], src_lang: str, tgt_lang: str, profile: str) -> Tuple[List[str], Dict[str, float]]:
+    # Metrics recorded here would stay in the worker; the stage timings go back to the caller instead
+    from .translator import translate_batch_timed
+    return translate_batch_timed(texts, src_lang, tgt_lang, profile)
+
+
+class TranslationWorkerPool:
+    """
+    Fixed set of single-process executors with language-pair affinity.
+    """
+    def __init__(self, num_workers: int = WORKER_PROCESSES, torch_threads: int = WORKER_TORCH_THREADS):
+        self.num_workers = max(1, num_workers)
+        self.torch_threads = max(1, torch_threads)
+        self.context = multiprocessing.get_context("spawn")  # never fork a process holding torch threads
+        self.lock = Lock()
+        self.executors = [self._new_executor() for _ in range(self.num_workers)]
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=self.context,
+            initializer=_init_worker,
+            initargs=(self.torch_threads,),
+        )
+
+    def worker_for(self, src_lang: str, tgt_lang: str) -> int:
+        """Stable worker index for a language pair (identical across processes and restarts)."""
+        return zlib.crc32(f"{src_lang}-{tgt_lang}".encode()) % self.num_workers
+
+    def _executor_for(self, src_lang: str, tgt_lang: str) -> Tuple[int, ProcessPoolExecutor]:
+        index = self.worker_for(src_lang, tgt_lang)
+        with self.lock:
+            return index, self.executors[index]
+
+    def run_batch(self, texts: List[str], src_lang: str, tgt_lang: str, profile: str) -> List[str]:
+        """
+        Blocking batch translation on the worker that owns the language pair. The worker's
+        stage timings are recorded in this process's metrics.
+        """
+        from .translator import record_batch
+        index, executor = self._executor_for(src_lang, tgt_lang)
+        try:
+            translated, timings = executor.submit(_run_batch, texts, src_lang, tgt_lang, profile).result()
+        except BrokenProcessPool:
+            self._replace(index, executor)
+            raise
+        record_batch(src_lang, tgt_lang, len(texts), timings)
+        return translated
+
+    def _replace(self, index: int, broken: ProcessPoolExecutor):
+        """Replace the executor at `index` if it is still `broken`; callers racing on one failure replace it once."""
+        with self.lock:
+            if self.executors[index] is not broken:
+                return  # Another caller already replaced it
+            logging.error(f"Translation worker {index} died; starting a replacement")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executors[index] = self._new_executor()
+
+    def shutdown(self, wait: bool = True):
+        with self.lock:
+            for executor in self.executors:
+                executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_pool: Optional[TranslationWorkerPool] = None
+_pool_lock = Lock()
+
+
+def get_worker_pool() -> Optional[TranslationWorkerPool]:
+    """
+    Return the process-wide worker pool, or None when TRANSLATOR_WORKERS is 0.
+    """
+    global _pool
+    if WORKER_PROCESSES <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranslationWorkerPool()
+            atexit.register(_pool.shutdown, False)
+        return _pool
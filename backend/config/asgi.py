@@ -15,6 +15,7 @@ from channels.auth import AuthMiddlewareStack
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 import chat.routing  # Import your chat app's routing
+from chat.warmup import start_warmup
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
@@ -24,3 +25,6 @@ application = ProtocolTypeRouter({
         )
     ),
 })
+
+# Preload and warm TRANSLATOR_PRELOAD_PAIRS in the background; /api/chat/ready/ reports progress
+start_warmup()
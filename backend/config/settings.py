@@ -125,6 +125,40 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache (friends snapshots). Signals invalidate snapshots only in the process that saved the change, so
+# several workers need a shared backend such as django.core.cache.backends.redis.RedisCache with
+# redis://127.0.0.1:6379/1; with LocMemCache snapshots are kept for a few seconds only (chat/friends.py).
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+
+# Presence (see chat/presence.py); an empty PRESENCE_REDIS_URL keeps presence in-process
+PRESENCE_REDIS_URL = config("PRESENCE_REDIS_URL", default="redis://127.0.0.1:6379/0")
+PRESENCE_TTL = config("PRESENCE_TTL", default=60, cast=int)  # seconds a connection stays live without a heartbeat
+PRESENCE_FLUSH_INTERVAL = config("PRESENCE_FLUSH_INTERVAL", default=10, cast=float)
+
+# Write-behind persistence of chat messages (see chat/persistence.py)
+CHAT_WRITE_BEHIND = config("CHAT_WRITE_BEHIND", default=True, cast=bool)
+CHAT_WRITE_BATCH_SIZE = config("CHAT_WRITE_BATCH_SIZE", default=100, cast=int)
+CHAT_WRITE_FLUSH_INTERVAL_MS = config("CHAT_WRITE_FLUSH_INTERVAL_MS", default=200, cast=int)
+CHAT_WRITE_SPOOL_PATH = config("CHAT_WRITE_SPOOL_PATH", default=str(BASE_DIR / "message_spool.jsonl"))
+
+# Admission control for WebSocket translations (see chat/admission.py)
+CHAT_CONNECTION_RATE = config("CHAT_CONNECTION_RATE", default=2, cast=float)  # messages per second per connection
+CHAT_CONNECTION_BURST = config("CHAT_CONNECTION_BURST", default=10, cast=float)
+CHAT_USER_RATE = config("CHAT_USER_RATE", default=4, cast=float)  # per user, across their connections in a worker
+CHAT_USER_BURST = config("CHAT_USER_BURST", default=20, cast=float)
+CHAT_MAX_IN_FLIGHT = config("CHAT_MAX_IN_FLIGHT", default=64, cast=int)  # translations per worker before shedding
+CHAT_SHORT_MESSAGE_CHARS = config("CHAT_SHORT_MESSAGE_CHARS", default=80, cast=int)
+CHAT_LONG_MESSAGE_SHARE = config("CHAT_LONG_MESSAGE_SHARE", default=0.5, cast=float)  # in-flight share for longer messages
+
+# Limits of POST /api/chat/translate/batch/
+CHAT_BATCH_MAX_ITEMS = config("CHAT_BATCH_MAX_ITEMS", default=100, cast=int)
+CHAT_BATCH_MAX_CHARS = config("CHAT_BATCH_MAX_CHARS", default=20000, cast=int)
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -15,9 +15,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from chat.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('user.urls')),
     path('api/chat/', include('chat.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
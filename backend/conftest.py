@@ -0,0 +1,38 @@
+"""
+conftest.py
+
+Lets `python -m pytest` run the Django test suites without pytest-django: Django is set up
+from config.settings with in-process presence, and the test databases are created once per
+session and torn down at the end, as `manage.py test` does. Background services started by
+the tests flush before the databases go away, so their atexit hooks find nothing left to write.
+"""
+
+import os
+
+import django
+import pytest
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ.setdefault("PRESENCE_REDIS_URL", "")
+
+
+def pytest_configure():
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def django_test_databases():
+    from django.test.utils import setup_databases, teardown_databases
+
+    from chat import persistence, presence
+
+    databases = setup_databases(verbosity=0, interactive=False)
+    yield
+    if presence._presence is not None:
+        presence._presence.stop()
+    if persistence._writer is not None:
+        persistence._writer.drain()
+    teardown_databases(databases, verbosity=0)
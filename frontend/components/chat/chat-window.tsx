@@ -50,11 +50,14 @@ export default function ChatWindow() {
   const [error, setError] = useState<string | null>(null)
   const [isConnected, setIsConnected] = useState(false)
   const [isConnecting, setIsConnecting] = useState(false)
+  const [presence, setPresence] = useState<Record<string, boolean>>({})
   const wsRef = useRef<WebSocket | null>(null)
   const messagesEndRef = useRef<HTMLDivElement>(null)
   const reconnectTimeoutRef = useRef<ReturnType<typeof setTimeout> | null>(null)
+  const heartbeatRef = useRef<ReturnType<typeof setInterval> | null>(null)
 
   const activeFriend = friends?.find((f: Friend) => f.id === activeChat)
+  const isFriendOnline = activeFriend ? presence[String(activeFriend.id)] ?? activeFriend.isOnline : false
 
   // Scroll to bottom when messages change
   useEffect(() => {
@@ -74,15 +77,25 @@ export default function ChatWindow() {
         wsRef.current.close()
       }
       
-      // Connect to Django Channels WebSocket
+      // Connect to Django Channels WebSocket; only authenticated connections may send
       const wsUrl = typeof window !== 'undefined' ? (window as any).ENV?.NEXT_PUBLIC_WS_URL || "ws://localhost:8000" : "ws://localhost:8000"
-      const ws = new WebSocket(`${wsUrl}/ws/chat/`)
+      const token = localStorage.getItem("token")
+      const ws = new WebSocket(`${wsUrl}/ws/chat/?token=${encodeURIComponent(token || "")}`)
       wsRef.current = ws
 
       ws.onopen = () => {
         setIsConnected(true)
         setIsConnecting(false)
         setError(null)
+        // Stay online: the server expires connections without a heartbeat every PRESENCE_TTL (60s)
+        if (heartbeatRef.current) {
+          clearInterval(heartbeatRef.current)
+        }
+        heartbeatRef.current = setInterval(() => {
+          if (ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({ type: "heartbeat" }))
+          }
+        }, 30000)
       }
       
       ws.onmessage = (event) => {
@@ -94,7 +107,19 @@ export default function ChatWindow() {
             return
           }
           
-          // Expecting: { id, original, translated, sender_id, receiver_id, timestamp, ... }
+          // Friends coming online or going offline
+          if (data.type === "presence") {
+            setPresence((prev) => ({ ...prev, [String(data.user_id)]: data.is_online }))
+            return
+          }
+          
+          // Streamed chunks are only sent when "stream" is requested; the "complete" frame carries the full text
+          if (data.type === "partial") {
+            return
+          }
+          
+          // "message" frames from friends, "complete" frames and untyped replies to our own sends:
+          // { id, original, translated, sender_id, receiver_id, timestamp, ... }
           const newMessage: Message = {
             id: data.id || Math.random().toString(36).slice(2),
             senderId: data.sender_id,
@@ -120,6 +145,9 @@ export default function ChatWindow() {
       ws.onclose = () => {
         setIsConnected(false)
         setIsConnecting(false)
+        if (heartbeatRef.current) {
+          clearInterval(heartbeatRef.current)
+        }
         
         // Attempt to reconnect after 3 seconds
         if (reconnectTimeoutRef.current) {
@@ -140,6 +168,9 @@ export default function ChatWindow() {
       if (reconnectTimeoutRef.current) {
         clearTimeout(reconnectTimeoutRef.current)
       }
+      if (heartbeatRef.current) {
+        clearInterval(heartbeatRef.current)
+      }
       if (wsRef.current) {
         wsRef.current.close()
       }
@@ -158,7 +189,6 @@ export default function ChatWindow() {
       message: newMessage,
       source_lang: user?.preferredLanguage || "en",
       target_lang: selectedLanguage,
-      sender_id: user?.id,
       receiver_id: activeChat,
     }
     
@@ -192,13 +222,13 @@ export default function ChatWindow() {
               <div className="h-10 w-10 bg-gray-100 rounded-full flex items-center justify-center">
                 <User className="h-6 w-6 text-gray-600" />
               </div>
-              {activeFriend.isOnline && (
+              {isFriendOnline && (
                 <div className="absolute -bottom-1 -right-1 h-3 w-3 bg-green-500 rounded-full border-2 border-white" />
               )}
             </div>
             <div>
               <h2 className="font-semibold text-gray-900">{activeFriend.name}</h2>
-              <p className="text-sm text-gray-500">{activeFriend.isOnline ? "Online" : "Offline"}</p>
+              <p className="text-sm text-gray-500">{isFriendOnline ? "Online" : "Offline"}</p>
             </div>
           </div>
           <div className="flex items-center space-x-2">